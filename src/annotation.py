@@ -0,0 +1,122 @@
+"""
+True [clearance](http://aigamedev.com/open/tutorial/clearance-based-pathfinding/#TheTrueClearanceMetric)
+computation.
+
+The clearance of a walkable cell is the size of the largest square, having that cell as its top-left corner,
+which only contains walkable cells. It is computed from the walkability bitmap of a `grid`
+(see @{Grid:compile_walkable}) and returned as a flat, row-major uint16 buffer.
+"""
+
+import heapq
+from array import array
+from typing import Iterable, List
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None  # type: ignore
+
+
+def compute_clearance(bitmap: bytearray, width: int, height: int) -> array:
+    """
+    Computes the clearance of every cell, from the bottom-right corner of the map to the top-left one:
+    a walkable cell has a clearance of one plus the lowest clearance among its east, south and south-east neighbours.
+    """
+    stride = width + 2
+    clearance = array("H", bytes(2 * width * height))
+    for y in range(height - 1, -1, -1):
+        for x in range(width - 1, -1, -1):
+            if bitmap[(y + 1) * stride + x + 1]:
+                i = y * width + x
+                if x + 1 < width and y + 1 < height:
+                    clearance[i] = (
+                        min(
+                            clearance[i + width + 1],
+                            clearance[i + width],
+                            clearance[i + 1],
+                        )
+                        + 1
+                    )
+                else:
+                    clearance[i] = 1
+
+    return clearance
+
+
+def compute_clearance_numpy(bitmap: bytearray, width: int, height: int) -> array:
+    """
+    Vectorised version of @{compute_clearance}, processing a whole row at once.
+
+    Along a row, `c[x] = min(m[x], c[x + 1] + 1)` for walkable cells (with `m[x]` being one plus the lowest
+    clearance among the south and south-east neighbours) and `c[x] = 0` otherwise. Shifting every value
+    by its distance to the right border, `e[x] = c[x] - (width - x)`, turns that recurrence into a reversed
+    cumulative minimum, which numpy computes in bulk.
+    """
+    if numpy is None:
+        raise ImportError("numpy is required to compute a vectorised clearance")
+
+    walkable = (
+        numpy.frombuffer(bitmap, dtype=numpy.uint8)
+        .reshape(height + 2, width + 2)[1:-1, 1:-1]
+        .astype(bool)
+    )
+    # One extra row and column of zeros, standing for the cells outside of the map
+    clearance = numpy.zeros((height + 1, width + 1), dtype=numpy.int64)
+    distance_to_border = numpy.arange(width, 0, -1, dtype=numpy.int64)
+
+    for y in range(height - 1, -1, -1):
+        below = clearance[y + 1]
+        m = numpy.minimum(below[:-1], below[1:]) + 1
+        shifted = numpy.where(walkable[y], m, 0) - distance_to_border
+        e = numpy.minimum.accumulate(shifted[::-1])[::-1]
+        clearance[y, :-1] = e + distance_to_border
+
+    result = array("H")
+    result.frombytes(clearance[:-1, :-1].astype(numpy.uint16).tobytes())
+    return result
+
+
+def update_clearance(
+    clearance: array, bitmap: bytearray, width: int, height: int, cells: Iterable[int]
+) -> List[int]:
+    """
+    Recomputes the clearance of the given cells after their walkability changed, and propagates the change.
+
+    The clearance of a cell only depends on its east, south and south-east neighbours, so a change can only
+    affect the cells up and to the left of it. Cells are processed by decreasing anti-diagonal (`x + y`), which
+    guarantees the values they depend on are final, and the propagation stops as soon as values stop changing.
+
+    :return: the indices of the cells whose clearance changed
+    """
+    stride = width + 2
+    queued = set(cells)
+    heap = [(-sum(divmod(i, width)), i) for i in queued]
+    heapq.heapify(heap)
+    changed = []
+
+    while heap:
+        _, i = heapq.heappop(heap)
+        y, x = divmod(i, width)
+        if not bitmap[(y + 1) * stride + x + 1]:
+            value = 0
+        elif x + 1 < width and y + 1 < height:
+            value = (
+                min(clearance[i + width + 1], clearance[i + width], clearance[i + 1])
+                + 1
+            )
+        else:
+            value = 1
+
+        if value == clearance[i]:
+            continue
+
+        clearance[i] = value
+        changed.append(i)
+        for dx, dy in ((-1, 0), (0, -1), (-1, -1)):
+            if x + dx >= 0 and y + dy >= 0:
+                j = i + dy * width + dx
+                if j not in queued:
+                    queued.add(j)
+                    heapq.heappush(heap, (-(x + dx + y + dy), j))
+
+    return changed
@@ -0,0 +1,103 @@
+import math
+import threading
+from array import array
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# Flags stored in `SearchContext.state`
+VISITED = 1
+OPENED = 2
+CLOSED = 4
+
+
+class SearchContext:
+    """
+    Holds the state of a single search: the `g` and `h` costs, the parent and the
+    opened/closed flags of every cell the search went through.
+
+    The state is kept in flat buffers indexed like the `grid` cells (`y * width + x`),
+    not on the nodes, so that the `grid` remains read-only while searching and can be shared
+    by several searches at once. A context serves one search at a time; use a
+    @{SearchContextPool} to reuse them across queries.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.g = array("d", [math.inf]) * size
+        self.h = array("d", [0.0]) * size
+        self.parent = array("q", [-1]) * size
+        self.state = bytearray(size)
+        self.touched: List[int] = []
+        self._backward: Optional["SearchContext"] = None
+
+    def backward(self) -> "SearchContext":
+        """
+        Returns a second context of the same size, for the searches running from both ends
+        (see `bidirectional.search`). It is created on first use, and reset along with this context.
+        """
+        if self._backward is None:
+            self._backward = SearchContext(self.size)
+        return self._backward
+
+    def visit(self, i: int) -> None:
+        """
+        Records the cell at index `i` as touched by the current search, so that
+        @{SearchContext:reset} restores it. Must be called before writing any value for that cell.
+        """
+        if not self.state[i] & VISITED:
+            self.state[i] = VISITED
+            self.touched.append(i)
+
+    def reset(self) -> None:
+        """
+        Restores the context to its pristine state. Only the cells touched by the last search
+        are cleared, unless they are many, in which case the whole buffers are rewritten.
+        """
+        touched = self.touched
+        if len(touched) > self.size >> 3:
+            size = self.size
+            self.g[:] = array("d", [math.inf]) * size
+            self.h[:] = array("d", [0.0]) * size
+            self.parent[:] = array("q", [-1]) * size
+            self.state[:] = bytes(size)
+        else:
+            g, h, parent, state = self.g, self.h, self.parent, self.state
+            for i in touched:
+                g[i] = math.inf
+                h[i] = 0.0
+                parent[i] = -1
+                state[i] = 0
+
+        self.touched = []
+        if self._backward is not None and self._backward.touched:
+            self._backward.reset()
+
+
+class SearchContextPool:
+    """
+    Thread-safe pool of @{SearchContext}, keyed by the size of the `grid` they serve.
+    """
+
+    def __init__(self) -> None:
+        self._free: Dict[int, List[SearchContext]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, size: int) -> SearchContext:
+        with self._lock:
+            free = self._free.get(size)
+            if free:
+                return free.pop()
+        return SearchContext(size)
+
+    def release(self, context: SearchContext) -> None:
+        context.reset()
+        with self._lock:
+            self._free.setdefault(context.size, []).append(context)
+
+    @contextmanager
+    def borrow(self, size: int) -> Iterator[SearchContext]:
+        context = self.acquire(size)
+        try:
+            yield context
+        finally:
+            self.release(context)
@@ -0,0 +1,195 @@
+"""
+Flow fields, to steer many agents toward the same goal.
+
+A flow field holds, for every cell of a `grid`, the move to take to get closer to a `goal` (see @{Grid:flow_field}).
+It is computed once by a Dijkstra sweep from the goal, after what the next step of each agent is a lookup.
+"""
+
+import math
+from array import array
+from typing import TYPE_CHECKING, List, Optional, Set
+
+import utils
+from mytypes.mytypes import Position
+from openlist import AnyOpenList, BucketOpenList, OpenList
+from properties import AgentCharacteristics, SearchOptions
+from search.dijkstra import DIRECTIONS, NO_DIRECTION, DistanceField
+
+if TYPE_CHECKING:
+    from grid import Grid
+
+
+class FlowField(DistanceField):
+    """
+    Best move toward a `goal`, for every cell of a `grid`.
+
+    @{FlowField:refresh} brings the field up to date without sweeping the whole `grid` again:
+    - When cells change, only the cells whose way to the goal went through them are computed again.
+    - When the goal moves, only the moves along the way from the new goal to the former one are reversed:
+      agents keep heading to the former goal, which leads them to the new one. Paths may then be longer than the
+      shortest ones, and `distances` become upper bounds of their costs, off by up to twice the distance
+      the goal moved. Once the goal has moved `max_drift` away (in total, along its moves), the field is swept
+      again from scratch.
+    """
+
+    def __init__(
+        self,
+        grid: "Grid",
+        goal: Position,
+        agent_characteristics: AgentCharacteristics,
+        options: SearchOptions,
+        max_drift: float = 4,
+    ) -> None:
+        super().__init__(grid, [goal], agent_characteristics, options)
+        self.max_drift = max_drift
+        self.drift = 0.0
+        self.snapshot = bytes(self._bitmap())
+        self.sweep()
+
+    @property
+    def goal(self) -> Position:
+        return self.sources[0]
+
+    def next_position(self, x: int, y: int) -> Optional[Position]:
+        """
+        Returns the position an agent at (x, y) should move to, None when at the goal or unable to reach it.
+        """
+        direction = self.direction(x, y)
+        if direction is None:
+            return None
+        return x + direction[0], y + direction[1]
+
+    def rebuild(self, goal: Optional[Position] = None) -> None:
+        """
+        Computes the field again from scratch, toward the given `goal` or the current one.
+        """
+        if goal is not None:
+            self.sources = [goal]
+        self.drift = 0.0
+        self.snapshot = bytes(self._bitmap())
+        self.sweep()
+
+    def refresh(self, goal: Optional[Position] = None) -> None:
+        """
+        Brings the field up to date with the cells of the `grid` that changed since the last refresh
+        and, when given, with the new position of the `goal`.
+        """
+        bitmap = self._bitmap()
+        changed = utils.changed_positions(self.snapshot, bitmap)
+        self.snapshot = bytes(bitmap)
+        if changed:
+            self._repair(changed)
+
+        if goal is not None and tuple(goal) != tuple(self.goal):
+            self._move_goal(goal)
+
+    def _bitmap(self) -> bytearray:
+        return self.grid.compile_walkable(
+            self.agent_characteristics.walkable, self.agent_characteristics.clearance
+        )
+
+    def _new_openlist(self) -> AnyOpenList:
+        return OpenList() if self.options.allow_diagonal else BucketOpenList()
+
+    def _move_goal(self, goal: Position) -> None:
+        grid = self.grid
+        x, y = goal
+        if not grid.contains(x, y):
+            raise IndexError(f"Goal ({x}, {y}) is out of the grid")
+
+        old = grid.index(*self.goal)
+        shift = self.distances[grid.index(x, y)]
+        if (
+            shift == math.inf
+            or self.drift + shift > self.max_drift
+            or not grid.is_walkable(
+                *self.goal,
+                self.agent_characteristics.walkable,
+                self.agent_characteristics.clearance,
+            )
+        ):
+            self.rebuild(goal)
+            return
+
+        # The field leads from the new goal to the former one: reverse the moves along that way, so that it
+        # leads to the new goal instead. Every other cell reaches the new goal through that way, i.e. at most
+        # `shift` further away than it used to reach the former goal.
+        width = grid.width
+        distances, directions = self.distances, self.directions
+        way = [grid.index(x, y)]
+        while way[-1] != old:
+            dx, dy = DIRECTIONS[directions[way[-1]]]
+            way.append(way[-1] + dy * width + dx)
+
+        self.drift += shift
+        self.distances = distances = array("d", [d + shift for d in distances])
+        distances[way[0]] = 0
+        directions[way[0]] = NO_DIRECTION
+        for previous, i in zip(way, way[1:]):
+            (py, px), (y, x) = divmod(previous, width), divmod(i, width)
+            directions[i] = DIRECTIONS.index((px - x, py - y))
+            distances[i] = distances[previous] + math.hypot(px - x, py - y)
+        self.sources = [goal]
+
+    def _repair(self, changed: List[int]) -> None:
+        """
+        Updates the field after the cells at the `changed` positions of the walkability bitmap were modified:
+        these cells, and the ones whose way to the goal went through them, are cleared, then filled again by a
+        sweep from the cells around them.
+        """
+        grid, options = self.grid, self.options
+        width, height, stride = grid.width, grid.height, grid.stride
+        distances, directions = self.distances, self.directions
+        offsets = DIRECTIONS if options.allow_diagonal else DIRECTIONS[:4]
+        reverse = [DIRECTIONS.index((-dx, -dy)) for dx, dy in offsets]
+
+        invalid: Set[int] = set()
+        for p in changed:
+            y, x = divmod(p, stride)
+            x, y = x - 1, y - 1
+            invalid.add(y * width + x)
+            if not options.allow_diagonal or options.tunneling:
+                continue
+            # Diagonal moves squeezing past the changed cell may have been cut off
+            for dx, dy in DIRECTIONS[:4]:
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < width and 0 <= ny < height):
+                    continue
+                code = directions[ny * width + nx]
+                if code != NO_DIRECTION and code >= 4:
+                    mx, my = DIRECTIONS[code]
+                    if (nx + mx, ny) == (x, y) or (nx, ny + my) == (x, y):
+                        invalid.add(ny * width + nx)
+
+        # Cells whose way to the goal goes through an invalid cell are invalid too
+        stack = list(invalid)
+        while stack:
+            i = stack.pop()
+            y, x = divmod(i, width)
+            for (dx, dy), code in zip(offsets, reverse):
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    j = ny * width + nx
+                    if directions[j] == code and j not in invalid:
+                        invalid.add(j)
+                        stack.append(j)
+
+        sources = {grid.index(x, y) for x, y in self.sources}
+        for i in invalid - sources:
+            distances[i] = math.inf
+            directions[i] = NO_DIRECTION
+
+        # Sweep again from the valid cells around the invalid ones
+        openlist = self._new_openlist()
+        for i in invalid:
+            y, x = divmod(i, width)
+            if i in sources:
+                openlist.push((y + 1) * stride + x + 1, 0, 0)
+            for dx, dy in offsets:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    j = ny * width + nx
+                    if j not in invalid and distances[j] != math.inf:
+                        openlist.push((ny + 1) * stride + nx + 1, distances[j], 0)
+
+        self.propagate(openlist)
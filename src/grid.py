@@ -1,10 +1,39 @@
-from functools import partial
-from typing import Any, Dict, List, Optional, Protocol
-
+from array import array
+from collections import deque
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Deque,
+    Dict,
+    List,
+    MutableSequence,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
+
+import annotation
 import utils
-from mytypes.mytypes import Map
+from mytypes.mytypes import Map, Position, Region
 from mytypes.walkable import Walkable
-from node import Node
+from node import Node, NodeMap
+
+if TYPE_CHECKING:
+    from flowfield import FlowField
+    from properties import AgentCharacteristics, SearchOptions
+    from search.hpa import HierarchicalMap
+    from search.jpsplus import JumpTable
+    from search.thetastar import LineOfSightCache
+
+Bitsets = Tuple[List[int], List[int]]
+
+_BITS_AS_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+
+# Number of modifications of the collision map remembered by a grid (see Grid.modifications_since)
+MODIFICATION_LOG_SIZE = 1024
 
 
 class NodeMapper(Protocol):
@@ -17,8 +46,18 @@ class Grid:
     Implementation of the `grid` class.
     The `grid` is a implicit graph which represents the 2D
     world map layout on which the `pathfinder` object will run.
-    During a search, the `pathfinder` object needs to save some critical values. These values are cached within each `node`
-    object, and the whole set of nodes are tight inside the `grid` object itself.
+    During a search, the `pathfinder` object needs to save some critical values. These values are kept
+    in a `SearchContext` rather than on the `grid`, so a single annotated `grid` can serve many searches at once.
+
+    The collision map and the clearance values are kept in flat, row-major buffers (the cell (x, y) lives
+    at index `y * width + x`, see @{Grid:index}). When the `grid` is built in compact mode, no `node` is
+    created upfront: nodes are materialised when asked for (e.g. through @{Grid:get_node_at}).
+
+    Walkability is evaluated once per cell and cached as a bitmap for each walkable/clearance pair
+    (see @{Grid:compile_walkable}), so searches read bytes instead of calling walkable predicates.
+
+    Every change of the collision map increments the `version` of the `grid` and is logged, so that what is
+    derived from the `grid` can tell which regions changed since it was computed (see @{Grid:modifications_since}).
     """
 
     straight_offsets = [
@@ -35,67 +74,325 @@ class Grid:
         (1, 1),  # [[SE]]
     ]
 
-    def __init__(self, map: Map) -> None:
+    def __init__(self, map: Union[Map, str], compact: bool = False) -> None:
         """
         Inits a new `grid`
 
         :param table|string map A collision map - (2D array) with consecutive indices (starting at 0 or 1)
         or a `string` with line-break chars (<code>\n</code> or <code>\r</code>) as row delimiters.
+        :param compact: when true, nodes are not built upfront but materialised on demand.
         """
-        self.map = map
+        grid_map: Map
+        if isinstance(map, str):
+            # The cells of a string map are characters, matched against the walkable value like any other
+            grid_map = cast(Map, utils.string_map_to_array(map))
+        else:
+            grid_map = map
+
+        self.map = grid_map
+        self.compact = compact
         self.is_annotated: Dict[Walkable, bool] = {}
-        (
-            self.nodes,
-            self.min_x,
-            self.max_x,
-            self.min_y,
-            self.max_y,
-        ) = utils.array_to_nodes(map)
+        self.clearance: Dict[Walkable, array] = {}
+        self.bitmaps: Dict[Tuple[Walkable, Optional[int]], bytearray] = {}
+        self.bitsets: Dict[Tuple[Walkable, Optional[int]], Bitsets] = {}
+        self.jump_tables: Dict[Tuple[Walkable, Optional[int]], "JumpTable"] = {}
+        self.hierarchies: Dict[Tuple[Any, ...], "HierarchicalMap"] = {}
+        # Caches of line of sight results, which empty themselves when the `grid` changes
+        self.sight_lines: Dict[Tuple[Walkable, Optional[int]], "LineOfSightCache"] = {}
+        self.version = 0
+        self.modifications: Deque[Tuple[int, Region]] = deque(
+            maxlen=MODIFICATION_LOG_SIZE
+        )
+        self.min_x, self.max_x, self.min_y, self.max_y = utils.map_bounds(grid_map)
         self.width = self.max_x - self.min_x
         self.height = self.max_y - self.min_y
+        self.cells: MutableSequence[Any] = utils.array_to_buffer(grid_map)
 
-    def annotate(self, walkable: Walkable) -> "Grid":
+        self.nodes: Optional[NodeMap] = None
+        if not compact:
+            self.nodes = utils.array_to_nodes(grid_map)[0]
+
+    @classmethod
+    def from_bitmaps(
+        cls,
+        width: int,
+        height: int,
+        walkable: Walkable,
+        bitmaps: Dict[Optional[int], Sequence[int]],
+        clearance: Optional[Sequence[int]] = None,
+    ) -> "Grid":
+        """
+        Builds a compact `grid` over walkability bitmaps already compiled for a walkable (see
+        @{Grid:compile_walkable}), and optionally over its clearance values, without copying them. This lets
+        processes share a `grid` living in shared memory (see `parallel.ProcessPathfinder`).
+        The collision map itself is not available: such a `grid` can't be updated, annotated,
+        nor serve other walkables or clearances than the ones of the `bitmaps`.
+
+        :param bitmaps: the bitmaps of the walkable, keyed by clearance (None for the plain walkability)
+        :param clearance: the clearance values of the walkable, indexed like the `grid` cells
+        """
+        grid = cls([[]], compact=True)
+        grid.width, grid.height = width, height
+        grid.max_x, grid.max_y = width, height
+        # Buffers are only indexed while searching, as bitmaps and clearance values are
+        grid.bitmaps = {
+            (walkable, key or None): cast(bytearray, bitmap)
+            for key, bitmap in bitmaps.items()
+        }
+        if clearance is not None:
+            grid.clearance[walkable] = cast(array, clearance)
+            grid.is_annotated[walkable] = True
+        return grid
+
+    def annotate(self, walkable: Walkable, vectorised: Optional[bool] = None) -> "Grid":
         """
         Evaluates [clearance](http://aigamedev.com/open/tutorial/clearance-based-pathfinding/#TheTrueClearanceMetric)
         for the whole `grid`. It should be called only once, unless the collision map or the
-        __walkable__ attribute changes. The clearance values are calculated and cached within the grid nodes.
+        __walkable__ attribute changes. The clearance values are calculated and cached within a flat buffer
+        of the grid.
 
+        :param vectorised: whether to compute the clearance with numpy. By default, numpy is used when installed.
         :return pathfinder: (the calling `pathfinder` itself, can be chained)
         """
-        for y in range(self.max_y - 1, self.min_y - 1, -1):
-            for x in range(self.max_x - 1, self.min_x - 1, -1):
-                node = self.get_node_at(x, y)
-                assert node is not None
-                if self.is_walkable(x, y, walkable):
-                    east = self.get_node_at(node.x + 1, node.y)
-                    southeast = self.get_node_at(node.x + 1, node.y + 1)
-                    south = self.get_node_at(node.x, node.y + 1)
-
-                    if east and southeast and south:
-                        m = min(
-                            southeast.clearance.get(walkable, 0),
-                            south.clearance.get(walkable, 0),
-                            east.clearance.get(walkable, 0),
-                        )
-                        node.clearance[walkable] = m + 1
-                    else:
-                        node.clearance[walkable] = 1
-                else:
-                    node.clearance[walkable] = 0
+        if vectorised is None:
+            vectorised = annotation.numpy is not None
+
+        # The collision map may have been changed behind the back of the grid: every bitmap compiled
+        # from the previous copy of its cells is stale
+        cells = utils.array_to_buffer(self.map)
+        if cells != self.cells:
+            self.cells = cells
+            self.bitmaps.clear()
+            self.bitsets.clear()
+            self.jump_tables.clear()
+            self.hierarchies.clear()
+
+        compute = (
+            annotation.compute_clearance_numpy
+            if vectorised
+            else annotation.compute_clearance
+        )
+        self.clearance[walkable] = compute(
+            self.compile_walkable(walkable), self.width, self.height
+        )
         self.is_annotated[walkable] = True
+        self._discard_preprocessing(walkable)
+        self._record_modification((0, 0, self.width - 1, self.height - 1))
         return self
 
-    def get_clearance_grid(self, walkable: Walkable) -> Map:
-        output = []
-        for y in range(self.height):
-            row = []
-            for x in range(self.width):
-                node = self.get_node_at(x, y)
-                assert node is not None
-                row.append(node.get_clearance(walkable))
-            output.append(row)
+    def set_cell(self, x: int, y: int, value: Any) -> None:
+        """
+        Changes the value of the cell [x, y] in the collision map. See @{Grid:update_region}.
+        """
+        self.update_region(x, y, [[value]])
+
+    def update_region(self, x: int, y: int, values: Map) -> None:
+        """
+        Rewrites a rectangular region of the collision map, whose top-left corner is [x, y].
+        Walkability bitmaps are patched in place, and the clearance of every annotated walkable is
+        recomputed only for the cells the change can affect (see @{annotation.update_clearance}).
+
+        :param int x: the x-coordinate of the top-left corner of the region
+        :param int y: the y-coordinate of the top-left corner of the region
+        :param table values: the new values of the region, as a 2D array
+        """
+        width, stride = self.width, self.stride
+        indices = []
+        for j, row in enumerate(values):
+            for i, value in enumerate(row):
+                cx, cy = x + i, y + j
+                if not self.contains(cx, cy):
+                    raise IndexError(f"Cell ({cx}, {cy}) is outside of the grid")
+                self.map[cy][cx] = value
+                try:
+                    self.cells[cy * width + cx] = value
+                except TypeError:
+                    # The new value does not fit in the typed buffer
+                    self.cells = list(self.cells)
+                    self.cells[cy * width + cx] = value
+                indices.append(cy * width + cx)
+
+        if indices:
+            self._record_modification(
+                (x, y, x + max(len(row) for row in values) - 1, y + len(values) - 1)
+            )
+        self.bitsets.clear()
+        self.jump_tables.clear()
+
+        for (walkable, clearance), bitmap in self.bitmaps.items():
+            if clearance is None:
+                for i in indices:
+                    value = self.cells[i]
+                    walkable_cell = (
+                        walkable(value) if callable(walkable) else value == walkable
+                    )
+                    bitmap[(i // width + 1) * stride + i % width + 1] = bool(
+                        walkable_cell
+                    )
+
+        for walkable in [w for w, annotated in self.is_annotated.items() if annotated]:
+            changed = annotation.update_clearance(
+                self.clearance[walkable],
+                self.compile_walkable(walkable),
+                self.width,
+                self.height,
+                indices,
+            )
+            clearances = self.clearance[walkable]
+            for (w, clearance), bitmap in self.bitmaps.items():
+                if w == walkable and clearance is not None:
+                    for i in changed:
+                        bitmap[(i // width + 1) * stride + i % width + 1] = (
+                            clearances[i] >= clearance
+                        )
+
+    def modifications_since(self, version: int) -> Optional[List[Region]]:
+        """
+        Returns the regions of the collision map modified after the `grid` was at the given `version`,
+        None when they are too old to be remembered.
+        """
+        if self.version - version > len(self.modifications):
+            return None
+        return [region for v, region in self.modifications if v > version]
+
+    def _record_modification(self, region: Region) -> None:
+        self.version += 1
+        self.modifications.append((self.version, region))
+
+    def remove_clearance(self, walkable: Walkable) -> None:
+        """
+        Drops the clearance values computed for a given walkable.
+        """
+        self.clearance.pop(walkable, None)
+        self.is_annotated.pop(walkable, None)
+        self._discard_preprocessing(walkable)
+
+    @property
+    def stride(self) -> int:
+        """
+        Length of a row of the walkability bitmaps (a row of the `grid` plus its left and right borders).
+        """
+        return self.width + 2
 
-        return output
+    def compile_walkable(
+        self, walkable: Walkable, clearance: Optional[int] = None
+    ) -> bytearray:
+        """
+        Evaluates a walkable over the whole `grid` and returns the result as a bitmap, holding one byte per cell
+        (1 when walkable, 0 otherwise). The bitmap is surrounded by a border of unwalkable cells, so the cell [x, y]
+        lives at index `(y + 1) * stride + x + 1` and neighbours of any cell can be read without bounds checks.
+        Bitmaps are cached on the `grid` until the clearance for that walkable is recomputed or removed.
+
+        :param string|int|func walkable: the value for walkable locations in the collision map array.
+        :param int clearance: when given, cells with a clearance lower than that value are considered unwalkable.
+        :return: the walkability bitmap
+        """
+        key = (walkable, clearance or None)
+        bitmap = self.bitmaps.get(key)
+        if bitmap is not None:
+            return bitmap
+
+        width, height, stride = self.width, self.height, self.stride
+        bitmap = bytearray(stride * (height + 2))
+        if clearance and self.is_annotated.get(walkable):
+            # A positive clearance implies the cell is walkable
+            clearances = self.clearance[walkable]
+            for y in range(height):
+                levels = clearances[y * width : (y + 1) * width]
+                start = (y + 1) * stride + 1
+                bitmap[start : start + width] = bytes(c >= clearance for c in levels)
+        elif not clearance:
+            cells = self.cells
+            # The predicate is evaluated once per distinct value of the collision map
+            if callable(walkable):
+                verdicts = {value: bool(walkable(value)) for value in set(cells)}
+            else:
+                verdicts = {value: value == walkable for value in set(cells)}
+            for y in range(height):
+                row = cells[y * width : (y + 1) * width]
+                start = (y + 1) * stride + 1
+                bitmap[start : start + width] = bytes(verdicts[v] for v in row)
+
+        self.bitmaps[key] = bitmap
+        return bitmap
+
+    def compile_bitsets(
+        self, walkable: Walkable, clearance: Optional[int] = None
+    ) -> Bitsets:
+        """
+        Returns the walkability bitmap (see @{Grid:compile_walkable}) packed into Python integers, one per row
+        and one per column, so that a whole line of the `grid` can be tested with a few bitwise operations.
+        Bit `x + 1` of `rows[y + 1]` (and bit `y + 1` of `columns[x + 1]`) is set when the cell [x, y] is walkable,
+        the borders being unwalkable.
+
+        :return: the row and column bitsets
+        """
+        key = (walkable, clearance or None)
+        bitsets = self.bitsets.get(key)
+        if bitsets is not None:
+            return bitsets
+
+        bitmap = self.compile_walkable(walkable, clearance)
+        stride = self.stride
+
+        def pack(line: bytearray) -> int:
+            # Bit i of the integer is the i-th byte of the line
+            return int(line[::-1].translate(_BITS_AS_DIGITS), 2)
+
+        rows = [
+            pack(bitmap[y * stride : (y + 1) * stride]) for y in range(self.height + 2)
+        ]
+        columns = [pack(bitmap[x::stride]) for x in range(stride)]
+        bitsets = self.bitsets[key] = (rows, columns)
+        return bitsets
+
+    def _discard_preprocessing(self, walkable: Walkable) -> None:
+        """
+        Drops the cached bitmaps, bitsets, jump tables and hierarchies depending on the clearance values
+        of a walkable.
+        """
+        caches: Tuple[Dict[Any, Any], ...] = (
+            self.bitmaps,
+            self.bitsets,
+            self.jump_tables,
+            self.hierarchies,
+        )
+        for cache in caches:
+            for key in [k for k in cache if k[0] == walkable and k[1] is not None]:
+                del cache[key]
+
+    def get_clearance(self, x: int, y: int, walkable: Walkable) -> Optional[int]:
+        """
+        Returns the amount of true [clearance](http://aigamedev.com/open/tutorial/clearance-based-pathfinding/#TheTrueClearanceMetric)
+        for the cell at [x, y], or None when the `grid` was not annotated for that walkable.
+        """
+        clearance = self.clearance.get(walkable)
+        if clearance is None or not self.contains(x, y):
+            return None
+        return clearance[y * self.width + x]
+
+    def get_clearance_grid(self, walkable: Walkable) -> List[List[Optional[int]]]:
+        width = self.width
+        clearance = self.clearance.get(walkable)
+        if clearance is None:
+            return [[None] * width for _ in range(self.height)]
+
+        return [
+            clearance[y * width : (y + 1) * width].tolist() for y in range(self.height)
+        ]
+
+    @property
+    def size(self) -> int:
+        return self.width * self.height
+
+    def index(self, x: int, y: int) -> int:
+        """
+        Returns the index of the cell [x, y] within the flat buffers of the `grid`.
+        """
+        return y * self.width + x
+
+    def contains(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
 
     def is_walkable(
         self,
@@ -104,49 +401,39 @@ class Grid:
         walkable: Optional[Walkable] = None,
         clearance: Optional[int] = None,
     ) -> bool:
-        if x < 0 or y < 0:
-            return False
-
-        try:
-            node_value = self.map[y][x]
-        except IndexError:
+        if not self.contains(x, y):
             return False
 
         if walkable is None:
             return True
 
-        has_enough_clearance = True
+        bitmap = self.compile_walkable(walkable, clearance)
+        return bool(bitmap[(y + 1) * self.stride + x + 1])
 
-        if clearance:
-            if not self.is_annotated.get(walkable):
-                return False
-
-            node = self.get_node_at(x, y)
-            assert node is not None
+    def get_node_at(self, x: int, y: int) -> Optional[Node]:
+        if not self.contains(x, y):
+            return None
 
-            # In this context, a walkable is representing the entity
-            # that is trying to get clearance through the node
-            node_clearance = node.get_clearance(walkable)
-            assert node_clearance is not None
-            has_enough_clearance = node_clearance >= clearance
+        if self.nodes is not None:
+            return self.nodes[y][x]
 
-        try:
-            return walkable(node_value) and has_enough_clearance
-        except TypeError:
-            return node_value == walkable and has_enough_clearance
+        return Node(x, y)
 
-    def get_node_at(self, x: int, y: int) -> Optional[Node]:
-        if x < 0 or y < 0:
-            return None
-        try:
+    def get_node_at_index(self, i: int) -> Node:
+        y, x = divmod(i, self.width)
+        if self.nodes is not None:
             return self.nodes[y][x]
-        except IndexError:
-            return None
+
+        return Node(x, y)
 
     def imap(self, f: NodeMapper, *args: Any, **kwargs: Any) -> None:
         """
         Applies a function over all nodes of the grid. The return of the function should be a Node.
+        Only available on grids whose nodes were built upfront (i.e. not in compact mode).
         """
+        if self.nodes is None:
+            raise ValueError("imap is not supported on a compact grid")
+
         for i, nodes in enumerate(self.nodes):
             for j, node in enumerate(nodes):
                 self.nodes[i][j] = f(node, *args, **kwargs)
@@ -169,37 +456,72 @@ class Grid:
         :param clearance: When given, will prune for the neighbours set all nodes having a clearance value lower than the passed-in value
         :return: an array of nodes neighbouring a given node
         """
-        is_walkable = partial(self.is_walkable, walkable=walkable, clearance=clearance)
-
-        neighbours = []
+        bitmap = self.compile_walkable(walkable, clearance)
+        stride, width = self.stride, self.width
+        x, y = node.x, node.y
+        p = (y + 1) * stride + x + 1
+        i = y * width + x
+
+        # The border of the bitmap is unwalkable, so walkable neighbours are all within the grid
+        neighbours: List[Node] = []
         for offsetX, offsetY in self.straight_offsets:
-            n = self.get_node_at(node.x + offsetX, node.y + offsetY)
-            if n and is_walkable(n.x, n.y):
-                neighbours.append(n)
+            if bitmap[p + offsetY * stride + offsetX]:
+                neighbours.append(self.get_node_at_index(i + offsetY * width + offsetX))
 
         if not allow_diagonal:
             return neighbours
 
-        def at_least_one_adjacent_node_in_diagonal_direction_is_walkable(
-            offsetX: int, offsetY: int
-        ) -> bool:
-            n1 = self.get_node_at(node.x + offsetX, node.y)
-            n2 = self.get_node_at(node.x, node.y + offsetY)
-
-            if not n1 or not n2:
-                return False
-
-            return is_walkable(n1.x, n1.y) or is_walkable(n2.x, n2.y)
-
         for offsetX, offsetY in self.diagonal_offsets:
-            n = self.get_node_at(node.x + offsetX, node.y + offsetY)
-            if n and is_walkable(n.x, n.y):
+            if bitmap[p + offsetY * stride + offsetX]:
+                # Unless tunneling, at least one adjacent node in the diagonal direction must be walkable
                 if (
                     allow_tunneling
-                    or at_least_one_adjacent_node_in_diagonal_direction_is_walkable(
-                        offsetX, offsetY
-                    )
+                    or bitmap[p + offsetX]
+                    or bitmap[p + offsetY * stride]
                 ):
-                    neighbours.append(n)
+                    neighbours.append(
+                        self.get_node_at_index(i + offsetY * width + offsetX)
+                    )
 
         return neighbours
+
+    def line_of_sight_batch(
+        self,
+        pairs: Sequence[Tuple[Position, Position]],
+        agent_characteristics: "AgentCharacteristics",
+        vectorised: Optional[bool] = None,
+    ) -> Any:
+        """
+        Tells, for each pair of cells, whether the straight segment between them only crosses cells walkable by
+        the agent, as `thetastar.line_of_sight` does for a single pair, but checking all of them at once.
+
+        :param pairs: the ((x0, y0), (x1, y1)) pairs of cells to check
+        :param agent_characteristics: the walkable and clearance requirements of the agent
+        :param vectorised: whether to check the pairs with numpy. By default, numpy is used when installed.
+        :return: a numpy array of booleans, in the order of the `pairs` (a list without numpy)
+        """
+        from search.thetastar import line_of_sight_batch
+
+        return line_of_sight_batch(self, pairs, agent_characteristics, vectorised)
+
+    def flow_field(
+        self,
+        goal: Position,
+        agent_characteristics: "AgentCharacteristics",
+        options: "SearchOptions",
+        max_drift: float = 4,
+    ) -> "FlowField":
+        """
+        Computes the best move toward `goal` from every cell of the `grid`, so that agents sharing that goal
+        find their next step by a lookup instead of running their own search. See @{FlowField}.
+
+        :param goal: the position the agents are heading to
+        :param agent_characteristics: the walkable and clearance requirements of the agents
+        :param options: whether diagonal moves and tunneling are allowed
+        :param max_drift: how far the goal may move before the field is computed again from scratch
+          (see @{FlowField:refresh})
+        :return: the flow field toward `goal`
+        """
+        from flowfield import FlowField
+
+        return FlowField(self, goal, agent_characteristics, options, max_drift)
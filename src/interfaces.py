@@ -1,9 +1,16 @@
-from typing import Dict, Optional, Protocol
+from typing import TYPE_CHECKING, Generator, Optional, Protocol
 
+from context import SearchContext
 from grid import Grid
 from node import Node
 from properties import AgentCharacteristics, SearchOptions
 
+if TYPE_CHECKING:
+    from openlist import AnyOpenList
+
+# A search in progress: yields the index of each node it expands, and returns the end node when it reaches it
+SearchSteps = Generator[int, None, Optional[Node]]
+
 
 class Heuristic(Protocol):
     def __call__(self, nodeA: Node, nodeB: Node) -> float:
@@ -17,10 +24,36 @@ class CostEvaluator(Protocol):
         neighbour: Node,
         grid: Grid,
         agent_characteristics: Optional[AgentCharacteristics],
+        context: SearchContext,
     ) -> None:
         ...
 
 
+class VertexEvaluator(Protocol):
+    def __call__(
+        self,
+        i: int,
+        grid: Grid,
+        options: SearchOptions,
+        agent_characteristics: AgentCharacteristics,
+        context: SearchContext,
+    ) -> None:
+        ...
+
+
+class Jumper(Protocol):
+    def __call__(
+        self,
+        grid: Grid,
+        node: Optional[Node],
+        parent: Node,
+        end_node: Node,
+        agent_characteristics: AgentCharacteristics,
+        options: SearchOptions,
+    ) -> Optional[Node]:
+        ...
+
+
 class Searcher(Protocol):
     def __call__(
         self,
@@ -29,8 +62,24 @@ class Searcher(Protocol):
         start_node: Node,
         end_node: Node,
         agent_characteristics: AgentCharacteristics,
-        to_clear: Dict[Node, bool],
+        context: SearchContext,
         heuristic: Heuristic,
-        cost_eval: Optional[CostEvaluator] = None,
+        openlist: Optional["AnyOpenList"] = None,
     ) -> Optional[Node]:
         ...
+
+
+class SteppedSearcher(Protocol):
+    def __call__(
+        self,
+        grid: Grid,
+        options: SearchOptions,
+        start_node: Node,
+        end_node: Node,
+        agent_characteristics: AgentCharacteristics,
+        context: SearchContext,
+        *,
+        heuristic: Heuristic,
+        openlist: Optional["AnyOpenList"] = None,
+    ) -> SearchSteps:
+        ...
@@ -4,3 +4,5 @@ T = TypeVar("T")
 
 Map = List[List[int]]
 Position = Tuple[int, int]
+# A rectangle of cells, as (min_x, min_y, max_x, max_y), bounds included
+Region = Tuple[int, int, int, int]
@@ -1,65 +1,36 @@
-from typing import Dict, List, Optional
+from typing import List
 
 from mytypes.mytypes import Position
-from mytypes.walkable import Walkable
 
 
 class Node:
     """
     The `node` represents a cell (or a tile) on a collision map. Basically, for each single cell (tile)
     in the collision map passed-in upon initialization, a `node` object will be generated
-    and then cached within the `grid`.
+    and then cached within the `grid` (or materialised on demand, when the `grid` is built in compact mode).
 
-    In the following implementation, nodes can be compared using the `<` operator. The comparison is
-    made with regards of their `f` cost. From a given node being examined, the `pathfinder` will expand the search
-    to the next neighbouring node having the lowest `f` cost. Heaps make use of __lt__ to sort their contents.
+    A node is a plain position: two nodes at the same location are equal. The search state (costs, parents...)
+    is kept in a `SearchContext`, and clearance values in the flat buffers of the `grid`
+    (see @{Grid:get_clearance}).
     """
 
+    __slots__ = ("x", "y")
+
     def __init__(self, x: int, y: int) -> None:
         self.x = x
         self.y = y
-        self.g: Optional[float] = None
-        self.h: Optional[float] = None
-        self.opened = False
-        self.closed = False
-        self.parent: Optional[Node] = None
-        self.clearance: Dict[Walkable, Optional[int]] = {}
-
-    @property
-    def f(self) -> float:
-        return (self.g or 0) + (self.h or 0)
 
     @property
     def position(self) -> Position:
         return self.x, self.y
 
-    def close(self) -> None:
-        self.closed = True
-
-    def open(self) -> None:
-        self.opened = True
-
-    def get_clearance(self, walkable: Walkable) -> Optional[int]:
-        """
-        Returns the amount of true [clearance](http://aigamedev.com/open/tutorial/clearance-based-pathfinding/#TheTrueClearanceMetric)
-        for a given `node`
-        :param string|int|func walkable: the value for walkable locations in the collision map array.
-        :return: int the clearance of the `node`
-        """
-        return self.clearance.get(walkable)
-
-    def remove_clearance(self, walkable: Walkable) -> None:
-        self.clearance[walkable] = None
-
-    def reset(self) -> None:
-        self.g = None
-        self.h = None
-        self.opened = False
-        self.closed = False
-        self.parent = None
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Node):
+            return NotImplemented
+        return self.x == other.x and self.y == other.y
 
-    def __lt__(self, other: "Node") -> bool:
-        return self.f < other.f
+    def __hash__(self) -> int:
+        return hash((self.x, self.y))
 
     def __repr__(self) -> str:
         return f"({self.x}, {self.y})"
@@ -0,0 +1,195 @@
+import heapq
+from typing import Dict, List, Optional, Tuple, Union
+
+from heuristics import diagonal, manhattan
+from interfaces import Heuristic
+from properties import SearchOptions
+
+Entry = Tuple[float, float, int]
+
+
+class OpenList:
+    """
+    Priority queue of the cells a search still has to expand (its *open list*).
+
+    Entries are `(f, h, cell)`, so that ties on `f` are broken in favour of the lowest `h`, i.e. the cell
+    closest to the goal. Every cell has at most one live entry, indexed in `entries`: updating the priority of
+    a cell replaces its entry, and the replaced one is dropped when it reaches the top of the heap.
+    Replaced entries never outnumber the live ones, as the heap is rebuilt from the live entries when they do,
+    so the heap stays within twice the number of cells actually open.
+
+    The heap itself is managed by `heapq`, whose C implementation outperforms a position-indexed heap
+    written in Python, even though the latter never holds outdated entries.
+    """
+
+    def __init__(self) -> None:
+        self.heap: List[Entry] = []
+        self.entries: Dict[int, Entry] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+    def __contains__(self, cell: int) -> bool:
+        return cell in self.entries
+
+    def push(self, cell: int, f: float, h: float) -> None:
+        """
+        Adds a cell to the open list, or updates its priority if it is already there.
+        """
+        entry = self.entries[cell] = (f, h, cell)
+        heap = self.heap
+        heapq.heappush(heap, entry)
+        if len(heap) > 2 * len(self.entries) + 16:
+            self.heap = list(self.entries.values())
+            heapq.heapify(self.heap)
+
+    def peek(self) -> Entry:
+        """
+        Returns the `(f, h, cell)` entry with the lowest priority, without removing it.
+        """
+        heap, entries = self.heap, self.entries
+        while entries.get(heap[0][2]) is not heap[0]:
+            heapq.heappop(heap)
+        return heap[0]
+
+    def pop(self) -> int:
+        """
+        Removes the cell with the lowest priority from the open list, and returns it.
+        """
+        heap, entries = self.heap, self.entries
+        while True:
+            entry = heapq.heappop(heap)
+            cell = entry[2]
+            if entries.get(cell) is entry:
+                del entries[cell]
+                return cell
+
+    def remove(self, cell: int) -> None:
+        """
+        Removes a cell from the open list.
+        """
+        del self.entries[cell]
+
+
+class BucketOpenList:
+    """
+    Open list for non-negative integer priorities, such as 4-connected searches (unit step costs) guided
+    by `manhattan`: cells are kept in one bucket per value of `f`, so pushing and popping take constant time
+    (Dial's algorithm) instead of the logarithmic time of @{OpenList}.
+    Within a bucket, the last cell pushed comes first, which favours the deepest cells, as the `h`
+    tie-breaking of @{OpenList} does.
+
+    Should a non-integer priority be pushed (e.g. by a custom cost evaluator), the open cells are moved into
+    an @{OpenList}, which serves the rest of the search.
+    """
+
+    def __init__(self) -> None:
+        self.buckets: List[List[int]] = []
+        self.entries: Dict[int, Tuple[int, float]] = {}
+        self.current = 0
+        self.fallback: Optional[OpenList] = None
+
+    def __len__(self) -> int:
+        if self.fallback is not None:
+            return len(self.fallback)
+        return len(self.entries)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __contains__(self, cell: int) -> bool:
+        if self.fallback is not None:
+            return cell in self.fallback
+        return cell in self.entries
+
+    def push(self, cell: int, f: float, h: float) -> None:
+        """
+        Adds a cell to the open list, or updates its priority if it is already there.
+        The outdated entry of an updated cell is skipped when its bucket is reached.
+        """
+        if self.fallback is not None:
+            self.fallback.push(cell, f, h)
+            return
+
+        k = int(f)
+        if k != f or k < 0:
+            self._fall_back()
+            self.push(cell, f, h)
+            return
+
+        self.entries[cell] = (k, h)
+        buckets = self.buckets
+        if k >= len(buckets):
+            buckets.extend([] for _ in range(k + 1 - len(buckets)))
+        buckets[k].append(cell)
+        if k < self.current:
+            self.current = k
+
+    def peek(self) -> Entry:
+        """
+        Returns the `(f, h, cell)` entry with the lowest priority, without removing it.
+        """
+        if self.fallback is not None:
+            return self.fallback.peek()
+
+        buckets, entries = self.buckets, self.entries
+        k = self.current
+        while True:
+            bucket = buckets[k]
+            while bucket:
+                cell = bucket[-1]
+                entry = entries.get(cell)
+                if entry is not None and entry[0] == k:
+                    self.current = k
+                    return k, entry[1], cell
+                bucket.pop()
+            k += 1
+
+    def pop(self) -> int:
+        """
+        Removes the cell with the lowest priority from the open list, and returns it.
+        """
+        if self.fallback is not None:
+            return self.fallback.pop()
+
+        _, _, cell = self.peek()
+        # The bucket of the cell is left as the current one
+        self.buckets[self.current].pop()
+        del self.entries[cell]
+        return cell
+
+    def remove(self, cell: int) -> None:
+        """
+        Removes a cell from the open list.
+        """
+        if self.fallback is not None:
+            self.fallback.remove(cell)
+        else:
+            del self.entries[cell]
+
+    def _fall_back(self) -> None:
+        fallback = OpenList()
+        for cell, (f, h) in self.entries.items():
+            fallback.push(cell, f, h)
+        self.fallback = fallback
+        self.buckets = []
+        self.entries = {}
+
+
+AnyOpenList = Union[OpenList, BucketOpenList]
+
+# Heuristics taking integer values on integer coordinates
+INTEGER_HEURISTICS = (manhattan, diagonal)
+
+
+def create_open_list(options: SearchOptions, heuristic: Heuristic) -> AnyOpenList:
+    """
+    Returns the open list best suited for a search: a @{BucketOpenList} when all priorities are integers,
+    i.e. diagonal moves are forbidden and the `heuristic` is integer-valued, an @{OpenList} otherwise.
+    """
+    if not options.allow_diagonal and heuristic in INTEGER_HEURISTICS:
+        return BucketOpenList()
+    return OpenList()
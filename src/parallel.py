@@ -0,0 +1,190 @@
+"""
+Pathfinding over a pool of processes.
+
+Searches are CPU bound, so threads can't run them in parallel, and processes can't receive a `grid` efficiently:
+walkables are often lambdas, which can't be pickled, and pickling a large `grid` for every batch costs more than
+the searches. A @{ProcessPathfinder} instead copies what searches read (the walkability bitmaps and the
+clearance values) once into shared memory, which every worker process reads in place.
+"""
+
+import os
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from grid import Grid
+from interfaces import Heuristic, Searcher
+from mytypes.mytypes import Position
+from pathfinder import Pathfinder
+from properties import AgentCharacteristics
+from search import astar
+
+# Walkable of the `grid` rebuilt in the workers: their bitmaps already tell the walkable cells
+WALKABLE = 1
+
+# Default number of requests sent to a worker at once
+CHUNK_SIZE = 256
+
+# State of a worker process: the shared memory it attached to, its `grid`, pathfinder and agent
+_worker: Dict[str, Any] = {}
+
+
+class ProcessPathfinder:
+    """
+    Solves batches of requests on a pool of processes, over a snapshot of a `grid` taken when the pathfinder
+    is created (create another one once the `grid` changed). Use it as a context manager, or call
+    @{ProcessPathfinder:close} once done, to stop the processes and free the shared memory.
+
+    Paths come back as compact arrays of coordinates, `array("i", [x0, y0, x1, y1, ...])`, rather than as
+    paths of nodes, so that sending them back to the main process stays cheap.
+    """
+
+    def __init__(
+        self,
+        finder: Optional[Searcher],
+        grid: Grid,
+        agent_characteristics: AgentCharacteristics,
+        processes: Optional[int] = None,
+        **kwargs: Any,
+    ) -> None:
+        """
+        :param finder: the searcher run by the workers. It must be picklable, as module-level functions are
+        :param processes: the number of worker processes. Defaults to the number of cores
+        :param kwargs: the options of the searches, as for a @{Pathfinder}
+        """
+        walkable, clearance = (
+            agent_characteristics.walkable,
+            agent_characteristics.clearance,
+        )
+        self.width, self.height = grid.width, grid.height
+
+        # Layout of the shared memory: the plain bitmap, the bitmap of the clearance, the clearance values
+        buffers: List[bytes] = [bytes(grid.compile_walkable(walkable))]
+        if clearance:
+            buffers.append(bytes(grid.compile_walkable(walkable, clearance)))
+            if walkable in grid.clearance:
+                buffers.append(grid.clearance[walkable].tobytes())
+        self.memory = shared_memory.SharedMemory(
+            create=True, size=max(sum(len(b) for b in buffers), 1)
+        )
+        shared = self.memory.buf
+        assert shared is not None
+        offset, layout = 0, []
+        for buffer in buffers:
+            shared[offset : offset + len(buffer)] = buffer
+            layout.append((offset, len(buffer)))
+            offset += len(buffer)
+
+        # The executor can't check the arguments of the initializer against it
+        initializer: Callable[..., None] = _attach
+        self.executor = ProcessPoolExecutor(
+            max_workers=processes or os.cpu_count(),
+            initializer=initializer,
+            initargs=(
+                self.memory.name,
+                layout,
+                self.width,
+                self.height,
+                clearance,
+                finder or astar.search,
+                kwargs,
+            ),
+        )
+
+    def __enter__(self) -> "ProcessPathfinder":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stops the worker processes, and frees the shared memory.
+        """
+        self.executor.shutdown()
+        self.memory.close()
+        self.memory.unlink()
+
+    def get_paths(
+        self,
+        requests: Iterable[Tuple[Position, Position]],
+        heuristic: Optional[Heuristic] = None,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> Iterator[Tuple[int, Optional[array]]]:
+        """
+        Calculates the paths of a batch of requests, given as (start, goal) pairs, as
+        @{Pathfinder:get_paths} does. Requests are sent to the workers by chunks of `chunk_size`,
+        and paths are yielded as soon as their chunk is done.
+
+        :param heuristic: the heuristic of the searches. It must be picklable, as the built-in ones are
+        :return: an iterator over the (index of the request, coordinates of the path or None) pairs
+        """
+        futures: List[Future] = []
+        chunk = array("i")
+        for i, (start, end) in enumerate(requests):
+            chunk.extend((i, start[0], start[1], end[0], end[1]))
+            if len(chunk) == 5 * chunk_size:
+                futures.append(self.executor.submit(_solve, chunk, heuristic))
+                chunk = array("i")
+        if chunk:
+            futures.append(self.executor.submit(_solve, chunk, heuristic))
+
+        for future in as_completed(futures):
+            indices, offsets, coordinates = future.result()
+            for k, i in enumerate(indices):
+                path = coordinates[offsets[k] : offsets[k + 1]]
+                yield i, path if path else None
+
+
+def _attach(
+    name: str,
+    layout: List[Tuple[int, int]],
+    width: int,
+    height: int,
+    clearance: int,
+    finder: Searcher,
+    options: Dict[str, Any],
+) -> None:
+    """
+    Initialises a worker process: attaches to the shared memory, and builds a `grid` over it.
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    shared = memory.buf
+    assert shared is not None
+    views = [shared[offset : offset + size] for offset, size in layout]
+    bitmaps: Dict[Optional[int], Any] = {None: views[0]}
+    values = None
+    if clearance:
+        bitmaps[clearance] = views[1]
+        if len(views) > 2:
+            values = views[2].cast("H")
+
+    _worker["memory"] = memory
+    _worker["grid"] = Grid.from_bitmaps(width, height, WALKABLE, bitmaps, values)
+    _worker["finder"] = Pathfinder(finder, **options)
+    _worker["agent"] = AgentCharacteristics(WALKABLE, clearance)
+
+
+def _solve(chunk: array, heuristic: Optional[Heuristic]) -> Tuple[array, array, array]:
+    """
+    Solves a chunk of requests within a worker. Returns the indices of the requests, the offsets of their
+    paths within the coordinates (plus a last offset closing the last path, and an empty path when none
+    was found), and the coordinates of all the paths.
+    """
+    grid, finder, agent = _worker["grid"], _worker["finder"], _worker["agent"]
+    indices, offsets, coordinates = array("i"), array("q"), array("i")
+    requests = [
+        (chunk[k], (chunk[k + 1], chunk[k + 2]), (chunk[k + 3], chunk[k + 4]))
+        for k in range(0, len(chunk), 5)
+    ]
+    for i, path in finder.get_paths(
+        grid, [(start, end) for _, start, end in requests], agent, heuristic
+    ):
+        indices.append(requests[i][0])
+        offsets.append(len(coordinates))
+        if path is not None:
+            for node in path.nodes:
+                coordinates.extend((node.x, node.y))
+    offsets.append(len(coordinates))
+    return indices, offsets, coordinates
@@ -1,8 +1,10 @@
 from typing import Iterable, List, Optional
 
+from context import SearchContext
 from grid import Grid
 from heuristics import euclidean
 from node import Node
+from properties import AgentCharacteristics
 
 
 class Path:
@@ -66,6 +68,26 @@ class Path:
             except IndexError:
                 break
 
+    def smooth(self, grid: Grid, agent_characteristics: AgentCharacteristics) -> None:
+        """
+        `Path` smoothing modifier. Pulls the `path` taut, skipping every node the last node kept has a line of
+        sight past (see `thetastar.line_of_sight`), so that the staircases of A* or Jump Point Search paths turn
+        into any-angle moves like those of Theta*. A single line of sight check is made per node.
+        """
+        from search.thetastar import line_of_sight
+
+        if len(self.nodes) < 3:
+            return
+        nodes = [self.nodes[0]]
+        for i in range(2, len(self.nodes)):
+            previous_node = self.nodes[i - 1]
+            if previous_node is not nodes[-1] and not line_of_sight(
+                nodes[-1], self.nodes[i], grid, agent_characteristics
+            ):
+                nodes.append(previous_node)
+        nodes.append(self.nodes[-1])
+        self.nodes = nodes
+
     def add_node(self, node: Node) -> None:
         self.nodes.append(node)
 
@@ -79,13 +101,17 @@ class Path:
         self.nodes.reverse()
 
 
-def trace_back_path(grid: Grid, node: Node, start_node: Node) -> Path:
+def trace_back_path(
+    grid: Grid, node: Node, start_node: Node, context: SearchContext
+) -> Path:
     path = Path()
     path.grid = grid
-    while True:
-        if node.parent:
-            path.nodes.insert(0, node)
-            node = node.parent
-        else:
-            path.nodes.insert(0, start_node)
-            return path
+    parent = context.parent
+    i = grid.index(node.x, node.y)
+    while parent[i] != -1:
+        path.nodes.append(grid.get_node_at_index(i))
+        i = parent[i]
+
+    path.nodes.append(start_node)
+    path.reverse()
+    return path
@@ -0,0 +1,148 @@
+"""
+Cache of the paths found by a `pathfinder`, for the queries asked again and again.
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from grid import Grid
+from mytypes.mytypes import Position, Region
+from path import Path
+
+
+class _Entry:
+    __slots__ = ("path", "version", "start", "end", "margin", "cost", "size")
+
+    def __init__(
+        self,
+        path: Optional[Path],
+        version: int,
+        start: Position,
+        end: Position,
+        clearance: int,
+    ) -> None:
+        self.path = path
+        self.version = version
+        self.start = start
+        self.end = end
+        # A cell change also affects the clearance of the cells up to `clearance` above and left of it,
+        # and the diagonal moves going round it
+        self.margin = (clearance or 0) + 1
+        self.cost = path.length if path is not None else math.inf
+        self.size = len(path.nodes) if path is not None else 0
+
+
+class PathCache:
+    """
+    Least recently used cache of paths, holding at most `max_entries` paths and `max_nodes` nodes overall.
+
+    Each path is kept along with the `version` of the `grid` it was found on. When the `grid` changed since,
+    the path is kept only if none of the modified regions lies within the area a path between its ends must
+    stay in to be as short as it is, i.e. the cells whose distance to both ends sums up to at most its
+    cost: a change elsewhere can neither block the path nor open a shorter one. Queries having no path
+    are dropped on any change.
+    """
+
+    def __init__(
+        self, max_entries: int = 1024, max_nodes: Optional[int] = None
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, grid: Grid) -> Tuple[bool, Optional[Path]]:
+        """
+        Looks up the path cached for a query. Returns whether it was found, and a copy of the path (None when
+        the query has no path).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry.version != grid.version:
+                if not _is_valid(entry, grid):
+                    self._remove(key)
+                    return False, None
+                entry.version = grid.version
+            self._entries.move_to_end(key)
+            return True, _copy(entry.path)
+
+    def put(
+        self,
+        key: Hashable,
+        grid: Grid,
+        start: Position,
+        end: Position,
+        clearance: int,
+        path: Optional[Path],
+    ) -> None:
+        """
+        Caches the `path` found for a query on the current version of the `grid`, evicting the least
+        recently used paths beyond the limits.
+        """
+        entry = _Entry(
+            _copy(path), grid.version, (start[0], start[1]), (end[0], end[1]), clearance
+        )
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self.nodes += entry.size
+            while len(self._entries) > self.max_entries or (
+                self.max_nodes is not None and self.nodes > self.max_nodes
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nodes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        self.nodes -= self._entries.pop(key).size
+
+
+def _is_valid(entry: _Entry, grid: Grid) -> bool:
+    """
+    Tells whether the path of an `entry` is still the one a search would find on the `grid`.
+    """
+    regions = grid.modifications_since(entry.version)
+    if regions is None:
+        return False
+    if entry.path is None:
+        return not regions
+
+    margin, cost = entry.margin, entry.cost + 1e-9
+    for x0, y0, x1, y1 in regions:
+        region = (x0 - margin, y0 - margin, x1 + margin, y1 + margin)
+        if _distance(entry.start, region) + _distance(entry.end, region) <= cost:
+            return False
+    return True
+
+
+def _distance(position: Position, region: Region) -> float:
+    """
+    Returns the straight-line distance from a `position` to the closest cell of a `region`.
+    """
+    x, y = position
+    x0, y0, x1, y1 = region
+    return math.hypot(max(x0 - x, 0, x - x1), max(y0 - y, 0, y - y1))
+
+
+def _copy(path: Optional[Path]) -> Optional[Path]:
+    """
+    Copies a `path`, so that the cached one is not altered by the modifiers applied to the paths returned.
+    """
+    if path is None:
+        return None
+    copy = Path()
+    copy.grid = path.grid
+    copy.nodes = list(path.nodes)
+    return copy
@@ -1,24 +1,77 @@
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import path
+from context import SearchContextPool
 from grid import Grid
 from heuristics import manhattan
-from interfaces import Heuristic, Searcher
+from interfaces import Heuristic, Searcher, SteppedSearcher
 from mytypes.mytypes import Position
 from node import Node
+from openlist import create_open_list
 from path import Path
+from pathcache import PathCache
 from properties import AgentCharacteristics, SearchOptions
-from search import astar
+from resumable import AnytimeSearch, ResumableSearch
+from scheduler import SLICE_EXPANSIONS, SearchScheduler
+from search import (
+    arastar,
+    astar,
+    bidirectional,
+    dijkstra,
+    jps,
+    lazythetastar,
+    thetastar,
+)
+from search.dstarlite import DStarLite
+
+# Searchers returning shortest paths moving from cell to cell, as distance fields do
+SHORTEST_PATH_SEARCHERS = (astar.search, bidirectional.search)
+
+# Searchers able to run one expansion at a time, along with the function doing so
+STEPPED_SEARCHERS: Dict[Callable[..., Optional[Node]], SteppedSearcher] = {
+    astar.search: astar.iterate,
+    jps.search: jps.iterate,
+    thetastar.search: thetastar.iterate,
+    lazythetastar.search: lazythetastar.iterate,
+}
+
+# Least number of requests sharing an end for a single sweep from that end to serve them all
+BATCH_GROUP_SIZE = 4
 
 
 class Pathfinder:
+    """
+    Runs searches over a `grid`. The pathfinder keeps no state from one query to another
+    (each query works on its own `SearchContext`, taken from a pool), so a single pathfinder
+    and a single annotated `grid` can be shared between threads.
+
+    Each query gets the open list best suited to it (see `openlist.create_open_list`): searches with
+    integer costs, i.e. without diagonal moves and with an integer heuristic such as `manhattan`,
+    use a bucket queue.
+
+    When given a `cache_size` (and optionally a `cache_nodes` limit), the pathfinder keeps the paths it finds
+    in a @{PathCache}, and answers the queries asked again from it as long as the `grid` did not change
+    around their paths.
+    """
+
     def __init__(self, finder: Searcher, **kwargs: Any) -> None:
         self.finder = finder or astar.search
         self.options = SearchOptions(
             allow_diagonal=kwargs.get("allow_diagonal", True),
             tunneling=kwargs.get("tunneling", False),
+            max_expansions=kwargs.get("max_expansions"),
+            max_cost=kwargs.get("max_cost"),
+            max_time=kwargs.get("max_time"),
+            partial_paths=kwargs.get("partial_paths", False),
+            sight_cache_size=kwargs.get("sight_cache_size", 0),
+        )
+        self.contexts = SearchContextPool()
+        self.cache: Optional[PathCache] = None
+        if kwargs.get("cache_size"):
+            self.cache = PathCache(kwargs["cache_size"], kwargs.get("cache_nodes"))
+        self.scheduler = SearchScheduler(
+            kwargs.get("slice_expansions", SLICE_EXPANSIONS)
         )
-        self.to_clear: Dict[Node, bool] = {}
 
     def get_path(
         self,
@@ -38,25 +91,267 @@ class Pathfinder:
         :param int clearance: the amount of clearance (i.e the pathing agent size) to consider
         :return path: a path (array of nodes) when found, otherwise None
         """
-        self.reset()
-        start_node = grid.get_node_at(start_position[0], start_position[1])
-        end_node = grid.get_node_at(end_position[0], end_position[1])
+        start_node = _node_at(grid, start_position)
+        end_node = _node_at(grid, end_position)
+
+        heuristic = heuristic or manhattan
+        # Paths of searches stopped by a limit depend on how far they went
+        if self.cache is not None and not self.options.limited:
+            key = (
+                grid,
+                start_node.position,
+                end_node.position,
+                agent_characteristics.walkable,
+                agent_characteristics.clearance,
+                self.options.allow_diagonal,
+                self.options.tunneling,
+                self.finder,
+                heuristic,
+            )
+            found, cached = self.cache.get(key, grid)
+            if found:
+                return cached
+
+            result = self._search(
+                grid, start_node, end_node, agent_characteristics, heuristic
+            )
+            self.cache.put(
+                key,
+                grid,
+                start_node.position,
+                end_node.position,
+                agent_characteristics.clearance,
+                result,
+            )
+            return result
+
+        return self._search(
+            grid, start_node, end_node, agent_characteristics, heuristic
+        )
+
+    def get_paths(
+        self,
+        grid: Grid,
+        requests: Iterable[Tuple[Position, Position]],
+        agent_characteristics: AgentCharacteristics,
+        heuristic: Optional[Heuristic] = None,
+    ) -> Iterator[Tuple[int, Optional[Path]]]:
+        """
+        Calculates the paths of a batch of requests, given as (start, goal) pairs. Paths are yielded as soon as
+        found, not in the order of the requests: each one comes along with the index of its request.
+
+        When the searcher returns shortest paths (see `SHORTEST_PATH_SEARCHERS`), the requests sharing a goal,
+        or a start, are served together by a single sweep from that end (see @{dijkstra.distance_field})
+        rather than by a search each. Paths are then as short as the ones of @{Pathfinder:get_path},
+        though they may take other moves when several paths are as short.
+
+        :param requests: the (start, goal) positions of each path
+        :return: an iterator over the (index of the request, path found or None) pairs
+        """
+        pending = {
+            i: ((start[0], start[1]), (end[0], end[1]))
+            for i, (start, end) in enumerate(requests)
+        }
+
+        if self._shares_sweeps(agent_characteristics):
+            walkable, clearance = (
+                agent_characteristics.walkable,
+                agent_characteristics.clearance,
+            )
+            groups: Dict[Tuple[bool, Position], List[int]] = {}
+            for i, (start, end) in pending.items():
+                if start == end:
+                    continue
+                groups.setdefault((True, start), []).append(i)
+                # Unlike the searches, a sweep from an unwalkable goal would leave it
+                if grid.is_walkable(*end, walkable, clearance):
+                    groups.setdefault((False, end), []).append(i)
+
+            for (from_start, position), indices in sorted(
+                groups.items(), key=lambda group: -len(group[1])
+            ):
+                if len(indices) < BATCH_GROUP_SIZE:
+                    break
+                indices = [i for i in indices if i in pending]
+                if len(indices) < BATCH_GROUP_SIZE:
+                    continue
+
+                field = dijkstra.distance_field(
+                    grid, [position], agent_characteristics, self.options
+                )
+                for i in indices:
+                    start, end = pending.pop(i)
+                    if from_start:
+                        # Searches never enter an unwalkable goal
+                        path = None
+                        if grid.is_walkable(*end, walkable, clearance):
+                            path = field.path(*end)
+                        if path is not None:
+                            path.reverse()
+                    else:
+                        path = field.path(*start)
+                    yield i, path
 
-        _end_node = self.finder(
+        for i, (start, end) in pending.items():
+            yield i, self.get_path(grid, start, end, agent_characteristics, heuristic)
+
+    def start_search(
+        self,
+        grid: Grid,
+        start_position: Position,
+        end_position: Position,
+        agent_characteristics: AgentCharacteristics,
+        heuristic: Optional[Heuristic] = None,
+    ) -> ResumableSearch:
+        """
+        Starts a search without running it: the @{ResumableSearch} returned is advanced by calls to its
+        `step` method, each one within a budget of expanded nodes or of time, e.g. once per frame.
+        Only the searchers listed in `STEPPED_SEARCHERS` can be run this way.
+
+        :return: the search in progress, whose `path` is set once `done`
+        """
+        iterate = STEPPED_SEARCHERS.get(self.finder)
+        if iterate is None:
+            raise ValueError(f"{self.finder} can't run one expansion at a time")
+
+        start_node = _node_at(grid, start_position)
+        end_node = _node_at(grid, end_position)
+        heuristic = heuristic or manhattan
+        context = self.contexts.acquire(grid.size)
+        steps = iterate(
             grid,
             self.options,
             start_node,
             end_node,
             agent_characteristics,
-            self.to_clear,
-            heuristic=heuristic or manhattan,
-        )
-        if _end_node:
-            return path.trace_back_path(grid, _end_node, start_node)
-        else:
-            return None
-
-    def reset(self) -> None:
-        for node, _ in self.to_clear.items():
-            node.reset()
-        self.to_clear = {}
+            context,
+            heuristic=heuristic,
+            openlist=create_open_list(self.options, heuristic),
+        )
+        return ResumableSearch(grid, start_node, steps, context, self.contexts)
+
+    def start_anytime_search(
+        self,
+        grid: Grid,
+        start_position: Position,
+        end_position: Position,
+        agent_characteristics: AgentCharacteristics,
+        heuristic: Optional[Heuristic] = None,
+        weight: float = arastar.INITIAL_WEIGHT,
+        weight_step: float = arastar.WEIGHT_STEP,
+    ) -> AnytimeSearch:
+        """
+        Starts an anytime search (ARA*, see `arastar`), whatever the searcher of the pathfinder: the
+        @{AnytimeSearch} returned finds a first path with a heuristic inflated by `weight`, then improves it with
+        each call to its `improve` method, lowering the weight by `weight_step` each time, down to 1.
+
+        :return: the search in progress, whose `path` is set once a first path is found, along with its `bound`
+        """
+        start_node = _node_at(grid, start_position)
+        end_node = _node_at(grid, end_position)
+        context = self.contexts.acquire(grid.size)
+        anytime = arastar.AnytimeAStar(
+            grid,
+            self.options,
+            start_node,
+            end_node,
+            agent_characteristics,
+            context,
+            heuristic or manhattan,
+            weight,
+            weight_step,
+        )
+        return AnytimeSearch(grid, start_node, anytime, context, self.contexts)
+
+    def incremental_planner(
+        self,
+        grid: Grid,
+        start_position: Position,
+        end_position: Position,
+        agent_characteristics: AgentCharacteristics,
+        heuristic: Optional[Heuristic] = None,
+    ) -> DStarLite:
+        """
+        Creates a planner (D* Lite, see `dstarlite`) for an agent heading to `end_position` across a `grid` that
+        changes while the agent walks, whatever the searcher of the pathfinder. Its `get_path` method, called with
+        the current position of the agent, repairs the previous plan rather than searching from scratch.
+
+        :return: the planner, whose first call to `get_path` runs the initial search
+        """
+        return DStarLite(
+            grid,
+            start_position,
+            end_position,
+            agent_characteristics,
+            self.options,
+            heuristic or manhattan,
+        )
+
+    async def get_path_async(
+        self,
+        grid: Grid,
+        start_position: Position,
+        end_position: Position,
+        agent_characteristics: AgentCharacteristics,
+        heuristic: Optional[Heuristic] = None,
+        priority: float = 0,
+        deadline: Optional[float] = None,
+    ) -> Optional[Path]:
+        """
+        Same as @{Pathfinder:get_path}, without blocking the event loop: the search is run by slices among
+        the other ones in progress, by the `scheduler` of the pathfinder (see @{SearchScheduler}).
+        Only the searchers listed in `STEPPED_SEARCHERS` can be run this way.
+
+        :param priority: searches with lower values are served first
+        :param deadline: the time (of the event loop, see `loop.time()`) at which the search is given up,
+          raising an `asyncio.TimeoutError`
+        :return path: a path (array of nodes) when found, otherwise None
+        """
+        search = self.start_search(
+            grid, start_position, end_position, agent_characteristics, heuristic
+        )
+        return await self.scheduler.submit(search, priority, deadline)
+
+    def _shares_sweeps(self, agent_characteristics: AgentCharacteristics) -> bool:
+        """
+        Tells whether a distance field finds the same paths as the searcher. Searches check the diagonal moves
+        against the cells themselves, not their clearance (as distance fields do).
+        """
+        if self.finder not in SHORTEST_PATH_SEARCHERS or self.options.limited:
+            return False
+        return not (
+            agent_characteristics.clearance
+            and self.options.allow_diagonal
+            and not self.options.tunneling
+        )
+
+    def _search(
+        self,
+        grid: Grid,
+        start_node: Node,
+        end_node: Node,
+        agent_characteristics: AgentCharacteristics,
+        heuristic: Heuristic,
+    ) -> Optional[Path]:
+        with self.contexts.borrow(grid.size) as context:
+            _end_node = self.finder(
+                grid,
+                self.options,
+                start_node,
+                end_node,
+                agent_characteristics,
+                context,
+                heuristic=heuristic,
+                openlist=create_open_list(self.options, heuristic),
+            )
+            if _end_node:
+                return path.trace_back_path(grid, _end_node, start_node, context)
+            else:
+                return None
+
+
+def _node_at(grid: Grid, position: Position) -> Node:
+    node = grid.get_node_at(*position)
+    if node is None:
+        raise IndexError(f"Cell {position} is out of the grid")
+    return node
@@ -1,12 +1,58 @@
+import time
 from dataclasses import dataclass
+from typing import Optional
 
 from mytypes.walkable import Walkable
 
 
 @dataclass
 class SearchOptions:
+    """
+    Options of the searches.
+
+    Args:
+        :param bool allow_diagonal: whether diagonal moves are allowed
+        :param bool tunneling: whether diagonal moves can squeeze between two unwalkable cells
+        :param int max_expansions: when given, searches stop after expanding that many nodes
+        :param float max_cost: when given, searches stop once no path can cost less than that
+        :param float max_time: when given, searches stop after that many seconds
+        :param bool partial_paths: whether searches stopped by a limit return the path to the node they
+          expanded closest to the goal (by the heuristic), rather than no path at all
+        :param int sight_cache_size: when positive, the any-angle searches keep up to that many line of sight
+          results on the `grid` (see `thetastar.LineOfSightCache`)
+
+    Limits are honoured by the searchers built on `astar` and `jps` (including `thetastar` and `jpsplus`).
+    """
+
     allow_diagonal: bool
     tunneling: bool
+    max_expansions: Optional[int] = None
+    max_cost: Optional[float] = None
+    max_time: Optional[float] = None
+    partial_paths: bool = False
+    sight_cache_size: int = 0
+
+    @property
+    def limited(self) -> bool:
+        return (
+            self.max_expansions is not None
+            or self.max_cost is not None
+            or self.max_time is not None
+        )
+
+    def limit_reached(self, expansions: int, cost: float, started: float) -> bool:
+        """
+        Tells whether a search must stop, having expanded `expansions` nodes since it `started`
+        (as given by `time.perf_counter`), when the next node to expand costs at least `cost`.
+        """
+        return (
+            (self.max_expansions is not None and expansions >= self.max_expansions)
+            or (self.max_cost is not None and cost > self.max_cost)
+            or (
+                self.max_time is not None
+                and time.perf_counter() - started >= self.max_time
+            )
+        )
 
 
 @dataclass
@@ -0,0 +1,164 @@
+"""
+Searches spread over time, for callers having a fixed budget per frame (or per tick) to spend on pathfinding.
+"""
+
+import math
+import time
+from typing import Optional
+
+import path
+from context import SearchContext, SearchContextPool
+from grid import Grid
+from interfaces import SearchSteps
+from node import Node
+from path import Path
+from search.arastar import AnytimeAStar
+
+
+class ResumableSearch:
+    """
+    A search in progress, advanced by calls to @{ResumableSearch:step} until `done`, after which
+    `path` holds the path found (None when there is none). Create them with @{Pathfinder:start_search}.
+
+    The search keeps a `SearchContext` from the pool of its pathfinder until done (or cancelled), so many
+    searches can be in progress at once, each one on its own state. The `grid` must not change meanwhile.
+    """
+
+    def __init__(
+        self,
+        grid: Grid,
+        start_node: Node,
+        steps: SearchSteps,
+        context: SearchContext,
+        contexts: SearchContextPool,
+    ) -> None:
+        self.grid = grid
+        self.start_node = start_node
+        self.steps: Optional[SearchSteps] = steps
+        self.context: Optional[SearchContext] = context
+        self.contexts = contexts
+        self.expansions = 0
+        self.done = False
+        self.path: Optional[Path] = None
+
+    def step(
+        self, max_expansions: Optional[int] = None, max_time: Optional[float] = None
+    ) -> bool:
+        """
+        Advances the search by at most `max_expansions` expanded nodes, and for at most `max_time` seconds
+        (checked after each expansion, so an expansion in progress is never interrupted).
+        Without any limit, runs the search to its end.
+
+        :return: whether the search is done
+        """
+        if self.steps is None:
+            return self.done
+
+        deadline = time.perf_counter() + max_time if max_time is not None else None
+        steps, expanded = self.steps, 0
+        try:
+            while max_expansions is None or expanded < max_expansions:
+                next(steps)
+                expanded += 1
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+        except StopIteration as stop:
+            self._finish(stop.value)
+        self.expansions += expanded
+        return self.done
+
+    def cancel(self) -> None:
+        """
+        Gives up the search, releasing its context. The search is then done, without any path.
+        """
+        if self.steps is not None:
+            self.steps.close()
+            self._finish(None)
+
+    def _finish(self, end_node: Optional[Node]) -> None:
+        context = self.context
+        assert context is not None
+        if end_node is not None:
+            self.path = path.trace_back_path(
+                self.grid, end_node, self.start_node, context
+            )
+        self.contexts.release(context)
+        self.steps = self.context = None
+        self.done = True
+
+
+class AnytimeSearch:
+    """
+    An anytime search in progress (see `arastar`), whose `path` improves with each call to
+    @{AnytimeSearch:improve}: the first path comes quickly, later ones get shorter. Its `bound` tells how far the
+    `path` can be from the shortest one, as the ratio of their costs. Create them with
+    @{Pathfinder:start_anytime_search}.
+
+    As a @{ResumableSearch} does, the search keeps a `SearchContext` until done (or cancelled), and the `grid`
+    must not change meanwhile. It can be stopped at any time, keeping the best path found so far.
+    """
+
+    def __init__(
+        self,
+        grid: Grid,
+        start_node: Node,
+        anytime: AnytimeAStar,
+        context: SearchContext,
+        contexts: SearchContextPool,
+    ) -> None:
+        self.grid = grid
+        self.start_node = start_node
+        self.anytime: Optional[AnytimeAStar] = anytime
+        self.context: Optional[SearchContext] = context
+        self.contexts = contexts
+        self.expansions = 0
+        self.path: Optional[Path] = None
+        self.bound = math.inf
+        self.done = False
+
+    def improve(
+        self, max_expansions: Optional[int] = None, max_time: Optional[float] = None
+    ) -> bool:
+        """
+        Improves the path for at most `max_expansions` expanded nodes, and for at most `max_time` seconds.
+        Without any limit, improves it once, i.e. until a path better than the current one is proven
+        within a lower `bound`.
+
+        :return: whether the search is done, i.e. whether the `path` is the shortest one (or there is none)
+        """
+        anytime = self.anytime
+        if anytime is None:
+            return self.done
+
+        deadline = time.perf_counter() + max_time if max_time is not None else None
+        expansions = anytime.expansions
+        if anytime.improve(max_expansions, deadline) and anytime.found:
+            self.bound = anytime.bound
+            self._trace()
+        self.expansions += anytime.expansions - expansions
+        if anytime.done:
+            self._release()
+        return self.done
+
+    def cancel(self) -> None:
+        """
+        Stops improving the path, releasing the context. The search is then done, with the best path found so far.
+        """
+        if self.anytime is not None:
+            if self.anytime.found:
+                self._trace()
+            self._release()
+
+    def _trace(self) -> None:
+        anytime, context = self.anytime, self.context
+        assert anytime is not None and context is not None
+        self.path = path.trace_back_path(
+            self.grid, anytime.end_node, self.start_node, context
+        )
+
+    def _release(self) -> None:
+        context = self.context
+        assert context is not None
+        self.contexts.release(context)
+        self.anytime = self.context = None
+        self.done = True
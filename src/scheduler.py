@@ -0,0 +1,106 @@
+"""
+Scheduling of many searches on an asyncio event loop.
+"""
+
+import asyncio
+import heapq
+import itertools
+from typing import List, Optional, Tuple
+
+from path import Path
+from resumable import ResumableSearch
+
+# Default number of nodes a search expands before letting the others (and the event loop) run
+SLICE_EXPANSIONS = 64
+
+# Position of a search in the queue: (priority, deadline, order of arrival)
+_Rank = Tuple[float, float, int]
+
+
+class _Job:
+    __slots__ = ("search", "future", "priority", "deadline")
+
+    def __init__(
+        self,
+        search: ResumableSearch,
+        future: "asyncio.Future[Optional[Path]]",
+        priority: float,
+        deadline: Optional[float],
+    ) -> None:
+        self.search = search
+        self.future = future
+        self.priority = priority
+        self.deadline = deadline
+
+
+class SearchScheduler:
+    """
+    Runs searches in progress (see @{ResumableSearch}) on the running event loop, by slices of
+    `slice_expansions` expanded nodes, yielding to the event loop between slices: no search holds the loop
+    for longer than a slice, whatever its length.
+
+    The next slice goes to the search with the lowest `priority` value, then to the one whose deadline comes
+    first; searches of equal priority and deadline take turns. A search still running at its deadline is
+    cancelled, and its awaiter gets an `asyncio.TimeoutError`.
+    """
+
+    def __init__(self, slice_expansions: int = SLICE_EXPANSIONS) -> None:
+        self.slice_expansions = slice_expansions
+        self._queue: List[Tuple[_Rank, _Job]] = []
+        self._order = itertools.count()
+        self._runner: Optional["asyncio.Task[None]"] = None
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def submit(
+        self,
+        search: ResumableSearch,
+        priority: float = 0,
+        deadline: Optional[float] = None,
+    ) -> "asyncio.Future[Optional[Path]]":
+        """
+        Queues a search. Must be called from a coroutine running on the event loop.
+
+        :param priority: searches with lower values are served first
+        :param deadline: the time (of the event loop, see `loop.time()`) at which the search is given up
+        :return: a future set to the path found (None when there is none)
+        """
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[Optional[Path]]" = loop.create_future()
+        self._push(_Job(search, future, priority, deadline))
+        if self._runner is None or self._runner.done():
+            self._runner = loop.create_task(self._run())
+        return future
+
+    def _push(self, job: _Job) -> None:
+        deadline = job.deadline if job.deadline is not None else float("inf")
+        rank = (job.priority, deadline, next(self._order))
+        heapq.heappush(self._queue, (rank, job))
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._queue:
+            _, job = heapq.heappop(self._queue)
+            search, future = job.search, job.future
+            if future.done():
+                # The awaiter gave up
+                search.cancel()
+                continue
+            if job.deadline is not None and loop.time() >= job.deadline:
+                search.cancel()
+                future.set_exception(asyncio.TimeoutError())
+                continue
+
+            try:
+                done = search.step(self.slice_expansions)
+            except Exception as error:
+                search.cancel()
+                future.set_exception(error)
+                continue
+
+            if done:
+                future.set_result(search.path)
+            else:
+                self._push(job)
+            await asyncio.sleep(0)
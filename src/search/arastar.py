@@ -0,0 +1,227 @@
+# Anytime Repairing A* (ARA*) algorithm
+# A series of weighted A* searches (`f = g + weight * h`), the first one finding a path quickly, each following one
+# lowering the weight and reusing the costs found so far: only the nodes whose cost improved since they were
+# expanded are expanded again. See
+# [Likhachev & al., ARA*: Anytime A* with Provable Bounds on Sub-Optimality](https://papers.nips.cc/paper/2382-ara-anytime-a-with-provable-bounds-on-sub-optimality)
+import math
+import time
+from typing import List, Optional, Set
+
+from context import CLOSED, OPENED, SearchContext
+from grid import Grid
+from heuristics import euclidean
+from interfaces import Heuristic
+from node import Node
+from openlist import AnyOpenList, OpenList
+from properties import AgentCharacteristics, SearchOptions
+
+# Weight of the heuristic for the first path, and how much it is lowered after each path
+INITIAL_WEIGHT = 3.0
+WEIGHT_STEP = 0.5
+
+
+class AnytimeAStar:
+    """
+    State of an ARA* search from `start_node` to `end_node`, improved by calls to @{AnytimeAStar:improve}.
+
+    Once `found`, the parents of the `context` lead from `end_node` back to `start_node`, along a path costing at
+    most `bound` times the cost of the shortest one (provided the `heuristic` never overestimates). Later
+    improvements only shorten that path, so it can be traced at any time, even in the middle of an improvement.
+    The search is `done` once the path is proven the shortest (`bound` is 1), or once every reachable node has
+    been expanded without reaching `end_node`.
+    """
+
+    def __init__(
+        self,
+        grid: Grid,
+        options: SearchOptions,
+        start_node: Node,
+        end_node: Node,
+        agent_characteristics: AgentCharacteristics,
+        context: SearchContext,
+        heuristic: Heuristic,
+        weight: float = INITIAL_WEIGHT,
+        weight_step: float = WEIGHT_STEP,
+    ) -> None:
+        self.grid = grid
+        self.options = options
+        self.end_node = end_node
+        self.agent_characteristics = agent_characteristics
+        self.context = context
+        self.heuristic = heuristic
+        self.weight = max(weight, 1.0)
+        self.weight_step = weight_step
+        self.openlist = OpenList()
+        # Nodes whose cost improved after they were expanded during the current pass, and their lowest `g + h`
+        self.inconsistent: Set[int] = set()
+        self.inconsistent_f = math.inf
+        self.closed: List[int] = []
+        self.bound = math.inf
+        self.expansions = 0
+        self.done = False
+
+        self.start = grid.index(start_node.x, start_node.y)
+        self.end = grid.index(end_node.x, end_node.y)
+        # Node expanded closest to the goal, the end of the partial path when the search stops before any path
+        self.best = self.start
+        context.visit(self.start)
+        context.g[self.start] = 0
+        context.h[self.start] = heuristic(end_node, start_node)
+        self._push(self.start)
+
+    @property
+    def found(self) -> bool:
+        return self.context.g[self.end] < math.inf
+
+    @property
+    def lower_bound(self) -> float:
+        """
+        A lower bound of the cost of the shortest path, which goes through an open or an inconsistent node.
+        """
+        top = self.openlist.peek()[0] / self.weight if self.openlist else math.inf
+        return min(top, self.inconsistent_f)
+
+    def improve(
+        self, max_expansions: Optional[int] = None, deadline: Optional[float] = None
+    ) -> bool:
+        """
+        Continues the current pass for at most `max_expansions` expanded nodes, and until the `deadline`
+        (as given by `time.perf_counter`). Without any limit, completes the pass.
+
+        :return: whether the pass was completed, updating `bound` (and lowering the weight for the next pass)
+        """
+        if self.done:
+            return True
+        g, openlist = self.context.g, self.openlist
+        expanded = 0
+        while openlist and g[self.end] > openlist.peek()[0]:
+            if max_expansions is not None and expanded >= max_expansions:
+                return False
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            self._expand()
+            expanded += 1
+        self._complete_pass()
+        return True
+
+    def _push(self, i: int) -> None:
+        h = self.context.h[i]
+        self.openlist.push(i, self.context.g[i] + self.weight * h, h)
+        self.context.state[i] |= OPENED
+
+    def _expand(self) -> None:
+        grid, context, agent_characteristics = (
+            self.grid,
+            self.context,
+            self.agent_characteristics,
+        )
+        g, h, state = context.g, context.h, context.state
+        width = grid.width
+        clearance = agent_characteristics.clearance
+
+        i = self.openlist.pop()
+        state[i] |= CLOSED
+        self.closed.append(i)
+        self.expansions += 1
+        if h[i] < h[self.best]:
+            self.best = i
+
+        node = grid.get_node_at_index(i)
+        neighbours = grid.get_neighbours(
+            node,
+            agent_characteristics.walkable,
+            self.options.allow_diagonal,
+            self.options.tunneling,
+        )
+        for neighbour in neighbours:
+            j = neighbour.y * width + neighbour.x
+            cost = g[i] + euclidean(neighbour, node)
+            if cost >= g[j]:
+                continue
+            if clearance:
+                n_clearance = grid.get_clearance(
+                    neighbour.x, neighbour.y, agent_characteristics.walkable
+                )
+                if not n_clearance or n_clearance < clearance:
+                    continue
+            context.visit(j)
+            g[j] = cost
+            context.parent[j] = i
+            h[j] = h[j] or self.heuristic(self.end_node, neighbour)
+            if state[j] & CLOSED:
+                self.inconsistent.add(j)
+                self.inconsistent_f = min(self.inconsistent_f, cost + h[j])
+            else:
+                self._push(j)
+
+    def _complete_pass(self) -> None:
+        context = self.context
+        g, h, state = context.g, context.h, context.state
+        if not self.found:
+            # Every reachable node was expanded
+            self.done = True
+            return
+
+        # The shortest path goes through an open or inconsistent node, so costs at least their lowest `g + h`
+        lowest = min(
+            (g[i] + h[i] for i in (*self.openlist.entries, *self.inconsistent)),
+            default=math.inf,
+        )
+        cost = g[self.end]
+        self.bound = min(self.weight, cost / lowest) if lowest < cost else 1.0
+        if self.bound <= 1.0:
+            self.bound = 1.0
+            self.done = True
+            return
+
+        # Weights above the bound would prove nothing new
+        self.weight = max(min(self.weight, self.bound) - self.weight_step, 1.0)
+        for i in self.closed:
+            state[i] &= ~CLOSED
+        self.closed = []
+        cells = [*self.openlist.entries, *self.inconsistent]
+        self.inconsistent, self.inconsistent_f = set(), math.inf
+        self.openlist = OpenList()
+        for i in cells:
+            self._push(i)
+
+
+def search(
+    grid: Grid,
+    options: SearchOptions,
+    start_node: Node,
+    end_node: Node,
+    agent_characteristics: AgentCharacteristics,
+    context: SearchContext,
+    heuristic: Heuristic,
+    openlist: Optional[AnyOpenList] = None,
+) -> Optional[Node]:
+    """
+    Improves the path until it is proven the shortest, or until one of the limits of the `options` is reached
+    (see @{SearchOptions}), in which case the best path found so far is kept. To keep its suboptimality bound too,
+    or to spread the improvements over time, use @{Pathfinder:start_anytime_search} instead.
+
+    :param openlist: unused, as the weights of the passes call for an @{OpenList} of their own
+    """
+    anytime = AnytimeAStar(
+        grid,
+        options,
+        start_node,
+        end_node,
+        agent_characteristics,
+        context,
+        heuristic,
+    )
+    limited, started = options.limited, time.perf_counter()
+    while not anytime.done:
+        if limited and options.limit_reached(
+            anytime.expansions, anytime.lower_bound, started
+        ):
+            break
+        anytime.improve(1 if limited else None)
+
+    if anytime.found:
+        return end_node
+    if limited and options.partial_paths:
+        return grid.get_node_at_index(anytime.best)
+    return None
@@ -1,26 +1,34 @@
 # Astar algorithm
 # This actual implementation of A-star is based on
 # [Nash A. & al. pseudocode](http://aigamedev.com/open/tutorials/theta-star-any-angle-paths/)
-import heapq
 import math
-from typing import Dict, List, Optional
+import time
+from typing import Optional
 
+from context import CLOSED, OPENED, SearchContext
 from grid import Grid
 from heuristics import euclidean
-from interfaces import CostEvaluator, Heuristic
+from interfaces import CostEvaluator, Heuristic, SearchSteps, VertexEvaluator
 from node import Node
+from openlist import AnyOpenList, OpenList
 from properties import AgentCharacteristics, SearchOptions
 
 
 def compute_cost(
-    node: Node, neighbour: Node, grid: Grid, agent_characteristics: AgentCharacteristics
+    node: Node,
+    neighbour: Node,
+    grid: Grid,
+    agent_characteristics: AgentCharacteristics,
+    context: SearchContext,
 ) -> None:
+    i, j = grid.index(node.x, node.y), grid.index(neighbour.x, neighbour.y)
+    g = context.g
     m_cost = euclidean(
         neighbour, node
     )  # 1 if node.x == neighbour.x or node.y == neighbour.y else 1.41  # Cost of the connection
-    if node.g + m_cost < neighbour.g:
-        neighbour.parent = node
-        neighbour.g = node.g + m_cost
+    if g[i] + m_cost < g[j]:
+        context.parent[j] = i
+        g[j] = g[i] + m_cost
 
 
 def search(
@@ -29,42 +37,108 @@ def search(
     start_node: Node,
     end_node: Node,
     agent_characteristics: AgentCharacteristics,
-    to_clear: Dict[Node, bool],
+    context: SearchContext,
     heuristic: Heuristic,
     cost_eval: Optional[CostEvaluator] = None,
+    openlist: Optional[AnyOpenList] = None,
 ) -> Optional[Node]:
-    openlist: List[Node] = []  # Actually this should be a priority queue
+    """
+    :param cost_eval: the function updating the cost of reaching a neighbour. Defaults to `compute_cost`.
+    :param openlist: an empty open list for the search. Defaults to an @{OpenList}.
+    """
+    return complete(
+        iterate(
+            grid,
+            options,
+            start_node,
+            end_node,
+            agent_characteristics,
+            context,
+            heuristic,
+            cost_eval,
+            openlist,
+        )
+    )
+
+
+def complete(steps: SearchSteps) -> Optional[Node]:
+    """
+    Runs a search in progress to its end. Returns the end node when reached, None otherwise.
+    """
+    try:
+        while True:
+            next(steps)
+    except StopIteration as done:
+        return done.value
+
+
+def iterate(
+    grid: Grid,
+    options: SearchOptions,
+    start_node: Node,
+    end_node: Node,
+    agent_characteristics: AgentCharacteristics,
+    context: SearchContext,
+    heuristic: Heuristic,
+    cost_eval: Optional[CostEvaluator] = None,
+    openlist: Optional[AnyOpenList] = None,
+    vertex_eval: Optional[VertexEvaluator] = None,
+) -> SearchSteps:
+    """
+    Same as `search`, one expansion at a time: the search pauses after each node it expands (yielding the index
+    of that node), so that it can be spread over time (see @{ResumableSearch}).
+    The search stops early when one of the limits of the `options` is reached (see @{SearchOptions}).
+
+    :param vertex_eval: when given, the function settling the cost of each node when it is expanded,
+      before its neighbours are (see `lazythetastar.set_vertex`).
+    """
+    queue: AnyOpenList = OpenList() if openlist is None else openlist
+    g, h, state = context.g, context.h, context.state
+    width = grid.width
 
     def update_vertex(node: Node, neighbour: Node) -> None:
-        old_g = neighbour.g
+        j = neighbour.y * width + neighbour.x
+        old_g = g[j]
         cmp_cost = cost_eval or compute_cost
 
-        cmp_cost(node, neighbour, grid, agent_characteristics)
-        if neighbour.g < old_g:
-            n_clearance = neighbour.clearance.get(agent_characteristics.walkable)
+        cmp_cost(node, neighbour, grid, agent_characteristics, context)
+        if g[j] < old_g:
+            n_clearance = grid.get_clearance(
+                neighbour.x, neighbour.y, agent_characteristics.walkable
+            )
             push_this_node = (
                 agent_characteristics.clearance
                 and n_clearance
                 and n_clearance >= agent_characteristics.clearance
             )
             if push_this_node or not agent_characteristics.clearance:
-                if neighbour.opened:
-                    neighbour.opened = False
-                neighbour.h = heuristic(end_node, neighbour)
-                heapq.heappush(openlist, neighbour)
-                neighbour.open()
+                h[j] = h[j] or heuristic(end_node, neighbour)
+                queue.push(j, g[j] + h[j], h[j])
+                state[j] |= OPENED
 
-    start_node.g = 0
-    start_node.h = heuristic(end_node, start_node)
-    heapq.heappush(openlist, start_node)
-    to_clear[start_node] = True
-    start_node.opened = True
+    start = grid.index(start_node.x, start_node.y)
+    end = grid.index(end_node.x, end_node.y)
+    context.visit(start)
+    g[start] = 0
+    h[start] = heuristic(end_node, start_node)
+    queue.push(start, h[start], h[start])
+    state[start] |= OPENED
 
-    while openlist:
-        node = heapq.heappop(openlist)
-        node.close()
-        if node == end_node:
+    # Node expanded closest to the goal, the end of the partial path when a limit stops the search
+    best = start
+    limited, started, expansions = options.limited, time.perf_counter(), 0
+    while queue:
+        i = queue.pop()
+        if limited and options.limit_reached(expansions, g[i] + h[i], started):
+            return grid.get_node_at_index(best) if options.partial_paths else None
+        state[i] |= CLOSED
+        if vertex_eval is not None:
+            vertex_eval(i, grid, options, agent_characteristics, context)
+        node = grid.get_node_at_index(i)
+        if i == end:
             return node
+        if h[i] < h[best]:
+            best = i
         neighbours = grid.get_neighbours(
             node,
             agent_characteristics.walkable,
@@ -72,11 +146,14 @@ def search(
             options.tunneling,
         )
         for neighbour in neighbours:
-            if not neighbour.closed:
-                to_clear[neighbour] = True
-                if not neighbour.opened:
-                    neighbour.g = math.inf
-                    neighbour.parent = None
+            j = neighbour.y * width + neighbour.x
+            if not state[j] & CLOSED:
+                context.visit(j)
+                if not state[j] & OPENED:
+                    g[j] = math.inf
+                    context.parent[j] = -1
                 update_vertex(node, neighbour)
+        expansions += 1
+        yield i
 
     return None
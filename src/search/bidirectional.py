@@ -0,0 +1,196 @@
+# Bidirectional A* algorithm
+# Two A* searches, one from the start and one from the goal, guided by the average of the heuristic toward the
+# opposite end and the heuristic from their own end (front-to-end), so that both searches see the same reduced costs
+# and can stop as soon as their frontiers prove the best meeting found optimal. See
+# [Goldberg & Harrelson, Computing the shortest path: A* search meets graph theory](https://www.microsoft.com/en-us/research/wp-content/uploads/2004/07/tr-2004-24.pdf)
+import math
+from typing import Callable, List, Optional
+
+from context import CLOSED, OPENED, SearchContext
+from grid import Grid
+from heuristics import euclidean
+from interfaces import Heuristic
+from node import Node
+from openlist import AnyOpenList, OpenList
+from properties import AgentCharacteristics, SearchOptions
+
+
+class Frontier:
+    """
+    One of the two searches: an A* search from `origin`, guided by `potential`.
+    """
+
+    def __init__(
+        self,
+        grid: Grid,
+        options: SearchOptions,
+        agent_characteristics: AgentCharacteristics,
+        context: SearchContext,
+        origin: Node,
+        potential: Callable[[Node], float],
+        openlist: AnyOpenList,
+    ) -> None:
+        self.grid = grid
+        self.options = options
+        self.agent_characteristics = agent_characteristics
+        self.context = context
+        self.potential = potential
+        self.openlist = openlist
+
+        i = grid.index(origin.x, origin.y)
+        context.visit(i)
+        context.g[i] = 0
+        context.h[i] = potential(origin)
+        context.state[i] |= OPENED
+        openlist.push(i, context.h[i], context.h[i])
+
+    @property
+    def top(self) -> float:
+        """
+        The lowest `f` among the open nodes, a lower bound of the cost of any path through them.
+        """
+        return self.openlist.peek()[0] if self.openlist else math.inf
+
+    def expand(self) -> List[int]:
+        """
+        Expands the most promising open node. Returns the nodes whose cost improved.
+        """
+        grid, context, agent_characteristics = (
+            self.grid,
+            self.context,
+            self.agent_characteristics,
+        )
+        g, h, parent, state = context.g, context.h, context.parent, context.state
+        clearance = agent_characteristics.clearance
+
+        i = self.openlist.pop()
+        state[i] |= CLOSED
+        node = grid.get_node_at_index(i)
+        improved = []
+        neighbours = grid.get_neighbours(
+            node,
+            agent_characteristics.walkable,
+            self.options.allow_diagonal,
+            self.options.tunneling,
+        )
+        for neighbour in neighbours:
+            j = grid.index(neighbour.x, neighbour.y)
+            if state[j] & CLOSED:
+                continue
+            if clearance:
+                n_clearance = grid.get_clearance(
+                    neighbour.x, neighbour.y, agent_characteristics.walkable
+                )
+                if not n_clearance or n_clearance < clearance:
+                    continue
+
+            context.visit(j)
+            new_g = g[i] + euclidean(neighbour, node)
+            if not state[j] & OPENED:
+                h[j] = self.potential(neighbour)
+            elif new_g >= g[j]:
+                continue
+            g[j] = new_g
+            parent[j] = i
+            self.openlist.push(j, new_g + h[j], h[j])
+            state[j] |= OPENED
+            improved.append(j)
+
+        return improved
+
+
+def search(
+    grid: Grid,
+    options: SearchOptions,
+    start_node: Node,
+    end_node: Node,
+    agent_characteristics: AgentCharacteristics,
+    context: SearchContext,
+    heuristic: Heuristic,
+    openlist: Optional[AnyOpenList] = None,
+) -> Optional[Node]:
+    """
+    Bidirectional A* search. Returns paths as costly as the ones of `astar.search`. It expands fewer nodes
+    when both ends lie in dead ends or corridors which mislead the `heuristic` (where A* floods the area around
+    the start), but usually more on open maps, where the `heuristic` alone leads A* to the goal.
+    The `heuristic` must be consistent (as are the built-in ones, for the moves they suit).
+    The backward search runs on @{SearchContext:backward}; once done, its half of the path
+    is chained into the parents of `context`, so that the path is traced back from `end_node` as usual.
+    """
+    if start_node == end_node:
+        return start_node
+
+    # The goal must be enterable, as in `astar.search`
+    if not grid.is_walkable(
+        end_node.x,
+        end_node.y,
+        agent_characteristics.walkable,
+        agent_characteristics.clearance,
+    ):
+        return None
+
+    if openlist is None:
+        openlist = OpenList()
+    backward_context = context.backward()
+    # Both potentials are shifted by half the estimate between the ends, to remain non-negative
+    shift = heuristic(start_node, end_node)
+
+    def forward_potential(node: Node) -> float:
+        return (heuristic(node, end_node) - heuristic(node, start_node) + shift) / 2
+
+    def backward_potential(node: Node) -> float:
+        return (heuristic(node, start_node) - heuristic(node, end_node) + shift) / 2
+
+    forward = Frontier(
+        grid,
+        options,
+        agent_characteristics,
+        context,
+        start_node,
+        forward_potential,
+        openlist,
+    )
+    backward = Frontier(
+        grid,
+        options,
+        agent_characteristics,
+        backward_context,
+        end_node,
+        backward_potential,
+        type(openlist)(),
+    )
+
+    # Cost of the best path found so far, and the node where both searches met on it.
+    # The start node is expanded first, since the backward search can't enter it when it is unwalkable.
+    best, meeting = math.inf, -1
+    side, other = forward, backward
+    while True:
+        for j in side.expand():
+            cost = side.context.g[j] + other.context.g[j]
+            if cost < best:
+                best, meeting = cost, j
+
+        # No path through the open nodes can beat the best one.
+        # This also stops when either side runs out of open nodes.
+        if forward.top + backward.top >= best + shift:
+            break
+        # Expand the side with the fewest open nodes
+        if len(forward.openlist) <= len(backward.openlist):
+            side, other = forward, backward
+        else:
+            side, other = backward, forward
+
+    if meeting == -1:
+        return None
+
+    # Chain the backward half of the path into the parents of the forward search
+    parent, backward_parent = context.parent, backward_context.parent
+    i = meeting
+    end = grid.index(end_node.x, end_node.y)
+    while i != end:
+        j = backward_parent[i]
+        context.visit(j)
+        parent[j] = i
+        i = j
+
+    return end_node
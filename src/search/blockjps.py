@@ -0,0 +1,132 @@
+# Block-based Jump Point Search
+# Same jump points as `jps`, but straight scans test whole rows (or columns) at once, using Python
+# integers as bitsets, in the spirit of [Harabor & Grastien, Improving Jump Point Search](https://users.cecs.anu.edu.au/~dharabor/data/papers/harabor-grastien-icaps14.pdf)
+from typing import List, Optional
+
+from context import SearchContext
+from grid import Grid
+from interfaces import Heuristic
+from node import Node
+from openlist import AnyOpenList
+from properties import AgentCharacteristics, SearchOptions
+from search import jps
+
+
+def jump(
+    grid: Grid,
+    node: Optional[Node],
+    parent: Node,
+    end_node: Node,
+    agent_characteristics: AgentCharacteristics,
+    options: SearchOptions,
+) -> Optional[Node]:
+    """
+    Replacement for `jps.jump`. Obstacles and forced neighbours along a straight line of move are found
+    with a handful of bitwise operations over the row (or column) bitsets of the `grid`
+    (see @{Grid:compile_bitsets}), instead of testing cells one at a time. Diagonal scans still move
+    one cell at a time, but each of their straight sub-scans is bit-parallel.
+    When diagonal moves are forbidden, scans stop after one cell, so this falls back to `jps.jump`.
+    """
+    if not node:
+        return None
+
+    if not options.allow_diagonal:
+        return jps.jump(grid, node, parent, end_node, agent_characteristics, options)
+
+    walkable = agent_characteristics.walkable
+    clearance = agent_characteristics.clearance
+    rows, columns = grid.compile_bitsets(walkable, clearance)
+    bitmap = grid.compile_walkable(walkable, clearance)
+    stride = grid.stride
+
+    x, y = node.x, node.y
+    dx, dy = x - parent.x, y - parent.y
+    end_x, end_y = end_node.x, end_node.y
+
+    if dy == 0:
+        t = _scan(rows, y + 1, x + 1, dx, end_x + 1 if end_y == y else -1)
+        return None if t is None else grid.get_node_at(t - 1, y)
+    if dx == 0:
+        t = _scan(columns, x + 1, y + 1, dy, end_y + 1 if end_x == x else -1)
+        return None if t is None else grid.get_node_at(x, t - 1)
+
+    p = (y + 1) * stride + x + 1
+    sy = dy * stride
+    while bitmap[p]:
+        if x == end_x and y == end_y:
+            return grid.get_node_at(x, y)
+
+        # Current node is a jump point if one of his leftside/rightside neighbours ahead is forced
+        if (bitmap[p - dx + sy] and not bitmap[p - dx]) or (
+            bitmap[p + dx - sy] and not bitmap[p - sy]
+        ):
+            return grid.get_node_at(x, y)
+
+        # ... or if a straight scan from it finds a jump point
+        end = end_x + 1 if end_y == y else -1
+        if _scan(rows, y + 1, x + dx + 1, dx, end) is not None:
+            return grid.get_node_at(x, y)
+        end = end_y + 1 if end_x == x else -1
+        if _scan(columns, x + 1, y + dy + 1, dy, end) is not None:
+            return grid.get_node_at(x, y)
+
+        if not (bitmap[p + dx] or bitmap[p + sy]):
+            return None
+        x, y, p = x + dx, y + dy, p + dx + sy
+
+    return None
+
+
+def _scan(lines: List[int], i: int, start: int, step: int, end: int) -> Optional[int]:
+    """
+    Scans the line `i` of the bitsets from the bit `start`, in the direction of `step` (1 or -1).
+    `end` is the bit of the goal when it lies on that line, -1 otherwise.
+
+    The scan stops at the first obstacle, the goal, or a cell with a forced neighbour, i.e. a cell whose
+    neighbour on an adjacent line is blocked while the next cell on that adjacent line is free.
+    Returns the bit of the jump point, or None when an obstacle comes first.
+    """
+    line, before, after = lines[i], lines[i - 1], lines[i + 1]
+    if step > 0:
+        forced = ((before >> 1) & ~before) | ((after >> 1) & ~after)
+        # Obstacles are the unset bits of the line: its negation has all the bits past the border set
+        stops = (forced | ~line) >> start << start
+        if end >= start:
+            stops |= 1 << end
+        t = (stops & -stops).bit_length() - 1
+    else:
+        forced = ((before << 1) & ~before) | ((after << 1) & ~after)
+        stops = (forced | ~line) & ((2 << start) - 1)
+        if 0 <= end <= start:
+            stops |= 1 << end
+        t = stops.bit_length() - 1
+
+    if not (line >> t) & 1:
+        return None
+    return t
+
+
+def search(
+    grid: Grid,
+    options: SearchOptions,
+    start_node: Node,
+    end_node: Node,
+    agent_characteristics: AgentCharacteristics,
+    context: SearchContext,
+    heuristic: Heuristic,
+    openlist: Optional[AnyOpenList] = None,
+) -> Optional[Node]:
+    """
+    Block-based JPS search. Returns the same paths as `jps.search`.
+    """
+    return jps.search(
+        grid,
+        options,
+        start_node,
+        end_node,
+        agent_characteristics,
+        context,
+        heuristic,
+        jump,
+        openlist,
+    )
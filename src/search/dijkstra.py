@@ -0,0 +1,244 @@
+# Dijkstra algorithm
+# One-to-all (and all-to-one) distance fields: a single sweep from one or several sources gives the distance
+# of every cell of the grid to its closest source, along with the first move to take to get there.
+import math
+from array import array
+from typing import Iterable, List, Optional, Tuple
+
+from grid import Grid
+from mytypes.mytypes import Position
+from openlist import AnyOpenList, OpenList
+from path import Path
+from properties import AgentCharacteristics, SearchOptions
+
+Direction = Tuple[int, int]
+
+DIRECTIONS: List[Direction] = Grid.straight_offsets + Grid.diagonal_offsets
+
+# Direction of the cells having no move to take: the sources and the unreachable cells
+NO_DIRECTION = 255
+
+
+class DistanceField:
+    """
+    Distances from (or to) a set of `sources`, for every cell of a `grid`, as computed by @{distance_field}.
+
+    `distances` holds the cost of the shortest path between each cell and its closest source (`math.inf` when
+    no source can be reached), `directions` the index within `DIRECTIONS` of the first move of that path,
+    i.e. the move leading to the predecessor of the cell. Both are indexed like the `grid` cells
+    (`y * width + x`). Moves being reversible, the same field serves one-to-all and all-to-one queries:
+    reverse the paths it returns to get paths starting at a source.
+    """
+
+    def __init__(
+        self,
+        grid: Grid,
+        sources: List[Position],
+        agent_characteristics: AgentCharacteristics,
+        options: SearchOptions,
+    ) -> None:
+        self.grid = grid
+        self.sources = sources
+        self.agent_characteristics = agent_characteristics
+        self.options = options
+        self.distances = array("d", [math.inf]) * grid.size
+        self.directions = bytearray([NO_DIRECTION]) * grid.size
+
+    def distance(self, x: int, y: int) -> float:
+        """
+        Returns the cost of the shortest path from the cell (x, y) to its closest source,
+        `math.inf` when unreachable.
+        """
+        return self.distances[self.grid.index(x, y)]
+
+    def direction(self, x: int, y: int) -> Optional[Direction]:
+        """
+        Returns the move `(dx, dy)` to take from the cell (x, y) to get closer to a source,
+        None when the cell is a source itself or can't reach any.
+        """
+        code = self.directions[self.grid.index(x, y)]
+        return DIRECTIONS[code] if code != NO_DIRECTION else None
+
+    def path(self, x: int, y: int) -> Optional[Path]:
+        """
+        Returns the shortest `path` from the cell (x, y) to its closest source, None when unreachable.
+        The sweep never enters unwalkable cells, but they can still be left (as searches leave an unwalkable
+        start): the path from such a cell goes through its best neighbour.
+        """
+        grid = self.grid
+        i = grid.index(x, y)
+        path = Path()
+        path.grid = grid
+        if self.distances[i] == math.inf:
+            left = self._leave(x, y)
+            if left == -1:
+                return None
+            path.nodes.append(grid.get_node_at_index(i))
+            i = left
+
+        width, directions = grid.width, self.directions
+        path.nodes.append(grid.get_node_at_index(i))
+        while directions[i] != NO_DIRECTION:
+            dx, dy = DIRECTIONS[directions[i]]
+            i += dy * width + dx
+            path.nodes.append(grid.get_node_at_index(i))
+        return path
+
+    def _leave(self, x: int, y: int) -> int:
+        """
+        Returns the index of the neighbour an unwalkable cell (x, y) is best left to, -1 when the cell is
+        walkable or no neighbour leads to a source.
+        """
+        grid, options = self.grid, self.options
+        bitmap = grid.compile_walkable(
+            self.agent_characteristics.walkable, self.agent_characteristics.clearance
+        )
+        stride, i = grid.stride, grid.index(x, y)
+        p = (y + 1) * stride + x + 1
+        if bitmap[p]:
+            return -1
+
+        best, best_distance = -1, math.inf
+        for _, dp, di, cost, side_a, side_b in _moves(
+            stride, grid.width, options.allow_diagonal
+        ):
+            if not bitmap[p + dp]:
+                continue
+            if side_a and not (
+                options.tunneling or bitmap[p + side_a] or bitmap[p + side_b]
+            ):
+                continue
+            if self.distances[i + di] + cost < best_distance:
+                best, best_distance = i + di, self.distances[i + di] + cost
+        return best
+
+    def sweep(self) -> None:
+        """
+        Computes the distances and directions from scratch, from the current `sources`.
+        """
+        grid = self.grid
+        size, stride = grid.size, grid.stride
+        self.distances[:] = array("d", [math.inf]) * size
+        self.directions[:] = bytearray([NO_DIRECTION]) * size
+        seeds = []
+        for x, y in self.sources:
+            if not grid.contains(x, y):
+                raise IndexError(f"Source ({x}, {y}) is out of the grid")
+            self.distances[grid.index(x, y)] = 0
+            seeds.append((y + 1) * stride + x + 1)
+
+        if self.options.allow_diagonal:
+            openlist = OpenList()
+            for p in seeds:
+                openlist.push(p, 0, 0)
+            self.propagate(openlist)
+        else:
+            # All moves cost 1, so cells are reached in order of distance by a breadth-first wavefront
+            self.wavefront(seeds)
+
+    def propagate(self, openlist: AnyOpenList) -> None:
+        """
+        Runs the Dijkstra sweep from the cells in the `openlist`, whose distances must already be set.
+        Cells are entered in the `openlist` by their position within the walkability bitmap of the `grid`
+        (see @{Grid:compile_walkable}).
+        """
+        grid, options = self.grid, self.options
+        bitmap = grid.compile_walkable(
+            self.agent_characteristics.walkable, self.agent_characteristics.clearance
+        )
+        width, stride = grid.width, grid.stride
+        distances, directions = self.distances, self.directions
+        moves = _moves(stride, width, options.allow_diagonal)
+        tunneling = options.tunneling
+
+        while openlist:
+            p = openlist.pop()
+            i = p - 2 * (p // stride) - stride + 1
+            d = distances[i]
+            for code, dp, di, cost, side_a, side_b in moves:
+                q = p + dp
+                if not bitmap[q]:
+                    continue
+                # Unless tunneling, at least one adjacent node in the diagonal direction must be walkable
+                if side_a and not (
+                    tunneling or bitmap[p + side_a] or bitmap[p + side_b]
+                ):
+                    continue
+                j = i + di
+                if d + cost < distances[j]:
+                    distances[j] = d + cost
+                    directions[j] = code
+                    openlist.push(q, d + cost, 0)
+
+    def wavefront(self, seeds: List[int]) -> None:
+        """
+        Same as @{DistanceField:propagate}, for straight moves only and `seeds` all at the same distance:
+        a breadth-first sweep then reaches the cells in order of distance, without any priority queue.
+        """
+        grid = self.grid
+        bitmap = grid.compile_walkable(
+            self.agent_characteristics.walkable, self.agent_characteristics.clearance
+        )
+        width, stride = grid.width, grid.stride
+        distances, directions = self.distances, self.directions
+        moves = [move[:3] for move in _moves(stride, width, False)]
+
+        frontier = seeds
+        while frontier:
+            reached = []
+            for p in frontier:
+                i = p - 2 * (p // stride) - stride + 1
+                d = distances[i] + 1
+                for code, dp, di in moves:
+                    q = p + dp
+                    if bitmap[q] and distances[i + di] > d:
+                        distances[i + di] = d
+                        directions[i + di] = code
+                        reached.append(q)
+            frontier = reached
+
+
+def distance_field(
+    grid: Grid,
+    sources: Iterable[Position],
+    agent_characteristics: AgentCharacteristics,
+    options: SearchOptions,
+) -> DistanceField:
+    """
+    Computes the distance of every cell of the `grid` to the closest of the `sources`.
+    Moves and costs are the ones of the other searches: straight moves cost 1, diagonal moves (only when
+    allowed by the `options`) cost sqrt(2) and can't cut corners unless tunneling. Cells failing the walkable
+    and clearance requirements of the agent are never entered, but a source may be unwalkable.
+
+    :param sources: the positions the distances are computed from
+    :return: the @{DistanceField} of the sources
+    """
+    field = DistanceField(grid, list(sources), agent_characteristics, options)
+    field.sweep()
+    return field
+
+
+def _moves(
+    stride: int, width: int, allow_diagonal: bool
+) -> List[Tuple[int, int, int, float, int, int]]:
+    """
+    Lists the moves from a cell to its neighbours as `(code, bitmap offset, grid offset, cost, sides)`.
+    `code` is the direction of the reverse move, which leads back to the cell. For diagonal moves, `sides` are
+    the bitmap offsets of the two cells the move goes between (zero for straight moves).
+    """
+    moves = []
+    for dx, dy in DIRECTIONS:
+        diagonal = dx != 0 and dy != 0
+        if diagonal and not allow_diagonal:
+            continue
+        moves.append(
+            (
+                DIRECTIONS.index((-dx, -dy)),
+                dy * stride + dx,
+                dy * width + dx,
+                math.sqrt(2) if diagonal else 1,
+                dx if diagonal else 0,
+                dy * stride if diagonal else 0,
+            )
+        )
+    return moves
@@ -0,0 +1,318 @@
+# D* Lite algorithm
+# An A* search from the goal back to the agent, whose costs are kept from one plan to another: when cells change,
+# only the costs depending on them are repaired, and when the agent moves, the priorities of the open nodes are
+# shifted (by `km`) rather than computed again. See
+# [Koenig & Likhachev, D* Lite](http://idm-lab.org/bib/abstracts/papers/aaai02b.pdf)
+import math
+from array import array
+from typing import List, Optional, Set, Tuple
+
+import utils
+from grid import Grid
+from interfaces import Heuristic
+from mytypes.mytypes import Position, Region
+from node import Node
+from openlist import OpenList
+from path import Path
+from properties import AgentCharacteristics, SearchOptions
+
+Key = Tuple[float, float]
+
+# Decimals kept in the priorities: sums of the same costs added in different orders differ in their last bits,
+# which would otherwise break the ties between the agent and the nodes of its path
+KEY_DECIMALS = 9
+
+
+class DStarLite:
+    """
+    Plans the way of an agent to a `goal` across a `grid` that changes while the agent follows it.
+
+    Each call to @{DStarLite:get_path} brings the plan up to date with the cells of the `grid` that changed since
+    the previous one (and with the new position of the agent, when given), expanding only the nodes whose cost
+    the changes affect, then returns the shortest path from the agent to the `goal`.
+
+    Costs are kept per cell of the walkability bitmap of the agent (see @{Grid:compile_walkable}), hence indexed
+    like it. The `grid` must be annotated when the agent has a clearance.
+    """
+
+    def __init__(
+        self,
+        grid: Grid,
+        start: Position,
+        goal: Position,
+        agent_characteristics: AgentCharacteristics,
+        options: SearchOptions,
+        heuristic: Heuristic,
+    ) -> None:
+        self.grid = grid
+        self.agent_characteristics = agent_characteristics
+        self.options = options
+        self.heuristic = heuristic
+        self.expansions = 0
+
+        stride = grid.stride
+        offsets = Grid.straight_offsets[:]
+        if options.allow_diagonal:
+            offsets += Grid.diagonal_offsets
+        # Moves as (dx, dy, bitmap offset, cost)
+        self.moves = [
+            (dx, dy, dy * stride + dx, math.hypot(dx, dy)) for dx, dy in offsets
+        ]
+
+        size = stride * (grid.height + 2)
+        # `g` is the cost of the way to the goal as last expanded, `rhs` the one its neighbours lead to
+        self.g = array("d", [math.inf]) * size
+        self.rhs = array("d", [math.inf]) * size
+        self.openlist = OpenList()
+        self.km = 0.0
+        self.version = grid.version
+        # The bitmap of the agent as of `version`
+        self.snapshot = bytearray(self._bitmap())
+
+        self.goal = self._position(goal)
+        self.start = self._position(start)
+        self.start_node = self._node(self.start)
+        self.start_steps = self._start_steps()
+        self.rhs[self.goal] = 0
+        self.openlist.push(self.goal, *self._key(self.goal))
+
+    def replan(self) -> None:
+        """
+        Drops every cost found so far, so that the next plan searches from scratch.
+        """
+        size = len(self.g)
+        self.g = array("d", [math.inf]) * size
+        self.rhs = array("d", [math.inf]) * size
+        self.openlist = OpenList()
+        self.km = 0.0
+        self.rhs[self.goal] = 0
+        self.openlist.push(self.goal, *self._key(self.goal))
+
+    def _bitmap(self) -> bytearray:
+        return self.grid.compile_walkable(
+            self.agent_characteristics.walkable, self.agent_characteristics.clearance
+        )
+
+    def _position(self, position: Position) -> int:
+        x, y = position
+        if not self.grid.contains(x, y):
+            raise IndexError(f"Cell ({x}, {y}) is out of the grid")
+        return (y + 1) * self.grid.stride + x + 1
+
+    def _node(self, p: int) -> Node:
+        y, x = divmod(p, self.grid.stride)
+        return self.grid.get_node_at_index((y - 1) * self.grid.width + x - 1)
+
+    def get_path(self, start: Optional[Position] = None) -> Optional[Path]:
+        """
+        Plans again from `start`, the new position of the agent when given, and returns the path to the `goal`.
+
+        :return path: a path (array of nodes) when found, otherwise None
+        """
+        if start is not None:
+            self.move_to(start)
+        self.refresh()
+        self._compute()
+        return self._extract()
+
+    def move_to(self, start: Position) -> None:
+        """
+        Moves the agent to `start`, usually the next cell of its path.
+        """
+        p = self._position(start)
+        if p == self.start:
+            return
+        node = self._node(p)
+        # Every priority is now lower by up to the distance between the two positions
+        self.km += self.heuristic(self.start_node, node)
+        self.start, self.start_node = p, node
+        self.start_steps = self._start_steps()
+        self._update(p)
+
+    def refresh(self) -> None:
+        """
+        Repairs the costs affected by the cells of the `grid` that changed since the last refresh. The cells are
+        looked for within the regions logged by the `grid` (see @{Grid:modifications_since}), or over the whole
+        `grid` when the log no longer goes back to the last refresh.
+        """
+        grid = self.grid
+        if grid.version == self.version:
+            return
+        regions = grid.modifications_since(self.version)
+        self.version = grid.version
+        bitmap = self._bitmap()
+        if regions is None:
+            changed = utils.changed_positions(bytes(self.snapshot), bitmap)
+            self.snapshot[:] = bitmap
+        else:
+            changed = self._changed_positions(regions, bitmap)
+        if not bitmap[self.start]:
+            # The moves of an agent lacking clearance on its own cell can depend on corners whose change
+            # the bitmap of the agent does not show
+            self.start_steps = self._start_steps()
+            self._update(self.start)
+        if not changed:
+            return
+
+        self.start_steps = self._start_steps()
+        stride, width, height = self.grid.stride, self.grid.width, self.grid.height
+        # The moves from and to a changed cell change, and so do the diagonal moves passing by it
+        around: Set[int] = set()
+        for p in changed:
+            around.update(
+                p + dy * stride + dx for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+            )
+        for p in around:
+            y, x = divmod(p, stride)
+            if 0 < x <= width and 0 < y <= height:
+                self._update(p)
+
+    def _changed_positions(self, regions: List[Region], bitmap: bytearray) -> List[int]:
+        """
+        Returns the positions at which the `bitmap` differs from the `snapshot` within the `regions`, and brings
+        the `snapshot` up to date there. Regions are widened by the clearance of the agent, as changing a cell
+        changes the clearance of the cells around.
+        """
+        grid, snapshot = self.grid, self.snapshot
+        stride, width, height = grid.stride, grid.width, grid.height
+        margin = self.agent_characteristics.clearance or 0
+        changed: Set[int] = set()
+        for x0, y0, x1, y1 in regions:
+            x0, y0 = max(x0 - margin, 0), max(y0 - margin, 0)
+            x1, y1 = min(x1 + margin, width - 1), min(y1 + margin, height - 1)
+            for y in range(y0, y1 + 1):
+                start = (y + 1) * stride + x0 + 1
+                end = start + x1 - x0 + 1
+                if snapshot[start:end] != bitmap[start:end]:
+                    changed.update(
+                        start + k
+                        for k, (a, b) in enumerate(
+                            zip(snapshot[start:end], bitmap[start:end])
+                        )
+                        if a != b
+                    )
+                    snapshot[start:end] = bitmap[start:end]
+        return list(changed)
+
+    def _key(self, p: int) -> Key:
+        k = min(self.g[p], self.rhs[p])
+        f = k + self.heuristic(self.start_node, self._node(p)) + self.km
+        return round(f, KEY_DECIMALS), round(k, KEY_DECIMALS)
+
+    def _steps(self, p: int) -> List[Tuple[int, float]]:
+        """
+        Lists the walkable cells next to the cell `p`, along with the cost of moving to them.
+        Only the agent moves from an unwalkable cell.
+        """
+        bitmap, tunneling = self._bitmap(), self.options.tunneling
+        # As in `astar`, the clearance of the agent is only required from the cells it moves to: corners are
+        # checked against the plain walkability. Between two cells of clearance 2 or more, one corner always is
+        # walkable, so changes to that bitmap never need repairing on their own.
+        corners = self.grid.compile_walkable(self.agent_characteristics.walkable)
+        if not bitmap[p] and p != self.start:
+            return []
+        steps = []
+        for dx, dy, dp, cost in self.moves:
+            q = p + dp
+            if not bitmap[q]:
+                continue
+            # Unless tunneling, at least one adjacent node in the diagonal direction must be walkable
+            if dx and dy and not (tunneling or corners[p + dx] or corners[p + dp - dx]):
+                continue
+            steps.append((q, cost))
+        return steps
+
+    def _start_steps(self) -> Set[int]:
+        """
+        The cells the agent moves to from an unwalkable cell, which are its only predecessors.
+        """
+        if self._bitmap()[self.start]:
+            return set()
+        return {q for q, _ in self._steps(self.start)}
+
+    def _predecessors(self, p: int) -> List[int]:
+        # Moves are symmetric between walkable cells, and none leads to an unwalkable cell
+        if not self._bitmap()[p]:
+            return []
+        predecessors = [q for q, _ in self._steps(p)]
+        if p in self.start_steps:
+            predecessors.append(self.start)
+        return predecessors
+
+    def _update(self, p: int) -> None:
+        g, rhs, openlist = self.g, self.rhs, self.openlist
+        if p != self.goal:
+            best = math.inf
+            for q, cost in self._steps(p):
+                if cost + g[q] < best:
+                    best = cost + g[q]
+            rhs[p] = best
+        if g[p] != rhs[p]:
+            openlist.push(p, *self._key(p))
+        elif p in openlist:
+            openlist.remove(p)
+
+    def _compute(self) -> None:
+        g, rhs, openlist = self.g, self.rhs, self.openlist
+        start = self.start
+        while openlist:
+            f, k, p = openlist.peek()
+            if (f, k) >= self._key(start) and rhs[start] == g[start]:
+                break
+            key = self._key(p)
+            if (f, k) < key:
+                # The agent moved since the node was pushed
+                openlist.push(p, *key)
+                continue
+
+            openlist.pop()
+            self.expansions += 1
+            if g[p] > rhs[p]:
+                g[p] = rhs[p]
+                for q in self._predecessors(p):
+                    self._update(q)
+            else:
+                g[p] = math.inf
+                self._update(p)
+                for q in self._predecessors(p):
+                    self._update(q)
+
+    def _extract(self) -> Optional[Path]:
+        if self.g[self.start] == math.inf:
+            return None
+
+        cells = self._trace()
+        if cells is None:
+            # Some costs along the way were left out of date: plan again from scratch rather than trust them
+            self.replan()
+            self._compute()
+            if self.g[self.start] == math.inf:
+                return None
+            cells = self._trace()
+            if cells is None:
+                return None
+
+        path = Path()
+        path.grid = self.grid
+        path.nodes = [self.start_node] + [self._node(p) for p in cells[1:]]
+        return path
+
+    def _trace(self) -> Optional[List[int]]:
+        """
+        Follows the cheapest moves from the agent to the goal. Returns None when a move leads to a cell whose cost
+        is not up to date, or back to a cell already gone through.
+        """
+        g, rhs = self.g, self.rhs
+        p = self.start
+        cells, seen = [p], {p}
+        while p != self.goal:
+            best, following = math.inf, -1
+            for q, cost in self._steps(p):
+                if cost + g[q] < best:
+                    best, following = cost + g[q], q
+            if following == -1 or following in seen or g[following] != rhs[following]:
+                return None
+            p = following
+            cells.append(p)
+            seen.add(p)
+        return cells
@@ -0,0 +1,472 @@
+# HPA* algorithm
+# Hierarchical Path-Finding A*, as described by
+# [Botea, Müller & Schaeffer, Near Optimal Hierarchical Path-Finding](https://webdocs.cs.ualberta.ca/~mmueller/ps/hpastar.pdf)
+# The grid is split into square clusters. Searches run over a small abstract graph, whose nodes are the entrances
+# between clusters, and only the segments of the abstract path are then refined into cells.
+import math
+from typing import Dict, List, Optional, Set, Tuple
+
+import utils
+from context import SearchContext
+from grid import Grid
+from interfaces import Heuristic
+from mytypes.mytypes import Position
+from node import Node
+from openlist import AnyOpenList, OpenList
+from properties import AgentCharacteristics, SearchOptions
+
+ClusterKey = Tuple[int, int]
+
+# Pairs of cells facing each other across the border of two clusters
+Transition = Tuple[int, int]
+
+CLUSTER_SIZE = 16
+
+# Entrances at least this wide get a transition at each end and in the middle, narrower ones a single one
+# in the middle
+WIDE_ENTRANCE = 6
+
+
+class Cluster:
+    """
+    A block of the grid, with its entrances, the cost of the shortest path (within the cluster) between every
+    two of them, and the paths already refined between them. Cells are identified by their position within the
+    walkability bitmap of the `grid` (see @{Grid:compile_walkable}).
+    """
+
+    def __init__(self, x0: int, y0: int, x1: int, y1: int) -> None:
+        self.bounds = (x0, y0, x1, y1)
+        self.entrances: Set[int] = set()
+        # Cells facing each entrance in the neighbouring clusters
+        self.partners: Dict[int, List[int]] = {}
+        self.edges: Dict[int, Dict[int, float]] = {}
+        self.paths: Dict[Tuple[int, int], List[int]] = {}
+
+
+class HierarchicalMap:
+    """
+    The abstraction of a `grid` for a given agent and search options.
+
+    Clusters are built on first use, so that a search over a large `grid` only pays for the clusters it goes
+    through. When cells change, only the clusters containing them (and the neighbours sharing a border with them,
+    when the cells lie on that border) are dropped, to be built again when needed (see @{HierarchicalMap:refresh}).
+    """
+
+    def __init__(
+        self,
+        grid: Grid,
+        agent_characteristics: AgentCharacteristics,
+        options: SearchOptions,
+        cluster_size: int = CLUSTER_SIZE,
+    ) -> None:
+        self.grid = grid
+        self.agent_characteristics = agent_characteristics
+        self.options = options
+        self.cluster_size = cluster_size
+        self.clusters: Dict[ClusterKey, Cluster] = {}
+        # Transitions across the east (axis 0) and south (axis 1) borders of each cluster
+        self.borders: Dict[Tuple[int, int, int], List[Transition]] = {}
+        self.snapshot = bytes(self._bitmap())
+
+        stride = grid.stride
+        offsets = Grid.straight_offsets[:]
+        if options.allow_diagonal:
+            offsets += Grid.diagonal_offsets
+        # Moves as (dx, dy, bitmap offset, cost)
+        self.moves = [
+            (dx, dy, dy * stride + dx, math.hypot(dx, dy)) for dx, dy in offsets
+        ]
+
+    def _bitmap(self) -> bytearray:
+        return self.grid.compile_walkable(
+            self.agent_characteristics.walkable, self.agent_characteristics.clearance
+        )
+
+    def refresh(self) -> None:
+        """
+        Drops the clusters and borders affected by the cells that changed since the last refresh.
+        """
+        bitmap = self._bitmap()
+        changed = utils.changed_positions(self.snapshot, bitmap)
+        if not changed:
+            return
+
+        self.snapshot = bytes(bitmap)
+        size, stride = self.cluster_size, self.grid.stride
+        clusters, borders = self.clusters, self.borders
+        for p in changed:
+            y, x = divmod(p, stride)
+            x, y = x - 1, y - 1
+            cx, cy = x // size, y // size
+            # Cells on the edge of a cluster also decide the transitions to the clusters around
+            for nx, ny in ((x + dx, y + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)):
+                clusters.pop((nx // size, ny // size), None)
+            if x % size == size - 1:
+                borders.pop((cx, cy, 0), None)
+            if x % size == 0:
+                borders.pop((cx - 1, cy, 0), None)
+            if y % size == size - 1:
+                borders.pop((cx, cy, 1), None)
+            if y % size == 0:
+                borders.pop((cx, cy - 1, 1), None)
+
+    def cluster_of(self, p: int) -> ClusterKey:
+        y, x = divmod(p, self.grid.stride)
+        return (x - 1) // self.cluster_size, (y - 1) // self.cluster_size
+
+    def border(self, cx: int, cy: int, axis: int) -> List[Transition]:
+        """
+        Returns the transitions from the cluster (cx, cy) to its east (`axis` 0) or south (`axis` 1) neighbour.
+        Each maximal run of cells walkable on both sides of the border is an entrance, crossed at its middle,
+        and also at both ends when wide.
+        """
+        key = (cx, cy, axis)
+        transitions = self.borders.get(key)
+        if transitions is not None:
+            return transitions
+
+        grid, size = self.grid, self.cluster_size
+        bitmap, stride = self._bitmap(), grid.stride
+        transitions = self.borders[key] = []
+        if axis == 0:
+            x = (cx + 1) * size - 1
+            if x + 1 >= grid.width:
+                return transitions
+            cells = [
+                (y + 1) * stride + x + 1
+                for y in range(cy * size, min((cy + 1) * size, grid.height))
+            ]
+            across = 1
+        else:
+            y = (cy + 1) * size - 1
+            if y + 1 >= grid.height:
+                return transitions
+            cells = [
+                (y + 1) * stride + x + 1
+                for x in range(cx * size, min((cx + 1) * size, grid.width))
+            ]
+            across = stride
+
+        run: List[int] = []
+        for p in cells + [-1]:
+            if p != -1 and bitmap[p] and bitmap[p + across]:
+                run.append(p)
+                continue
+            if len(run) >= WIDE_ENTRANCE:
+                transitions += [(run[0], run[0] + across), (run[-1], run[-1] + across)]
+            if run:
+                middle = run[len(run) // 2]
+                transitions.append((middle, middle + across))
+            run = []
+        return transitions
+
+    def cluster(self, key: ClusterKey) -> Cluster:
+        """
+        Returns the cluster at `key`, building it on first use: its entrances are gathered from its 4 borders,
+        then a search from each entrance gives the cost of reaching the others.
+        """
+        cluster = self.clusters.get(key)
+        if cluster is not None:
+            return cluster
+
+        cx, cy = key
+        size, grid = self.cluster_size, self.grid
+        cluster = self.clusters[key] = Cluster(
+            cx * size,
+            cy * size,
+            min((cx + 1) * size, grid.width),
+            min((cy + 1) * size, grid.height),
+        )
+        sides = [
+            (self.border(cx, cy, 0), False),
+            (self.border(cx, cy, 1), False),
+            (self.border(cx - 1, cy, 0) if cx > 0 else [], True),
+            (self.border(cx, cy - 1, 1) if cy > 0 else [], True),
+        ]
+        for transitions, reverse in sides:
+            for a, b in transitions:
+                if reverse:
+                    a, b = b, a
+                cluster.entrances.add(a)
+                cluster.partners.setdefault(a, []).append(b)
+        if self.options.allow_diagonal and self.options.tunneling:
+            self._add_tunnels(cluster)
+
+        for entrance in cluster.entrances:
+            g, _ = self.local_search({entrance: 0.0}, cluster, cluster.entrances)
+            cluster.edges[entrance] = {
+                other: g[other]
+                for other in cluster.entrances
+                if other != entrance and other in g
+            }
+        return cluster
+
+    def steps(self, p: int) -> List[Tuple[int, float]]:
+        """
+        Lists the walkable cells next to the cell `p`, along with the cost of moving to them.
+        """
+        bitmap, tunneling = self._bitmap(), self.options.tunneling
+        steps = []
+        for dx, dy, dp, cost in self.moves:
+            q = p + dp
+            if not bitmap[q]:
+                continue
+            # Unless tunneling, at least one adjacent node in the diagonal direction must be walkable
+            if dx and dy and not (tunneling or bitmap[p + dx] or bitmap[p + dp - dx]):
+                continue
+            steps.append((q, cost))
+        return steps
+
+    def _add_tunnels(self, cluster: Cluster) -> None:
+        """
+        Adds the diagonal moves leaving the `cluster` between two unwalkable cells, which no entrance covers.
+        """
+        x0, y0, x1, y1 = cluster.bounds
+        bitmap, stride = self._bitmap(), self.grid.stride
+        edge = {(x, y) for x in range(x0, x1) for y in (y0, y1 - 1)}
+        edge |= {(x, y) for x in (x0, x1 - 1) for y in range(y0, y1)}
+        for x, y in edge:
+            p = (y + 1) * stride + x + 1
+            if not bitmap[p]:
+                continue
+            for dx, dy in Grid.diagonal_offsets:
+                q = p + dy * stride + dx
+                if x0 <= x + dx < x1 and y0 <= y + dy < y1:
+                    continue
+                if bitmap[q] and not bitmap[p + dx] and not bitmap[q - dx]:
+                    cluster.entrances.add(p)
+                    cluster.partners.setdefault(p, []).append(q)
+
+    def local_search(
+        self, sources: Dict[int, float], cluster: Cluster, targets: Set[int]
+    ) -> Tuple[Dict[int, float], Dict[int, int]]:
+        """
+        Dijkstra search from the `sources` (mapped to their initial costs), restricted to the cells of the
+        `cluster`. It stops once all the `targets` are reached. Returns the costs of the cells reached,
+        and their parents.
+        """
+        bitmap, stride = self._bitmap(), self.grid.stride
+        x0, y0, x1, y1 = cluster.bounds
+        tunneling = self.options.tunneling
+        g = dict(sources)
+        parent = dict.fromkeys(sources, -1)
+        closed: Set[int] = set()
+        remaining = len(targets)
+        openlist = OpenList()
+        for source, cost in sources.items():
+            openlist.push(source, cost, 0)
+        while openlist and remaining:
+            p = openlist.pop()
+            closed.add(p)
+            if p in targets:
+                remaining -= 1
+            y, x = divmod(p, stride)
+            for dx, dy, dp, cost in self.moves:
+                q = p + dp
+                if q in closed or not bitmap[q]:
+                    continue
+                if not (x0 < x + dx <= x1 and y0 < y + dy <= y1):
+                    continue
+                # Unless tunneling, at least one adjacent node in the diagonal direction must be walkable
+                if (
+                    dx
+                    and dy
+                    and not (tunneling or bitmap[p + dx] or bitmap[p + dp - dx])
+                ):
+                    continue
+                new_g = g[p] + cost
+                if new_g < g.get(q, math.inf):
+                    g[q] = new_g
+                    parent[q] = p
+                    openlist.push(q, new_g, 0)
+        return g, parent
+
+    def refine(self, cluster: Cluster, a: int, b: int) -> List[int]:
+        """
+        Returns the cells of the shortest path from `a` to `b` within the `cluster`, caching it.
+        """
+        path = cluster.paths.get((a, b))
+        if path is None:
+            reverse = cluster.paths.get((b, a))
+            if reverse is not None:
+                return reverse[::-1]
+            _, parent = self.local_search({a: 0.0}, cluster, {b})
+            path = cluster.paths[a, b] = _trace(parent, b)[::-1]
+        return path
+
+    def find_path(
+        self, start: Position, end: Position, heuristic: Heuristic
+    ) -> Optional[List[int]]:
+        """
+        Returns the cells (as `grid` indices) of a path from `start` to `end`, None when there is none.
+        """
+        stride = self.grid.stride
+        s = (start[1] + 1) * stride + start[0] + 1
+        t = (end[1] + 1) * stride + end[0] + 1
+        end_cluster = self.cluster(self.cluster_of(t))
+
+        # Connect the start to the entrances of its cluster. An unwalkable start can still be left, possibly
+        # to other clusters: the search then starts from the cells around it.
+        bitmap = self._bitmap()
+        launches: Dict[ClusterKey, Dict[int, float]] = {}
+        if bitmap[s]:
+            launches[self.cluster_of(s)] = {s: 0.0}
+        else:
+            for q, cost in self.steps(s):
+                launches.setdefault(self.cluster_of(q), {})[q] = cost
+        start_g: Dict[int, float] = {}
+        start_parents: Dict[int, Dict[int, int]] = {}
+        for key, sources in launches.items():
+            cluster = self.cluster(key)
+            targets = (
+                cluster.entrances | {t} if cluster is end_cluster else cluster.entrances
+            )
+            reached, parents = self.local_search(sources, cluster, targets)
+            for launch in sources:
+                if launch != s:
+                    parents[launch] = s
+            parents[s] = -1
+            for q in targets:
+                if reached.get(q, math.inf) < start_g.get(q, math.inf):
+                    start_g[q] = reached[q]
+                    start_parents[q] = parents
+
+        # Ends sharing a cluster are joined within it
+        if t in start_g:
+            return self._to_indices(_trace(start_parents[t], t)[::-1])
+
+        end_g, end_parent = self.local_search(
+            {t: 0.0}, end_cluster, end_cluster.entrances
+        )
+
+        def successors(p: int) -> List[Tuple[int, float]]:
+            cluster = self.cluster(self.cluster_of(p))
+            moves = list(start_g.items() if p == s else cluster.edges[p].items())
+            moves += [
+                (q, 1.0 if abs(q - p) in (1, stride) else math.sqrt(2))
+                for q in cluster.partners.get(p, ())
+            ]
+            if p in end_g:
+                moves.append((t, end_g[p]))
+            return moves
+
+        # A* over the abstract graph
+        end_node = Node(*end)
+        g = {s: 0.0}
+        parent = {s: -1}
+        closed: Set[int] = set()
+        openlist: AnyOpenList = OpenList()
+        openlist.push(s, 0, 0)
+        while openlist:
+            p = openlist.pop()
+            if p == t:
+                break
+            closed.add(p)
+            for q, cost in successors(p):
+                if q in closed:
+                    continue
+                new_g = g[p] + cost
+                if new_g < g.get(q, math.inf):
+                    g[q] = new_g
+                    parent[q] = p
+                    y, x = divmod(q, stride)
+                    h = heuristic(end_node, Node(x - 1, y - 1))
+                    openlist.push(q, new_g + h, h)
+        else:
+            return None
+
+        # Refine each segment of the abstract path into cells
+        abstract = _trace(parent, t)[::-1]
+        cells = [s]
+        for a, b in zip(abstract, abstract[1:]):
+            if b in self.cluster(self.cluster_of(a)).partners.get(a, ()):
+                segment = [a, b]
+            elif a == s:
+                segment = _trace(start_parents[b], b)[::-1]
+            elif b == t:
+                segment = _trace(end_parent, a)
+            else:
+                segment = self.refine(self.cluster(self.cluster_of(a)), a, b)
+            cells += segment[1:]
+        return self._to_indices(cells)
+
+    def _to_indices(self, cells: List[int]) -> List[int]:
+        stride = self.grid.stride
+        return [p - 2 * (p // stride) - stride + 1 for p in cells]
+
+
+def _trace(parent: Dict[int, int], p: int) -> List[int]:
+    """
+    Returns the cells from `p` back to the source of a search, following the `parent` links.
+    """
+    cells = [p]
+    while parent[p] != -1:
+        p = parent[p]
+        cells.append(p)
+    return cells
+
+
+def preprocess(
+    grid: Grid,
+    agent_characteristics: AgentCharacteristics,
+    options: SearchOptions,
+    cluster_size: int = CLUSTER_SIZE,
+) -> HierarchicalMap:
+    """
+    Returns the abstraction of the `grid` for the given agent and options, creating it on first use.
+    Abstractions are kept in `grid.hierarchies`, and refreshed with the cells changed since their last use.
+    """
+    key = (
+        agent_characteristics.walkable,
+        agent_characteristics.clearance or None,
+        options.allow_diagonal,
+        options.tunneling,
+        cluster_size,
+    )
+    hierarchy = grid.hierarchies.get(key)
+    if hierarchy is None:
+        hierarchy = grid.hierarchies[key] = HierarchicalMap(
+            grid, agent_characteristics, options, cluster_size
+        )
+    else:
+        hierarchy.refresh()
+    return hierarchy
+
+
+def search(
+    grid: Grid,
+    options: SearchOptions,
+    start_node: Node,
+    end_node: Node,
+    agent_characteristics: AgentCharacteristics,
+    context: SearchContext,
+    heuristic: Heuristic,
+    openlist: Optional[AnyOpenList] = None,
+) -> Optional[Node]:
+    """
+    HPA* search. Paths are near optimal: they go through the entrances between clusters, so they can be a bit
+    longer than the ones of `astar.search`. The path found is chained into the parents of `context`, so that
+    it is traced back from `end_node` as usual.
+    """
+    if start_node == end_node:
+        return start_node
+
+    # The goal must be enterable, as in `astar.search`
+    if not grid.is_walkable(
+        end_node.x,
+        end_node.y,
+        agent_characteristics.walkable,
+        agent_characteristics.clearance,
+    ):
+        return None
+
+    hierarchy = preprocess(grid, agent_characteristics, options)
+    cells = hierarchy.find_path(start_node.position, end_node.position, heuristic)
+    if cells is None:
+        return None
+
+    parent = context.parent
+    for previous, i in zip(cells, cells[1:]):
+        context.visit(i)
+        parent[i] = previous
+    return end_node
@@ -1,11 +1,14 @@
-import heapq
-from typing import Dict, List, Optional
+import time
+from typing import List, Optional
 
+from context import CLOSED, OPENED, SearchContext
 from grid import Grid
 from heuristics import euclidean
-from interfaces import Heuristic
+from interfaces import Heuristic, Jumper, SearchSteps
 from node import Node
+from openlist import AnyOpenList, OpenList
 from properties import AgentCharacteristics, SearchOptions
+from search import astar
 
 
 def search(
@@ -14,21 +17,71 @@ def search(
     start_node: Node,
     end_node: Node,
     agent_characteristics: AgentCharacteristics,
-    to_clear: Dict[Node, bool],
+    context: SearchContext,
     heuristic: Heuristic,
+    jumper: Optional[Jumper] = None,
+    openlist: Optional[AnyOpenList] = None,
 ) -> Optional[Node]:
-    openlist: List[Node] = []
+    """
+    :param jumper: the function looking for the jump point in the direction of a neighbour.
+      Defaults to `jump`, which scans the `grid`.
+    :param openlist: an empty open list for the search. Defaults to an @{OpenList}.
+    """
+    return astar.complete(
+        iterate(
+            grid,
+            options,
+            start_node,
+            end_node,
+            agent_characteristics,
+            context,
+            heuristic,
+            jumper,
+            openlist,
+        )
+    )
 
-    start_node.g = start_node.h = 0
-    heapq.heappush(openlist, start_node)
-    start_node.open()
-    to_clear[start_node] = True
 
+def iterate(
+    grid: Grid,
+    options: SearchOptions,
+    start_node: Node,
+    end_node: Node,
+    agent_characteristics: AgentCharacteristics,
+    context: SearchContext,
+    heuristic: Heuristic,
+    jumper: Optional[Jumper] = None,
+    openlist: Optional[AnyOpenList] = None,
+) -> SearchSteps:
+    """
+    Same as `search`, one expansion at a time (see `astar.iterate`).
+    """
+    if openlist is None:
+        openlist = OpenList()
+    state = context.state
+
+    start = grid.index(start_node.x, start_node.y)
+    end = grid.index(end_node.x, end_node.y)
+    g, h = context.g, context.h
+    context.visit(start)
+    g[start] = 0
+    h[start] = heuristic(start_node, end_node)
+    openlist.push(start, h[start], h[start])
+    state[start] |= OPENED
+
+    # Jump point expanded closest to the goal, the end of the partial path when a limit stops the search
+    best = start
+    limited, started, expansions = options.limited, time.perf_counter(), 0
     while openlist:
-        node = heapq.heappop(openlist)
-        node.close()
-        if node == end_node:
+        i = openlist.pop()
+        if limited and options.limit_reached(expansions, g[i] + h[i], started):
+            return grid.get_node_at_index(best) if options.partial_paths else None
+        state[i] |= CLOSED
+        node = grid.get_node_at_index(i)
+        if i == end:
             return node
+        if h[i] < h[best]:
+            best = i
         identify_successors(
             node,
             openlist,
@@ -36,22 +89,26 @@ def search(
             end_node,
             grid,
             options,
-            to_clear,
+            context,
             heuristic,
+            jumper or jump,
         )
+        expansions += 1
+        yield i
 
     return None
 
 
 def identify_successors(
     node: Node,
-    openlist: List[Node],
+    openlist: AnyOpenList,
     agent_characteristics: AgentCharacteristics,
     end_node: Node,
     grid: Grid,
     options: SearchOptions,
-    to_clear: Dict[Node, bool],
+    context: SearchContext,
     heuristic: Heuristic,
+    jumper: Optional[Jumper] = None,
 ) -> None:
     """
     Searches for successors of a given node in the direction of each of its neighbours.
@@ -62,11 +119,13 @@ def identify_successors(
     In case a jump point was found, and this node happened to be diagonal to the
     node currently expanded in a straight mode search, we skip this jump point.
     """
-    neighbours = find_neighbours(grid, options, node, agent_characteristics)
+    g, h, state = context.g, context.h, context.state
+    i = grid.index(node.x, node.y)
+    neighbours = find_neighbours(grid, options, node, agent_characteristics, context)
     neighbours.reverse()
     for neighbour in neighbours:
         skip = False
-        jump_node = jump(
+        jump_node = (jumper or jump)(
             grid, neighbour, node, end_node, agent_characteristics, options
         )
 
@@ -74,21 +133,22 @@ def identify_successors(
             if jump_node.x != node.x and jump_node.y != node.y:
                 skip = True
 
+        if not jump_node or skip:
+            continue
+
         # Perform regular A* on a set of jump points
-        if jump_node and not skip and not jump_node.closed:
+        j = grid.index(jump_node.x, jump_node.y)
+        if not state[j] & CLOSED:
             # Update the jump node and move it in the closed list if it wasn't there
             extraG = euclidean(jump_node, node)
-            new_g = node.g + extraG
-            if not jump_node.opened or new_g < jump_node.g:
-                to_clear[jump_node] = True
-                jump_node.g = new_g
-                jump_node.h = jump_node.h or heuristic(jump_node, end_node)
-                jump_node.parent = node
-                if not jump_node.opened:
-                    heapq.heappush(openlist, jump_node)
-                    jump_node.open()
-                else:
-                    heapq.heapify(openlist)
+            new_g = g[i] + extraG
+            if not state[j] & OPENED or new_g < g[j]:
+                context.visit(j)
+                g[j] = new_g
+                h[j] = h[j] or heuristic(jump_node, end_node)
+                context.parent[j] = i
+                openlist.push(j, g[j] + h[j], h[j])
+                state[j] |= OPENED
 
 
 def jump(
@@ -107,87 +167,98 @@ def jump(
     In case diagonal moves are forbidden, when lateral nodes (perpendicular to
     the direction of moves are walkable, we force them to be turning points in other
     to perform a straight move.
+    The scan is iterative and works on the positions of the walkability bitmap of the `grid`,
+    so its cost does not depend on the recursion limit nor on a Python frame per cell.
     """
     if not node:
         return None
 
-    def is_walkable(x: int, y: int) -> bool:
-        return grid.is_walkable(
-            x, y, agent_characteristics.walkable, agent_characteristics.clearance
+    bitmap = grid.compile_walkable(
+        agent_characteristics.walkable, agent_characteristics.clearance
+    )
+    stride = grid.stride
+    dx, dy = node.x - parent.x, node.y - parent.y
+    p = (node.y + 1) * stride + node.x + 1
+    end = (end_node.y + 1) * stride + end_node.x + 1
+    allow_diagonal = options.allow_diagonal
+
+    jump_point: Optional[int]
+    if dx != 0 and dy != 0:
+        jump_point = _jump_diagonally(bitmap, p, dx, dy * stride, end, allow_diagonal)
+    else:
+        side = stride if dx else 1
+        jump_point = _jump_straight(
+            bitmap, p, dx + dy * stride, side, end, allow_diagonal
         )
 
-    x, y = node.x, node.y
-    if not is_walkable(x, y):
+    if jump_point is None:
         return None
 
-    if node == end_node:
-        return node
+    y, x = divmod(jump_point, stride)
+    return grid.get_node_at(x - 1, y - 1)
 
-    dx, dy = x - parent.x, y - parent.y
 
-    if dx != 0 and dy != 0:
+def _jump_diagonally(
+    bitmap: bytearray, p: int, dx: int, dy: int, end: int, allow_diagonal: bool
+) -> Optional[int]:
+    """
+    Diagonal scan for `jump`, from the bitmap position `p`. `dx` and `dy` are the horizontal
+    and vertical components of the move, as offsets within the bitmap.
+    Returns the bitmap position of the jump point, if any.
+    """
+    while bitmap[p]:
+        if p == end:
+            return p
+
         # Current node is a jump point if one of his leftside/rightside neighbours ahead is forced
-        if (is_walkable(x - dx, y + dy) and not is_walkable(x - dx, y)) or (
-            is_walkable(x + dx, y - dy) and not is_walkable(x, y - dy)
+        if (bitmap[p - dx + dy] and not bitmap[p - dx]) or (
+            bitmap[p + dx - dy] and not bitmap[p - dy]
         ):
-            return node
+            return p
 
-        if jump(
-            grid,
-            grid.get_node_at(x + dx, y),
-            node,
-            end_node,
-            agent_characteristics,
-            options,
-        ):
-            return node
-        if jump(
-            grid,
-            grid.get_node_at(x, y + dy),
-            node,
-            end_node,
-            agent_characteristics,
-            options,
-        ):
-            return node
+        # ... or if a straight scan from it finds a jump point
+        if _jump_straight(bitmap, p + dx, dx, abs(dy), end, allow_diagonal) is not None:
+            return p
+        if _jump_straight(bitmap, p + dy, dy, abs(dx), end, allow_diagonal) is not None:
+            return p
 
-    elif dx != 0:
-        # Search along X-axis case
-        if options.allow_diagonal:
-            walkable_by_diagonal = (
-                is_walkable(x + dx, y + 1) and not is_walkable(x, y + 1)
-            ) or (is_walkable(x + dx, y - 1) and not is_walkable(x, y - 1))
-            if walkable_by_diagonal:
-                return node
-        else:
-            walkable_by_horizontal_sides = is_walkable(x + 1, y) or is_walkable(
-                x - 1, y
-            )
-            if walkable_by_horizontal_sides:
-                return node
-    else:
-        # Search along Y-axis case
-        if options.allow_diagonal:
-            walkable_by_diagonal = (
-                is_walkable(x + 1, y + dy) and not is_walkable(x + 1, y)
-            ) or (is_walkable(x - 1, y + dy) and not is_walkable(x - 1, y))
-            if walkable_by_diagonal:
-                return node
-        else:
-            walkable_by_vertical_sides = is_walkable(x, y + 1) or is_walkable(x, y - 1)
-            if walkable_by_vertical_sides:
-                return node
-
-    if options.allow_diagonal:
-        if is_walkable(x + dx, y) or is_walkable(x, y + dy):
-            return jump(
-                grid,
-                grid.get_node_at(x + dx, y + dy),
-                node,
-                end_node,
-                agent_characteristics,
-                options,
-            )
+        if not allow_diagonal or not (bitmap[p + dx] or bitmap[p + dy]):
+            return None
+        p += dx + dy
+
+    return None
+
+
+def _jump_straight(
+    bitmap: bytearray,
+    p: int,
+    step: int,
+    side: int,
+    end: int,
+    allow_diagonal: bool,
+) -> Optional[int]:
+    """
+    Straight scan for `jump`, from the bitmap position `p` and moving `step` positions at a time
+    (1 or -1 along the X-axis, plus or minus the bitmap stride along the Y-axis). `side` is the offset
+    to the cells at each side of the line of move.
+    Returns the bitmap position of the jump point, if any.
+    """
+    while bitmap[p]:
+        if p == end:
+            return p
+
+        if not allow_diagonal:
+            # In case diagonal moves are forbidden, the node is a turning point when
+            # the nodes along the axis of move are walkable
+            if bitmap[p + step] or bitmap[p - step]:
+                return p
+            return None
+
+        if (bitmap[p + step + side] and not bitmap[p + side]) or (
+            bitmap[p + step - side] and not bitmap[p - side]
+        ):
+            return p
+        p += step
 
     return None
 
@@ -197,6 +268,7 @@ def find_neighbours(
     options: SearchOptions,
     node: Node,
     agent_characteristics: AgentCharacteristics,
+    context: SearchContext,
 ) -> List[Node]:
     """
     Looks for the neighbours of a given node.
@@ -210,18 +282,23 @@ def find_neighbours(
     of move) in the neighbours list.
     """
 
-    def is_walkable(x: int, y: int) -> bool:
-        return grid.is_walkable(
-            x, y, agent_characteristics.walkable, agent_characteristics.clearance
-        )
+    bitmap = grid.compile_walkable(
+        agent_characteristics.walkable, agent_characteristics.clearance
+    )
+    stride = grid.stride
+
+    def is_walkable(x: int, y: int) -> int:
+        return bitmap[(y + 1) * stride + x + 1]
 
-    if node.parent:
+    parent = context.parent[grid.index(node.x, node.y)]
+    if parent != -1:
         # Node has a parent, we will prune some neighbours
         # Gets the direction of move
         neighbours = []
         x, y = node.x, node.y
-        dx = (x - node.parent.x) // max(abs(x - node.parent.x), 1)
-        dy = (y - node.parent.y) // max(abs(y - node.parent.y), 1)
+        parent_y, parent_x = divmod(parent, grid.width)
+        dx = (x - parent_x) // max(abs(x - parent_x), 1)
+        dy = (y - parent_y) // max(abs(y - parent_y), 1)
 
         # Diagonal move case
         if dx != 0 and dy != 0:
@@ -0,0 +1,322 @@
+# JPS+ algorithm
+# Jump Point Search over precomputed jump distances, as described by
+# [Steve Rabin](https://www.gameaipro.com/GameAIPro2/GameAIPro2_Chapter14_JPS_Plus_An_Extreme_A_Star_Speed_Optimization_for_Static_Uniform_Cost_Grids.pdf)
+import hashlib
+import struct
+from array import array
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from context import SearchContext
+from grid import Grid
+from interfaces import Heuristic
+from node import Node
+from openlist import AnyOpenList
+from properties import AgentCharacteristics, SearchOptions
+from search import jps
+
+Direction = Tuple[int, int]
+
+DIRECTIONS = Grid.straight_offsets + Grid.diagonal_offsets
+
+# Header of dumped tables: a format tag, the size of the grid, the clearance and the digest of the bitmap
+HEADER = struct.Struct("<4sIII32s")
+FORMAT = b"JPT1"
+
+
+def bitmap_digest(bitmap: bytearray) -> bytes:
+    """
+    Fingerprint of a walkability bitmap, telling whether a jump table was built for it.
+    """
+    return hashlib.sha256(bitmap).digest()
+
+
+class JumpTable:
+    """
+    For every cell of a `grid` and each of the 8 directions, the distance (in cells) to the next jump point
+    in that direction. A positive distance `k` means a jump point lies `k` cells away. Otherwise, there is no
+    jump point in that direction and `-k` is the number of walkable cells that can be travelled before
+    hitting an obstacle.
+
+    Distances are indexed by positions within the walkability bitmap of the `grid` (see @{Grid:compile_walkable}).
+    The jump points are the ones `jps.jump` would find when diagonal moves are allowed. The table remembers the
+    clearance and the `digest` (see `bitmap_digest`) of the bitmap it was built from, so that a table read back
+    from a file is only used for the same map (see @{JumpTable:matches}).
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        distances: Dict[Direction, array],
+        clearance: Optional[int] = None,
+        digest: bytes = b"",
+    ) -> None:
+        self.width = width
+        self.height = height
+        self.stride = width + 2
+        self.distances = distances
+        self.clearance = clearance
+        self.digest = digest
+
+    @classmethod
+    def build(
+        cls,
+        bitmap: bytearray,
+        width: int,
+        height: int,
+        clearance: Optional[int] = None,
+    ) -> "JumpTable":
+        stride = width + 2
+        size = stride * (height + 2)
+        distances = {}
+        for dx, dy in Grid.straight_offsets:
+            distances[dx, dy] = _straight_distances(
+                bitmap, width, height, dx, dy, array("i", bytes(4 * size))
+            )
+        for dx, dy in Grid.diagonal_offsets:
+            distances[dx, dy] = _diagonal_distances(
+                bitmap,
+                width,
+                height,
+                dx,
+                dy,
+                distances[dx, 0],
+                distances[0, dy],
+                array("i", bytes(4 * size)),
+            )
+        return cls(width, height, distances, clearance, bitmap_digest(bitmap))
+
+    def matches(self, grid: Grid, agent_characteristics: AgentCharacteristics) -> bool:
+        """
+        Tells whether the table was built for the current walkability bitmap of the `grid` for the agent.
+        """
+        clearance = agent_characteristics.clearance or None
+        if self.clearance != clearance:
+            return False
+        if (self.width, self.height) != (grid.width, grid.height):
+            return False
+        bitmap = grid.compile_walkable(agent_characteristics.walkable, clearance)
+        return self.digest == bitmap_digest(bitmap)
+
+    def jump(
+        self,
+        grid: Grid,
+        node: Optional[Node],
+        parent: Node,
+        end_node: Node,
+        agent_characteristics: AgentCharacteristics,
+        options: SearchOptions,
+    ) -> Optional[Node]:
+        """
+        Replacement for `jps.jump`, finding the jump point with table lookups instead of scanning the `grid`.
+        The goal is handled at query time: it is a jump point when it lies within reach of the scan.
+        """
+        if not node:
+            return None
+
+        dx, dy = node.x - parent.x, node.y - parent.y
+        px, py = parent.x, parent.y
+        gx, gy = end_node.x - px, end_node.y - py
+        stride = self.stride
+        k = self.distances[dx, dy][(py + 1) * stride + px + 1]
+        reach = abs(k)
+
+        if dx == 0 or dy == 0:
+            # The goal stands in the line of move
+            t = gx * dx + gy * dy
+            if gx * dy == 0 and gy * dx == 0 and 1 <= t <= reach:
+                return end_node
+            return grid.get_node_at(px + k * dx, py + k * dy) if k > 0 else None
+
+        # Diagonal move: look for the first cell, along the diagonal, which is either a jump point,
+        # the goal or a cell from which a straight scan reaches the goal
+        best = k if k > 0 else reach + 1
+        t = gx * dx
+        if t == gy * dy and 1 <= t < best:
+            best = t
+        t = gy * dy
+        if 1 <= t < best:
+            s = (gx - t * dx) * dx
+            p = (py + t * dy + 1) * stride + px + t * dx + 1
+            if 1 <= s <= abs(self.distances[dx, 0][p]):
+                best = t
+        t = gx * dx
+        if 1 <= t < best:
+            s = (gy - t * dy) * dy
+            p = (py + t * dy + 1) * stride + px + t * dx + 1
+            if 1 <= s <= abs(self.distances[0, dy][p]):
+                best = t
+
+        if best > reach:
+            return None
+        return grid.get_node_at(px + best * dx, py + best * dy)
+
+    def dump(self, fp: BinaryIO) -> None:
+        """
+        Writes the table into a binary file, so that it can be reused for the same version of the map
+        (see @{JumpTable:load} and `preprocess`).
+        """
+        fp.write(
+            HEADER.pack(
+                FORMAT, self.width, self.height, self.clearance or 0, self.digest
+            )
+        )
+        for direction in DIRECTIONS:
+            fp.write(self.distances[direction].tobytes())
+
+    @classmethod
+    def load(cls, fp: BinaryIO) -> "JumpTable":
+        """
+        Reads a table written by @{JumpTable:dump}. Raises a ValueError when the file holds no table, or a
+        truncated one.
+        """
+        header = fp.read(HEADER.size)
+        if len(header) != HEADER.size:
+            raise ValueError("Truncated jump table header")
+        tag, width, height, clearance, digest = HEADER.unpack(header)
+        if tag != FORMAT:
+            raise ValueError(f"Unknown jump table format {tag!r}")
+        size = (width + 2) * (height + 2)
+        distances = {}
+        for direction in DIRECTIONS:
+            data = fp.read(4 * size)
+            if len(data) != 4 * size:
+                raise ValueError(f"Truncated jump distances for direction {direction}")
+            distances[direction] = array("i")
+            distances[direction].frombytes(data)
+        return cls(width, height, distances, clearance or None, digest)
+
+
+def preprocess(
+    grid: Grid,
+    agent_characteristics: AgentCharacteristics,
+    table: Optional[JumpTable] = None,
+) -> JumpTable:
+    """
+    Returns the jump table of the `grid` for the given agent, building it on first use.
+    Tables are kept in `grid.jump_tables`, keyed per walkable/clearance, and are discarded when the grid changes.
+
+    :param table: a table saved earlier (see @{JumpTable:load}) to use instead of building one. Raises a
+      ValueError when it was built for another map or clearance.
+    """
+    key = (agent_characteristics.walkable, agent_characteristics.clearance or None)
+    if table is not None:
+        if not table.matches(grid, agent_characteristics):
+            raise ValueError("The jump table was built for another map or clearance")
+        grid.jump_tables[key] = table
+        return table
+
+    built = grid.jump_tables.get(key)
+    if built is None:
+        bitmap = grid.compile_walkable(*key)
+        built = grid.jump_tables[key] = JumpTable.build(
+            bitmap, grid.width, grid.height, key[1]
+        )
+    return built
+
+
+def search(
+    grid: Grid,
+    options: SearchOptions,
+    start_node: Node,
+    end_node: Node,
+    agent_characteristics: AgentCharacteristics,
+    context: SearchContext,
+    heuristic: Heuristic,
+    openlist: Optional[AnyOpenList] = None,
+) -> Optional[Node]:
+    """
+    JPS+ search. Returns the same paths as `jps.search`. As jump tables only describe
+    8-connected moves, searches forbidding diagonal moves fall back to `jps.search`.
+    """
+    if not options.allow_diagonal:
+        return jps.search(
+            grid,
+            options,
+            start_node,
+            end_node,
+            agent_characteristics,
+            context,
+            heuristic,
+            openlist=openlist,
+        )
+
+    table = preprocess(grid, agent_characteristics)
+    return jps.search(
+        grid,
+        options,
+        start_node,
+        end_node,
+        agent_characteristics,
+        context,
+        heuristic,
+        table.jump,
+        openlist,
+    )
+
+
+def _scan_order(width: int, height: int, dx: int, dy: int) -> Tuple[range, range]:
+    """
+    Orders the rows and columns so that cells are processed after their neighbour in the direction of move.
+    """
+    ys = range(height - 1, -1, -1) if dy > 0 else range(height)
+    xs = range(width - 1, -1, -1) if dx > 0 else range(width)
+    return ys, xs
+
+
+def _straight_distances(
+    bitmap: bytearray, width: int, height: int, dx: int, dy: int, distances: array
+) -> array:
+    stride = width + 2
+    step = dx + dy * stride
+    side = stride if dx else 1
+    ys, xs = _scan_order(width, height, dx, dy)
+    for y in ys:
+        for x in xs:
+            p = (y + 1) * stride + x + 1
+            q = p + step
+            if not bitmap[q]:
+                distances[p] = 0
+            elif (bitmap[q + step + side] and not bitmap[q + side]) or (
+                bitmap[q + step - side] and not bitmap[q - side]
+            ):
+                distances[p] = 1
+            else:
+                k = distances[q]
+                distances[p] = k + 1 if k > 0 else k - 1
+    return distances
+
+
+def _diagonal_distances(
+    bitmap: bytearray,
+    width: int,
+    height: int,
+    dx: int,
+    dy: int,
+    horizontal: array,
+    vertical: array,
+    distances: array,
+) -> array:
+    stride = width + 2
+    # Vertical component of the move, as an offset within the bitmap
+    sy = dy * stride
+    ys, xs = _scan_order(width, height, dx, dy)
+    for y in ys:
+        for x in xs:
+            p = (y + 1) * stride + x + 1
+            q = p + dx + sy
+            if not bitmap[q]:
+                distances[p] = 0
+            elif (
+                (bitmap[q - dx + sy] and not bitmap[q - dx])
+                or (bitmap[q + dx - sy] and not bitmap[q - sy])
+                or horizontal[q] > 0
+                or vertical[q] > 0
+            ):
+                distances[p] = 1
+            elif not (bitmap[q + dx] or bitmap[q + sy]):
+                distances[p] = -1
+            else:
+                k = distances[q]
+                distances[p] = k + 1 if k > 0 else k - 1
+    return distances
@@ -0,0 +1,128 @@
+# Lazy Theta* algorithm
+# Theta* checks the line of sight from the parent of a node to each of its neighbours as they are reached. Lazy Theta*
+# assumes the line of sight instead, and only checks it once the neighbour is expanded, falling back on its best
+# expanded neighbour when the line is blocked: a single check per expanded node, instead of one per neighbour. See
+# [Nash & al., Lazy Theta*: Any-Angle Path Planning and Path Length Analysis in 3D](https://ojs.aaai.org/index.php/AAAI/article/view/7566)
+import math
+from typing import Optional
+
+from context import CLOSED, SearchContext
+from grid import Grid
+from heuristics import euclidean
+from interfaces import Heuristic, SearchSteps
+from node import Node
+from openlist import AnyOpenList
+from properties import AgentCharacteristics, SearchOptions
+from search import astar
+from search.thetastar import line_of_sight, sight_cache
+
+
+def compute_cost(
+    node: Node,
+    neighbour: Node,
+    grid: Grid,
+    agent_characteristics: Optional[AgentCharacteristics],
+    context: SearchContext,
+) -> None:
+    """
+    Reaches `neighbour` straight from the parent of `node`, taking the line of sight for granted.
+    """
+    i, j = grid.index(node.x, node.y), grid.index(neighbour.x, neighbour.y)
+    g, parents = context.g, context.parent
+    p = parents[i] if parents[i] != -1 else i
+    cost = g[p] + euclidean(neighbour, grid.get_node_at_index(p))
+    if cost < g[j]:
+        parents[j] = p
+        g[j] = cost
+
+
+def set_vertex(
+    i: int,
+    grid: Grid,
+    options: SearchOptions,
+    agent_characteristics: AgentCharacteristics,
+    context: SearchContext,
+) -> None:
+    """
+    Checks the line of sight from the node at index `i`, being expanded, to its parent. When blocked, the node is
+    reached from its expanded neighbour leading to it at the lowest cost instead.
+    """
+    g, parents, state = context.g, context.parent, context.state
+    p = parents[i]
+    if p == -1:
+        return
+    node, parent = grid.get_node_at_index(i), grid.get_node_at_index(p)
+    if abs(node.x - parent.x) <= 1 and abs(node.y - parent.y) <= 1:
+        # The parent is a neighbour
+        return
+    cache = sight_cache(grid, agent_characteristics, options)
+    if cache is not None:
+        visible = cache.line_of_sight(p, i, grid, agent_characteristics)
+    else:
+        visible = line_of_sight(parent, node, grid, agent_characteristics)
+    if visible:
+        return
+
+    width = grid.width
+    best, best_parent = math.inf, -1
+    for neighbour in grid.get_neighbours(
+        node,
+        agent_characteristics.walkable,
+        options.allow_diagonal,
+        options.tunneling,
+    ):
+        j = neighbour.y * width + neighbour.x
+        if state[j] & CLOSED and g[j] + euclidean(node, neighbour) < best:
+            best, best_parent = g[j] + euclidean(node, neighbour), j
+    g[i], parents[i] = best, best_parent
+
+
+def search(
+    grid: Grid,
+    options: SearchOptions,
+    start_node: Node,
+    end_node: Node,
+    agent_characteristics: AgentCharacteristics,
+    context: SearchContext,
+    heuristic: Heuristic,
+    openlist: Optional[AnyOpenList] = None,
+) -> Optional[Node]:
+    return astar.complete(
+        iterate(
+            grid,
+            options,
+            start_node,
+            end_node,
+            agent_characteristics,
+            context,
+            heuristic,
+            openlist,
+        )
+    )
+
+
+def iterate(
+    grid: Grid,
+    options: SearchOptions,
+    start_node: Node,
+    end_node: Node,
+    agent_characteristics: AgentCharacteristics,
+    context: SearchContext,
+    heuristic: Heuristic,
+    openlist: Optional[AnyOpenList] = None,
+) -> SearchSteps:
+    """
+    Same as `search`, one expansion at a time (see `astar.iterate`).
+    """
+    return astar.iterate(
+        grid,
+        options,
+        start_node,
+        end_node,
+        agent_characteristics,
+        context,
+        heuristic,
+        compute_cost,
+        openlist,
+        set_vertex,
+    )
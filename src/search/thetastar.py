@@ -1,12 +1,84 @@
-from typing import Dict, Optional
+import threading
+from typing import Any, Dict, Optional, Sequence, Tuple
 
+from context import SearchContext
 from grid import Grid
 from heuristics import euclidean
-from interfaces import Heuristic
+from interfaces import Heuristic, SearchSteps
 from node import Node
+from openlist import AnyOpenList
 from properties import AgentCharacteristics, SearchOptions
 from search import astar
 
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None  # type: ignore
+
+Segment = Tuple[Tuple[int, int], Tuple[int, int]]
+
+# Default number of results kept by a LineOfSightCache
+SIGHT_CACHE_SIZE = 65536
+
+
+class LineOfSightCache:
+    """
+    Bounded cache of the line of sight results between cells of a `grid`, for a walkable and a clearance.
+    Results are dropped as soon as the `grid` changes (see `Grid.version`), and the oldest ones once
+    `max_entries` are kept. Cells are given by index (see @{Grid:index}).
+    """
+
+    def __init__(self, max_entries: int = SIGHT_CACHE_SIZE) -> None:
+        self.max_entries = max_entries
+        self.results: Dict[Tuple[int, int], bool] = {}
+        self.version = -1
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def line_of_sight(
+        self, a: int, b: int, grid: Grid, agent_characteristics: AgentCharacteristics
+    ) -> bool:
+        """
+        Same as `line_of_sight`, between the cells at indices `a` and `b`, looked up first.
+        """
+        if self.version != grid.version:
+            with self.lock:
+                self.results.clear()
+                self.version = grid.version
+        visible = self.results.get((a, b))
+        if visible is not None:
+            return visible
+
+        visible = line_of_sight(
+            grid.get_node_at_index(a),
+            grid.get_node_at_index(b),
+            grid,
+            agent_characteristics,
+        )
+        with self.lock:
+            if len(self.results) >= self.max_entries:
+                del self.results[next(iter(self.results))]
+            self.results[(a, b)] = visible
+        return visible
+
+
+def sight_cache(
+    grid: Grid, agent_characteristics: AgentCharacteristics, options: SearchOptions
+) -> Optional[LineOfSightCache]:
+    """
+    Returns the line of sight cache of the `grid` for an agent, created on first use, or None when
+    the `options` keep no cache.
+    """
+    if options.sight_cache_size <= 0:
+        return None
+    key = (agent_characteristics.walkable, agent_characteristics.clearance or None)
+    cache = grid.sight_lines.get(key)
+    if cache is None:
+        cache = grid.sight_lines[key] = LineOfSightCache(options.sight_cache_size)
+    return cache
+
 
 def line_of_sight(
     node: Node, neighbour: Node, grid: Grid, agent_characteristics: AgentCharacteristics
@@ -17,11 +89,13 @@ def line_of_sight(
     err = dx - dy
     sx = 1 if (x0 < x1) else -1
     sy = 1 if (y0 < y1) else -1
+    bitmap = grid.compile_walkable(
+        agent_characteristics.walkable, agent_characteristics.clearance
+    )
+    stride = grid.stride
 
     while True:
-        if not grid.is_walkable(
-            x0, y0, agent_characteristics.walkable, agent_characteristics.clearance
-        ):
+        if not bitmap[(y0 + 1) * stride + x0 + 1]:
             return False
 
         if x0 == x1 and y0 == y1:
@@ -39,21 +113,97 @@ def line_of_sight(
     return True
 
 
+def line_of_sight_batch(
+    grid: Grid,
+    segments: Sequence[Segment],
+    agent_characteristics: AgentCharacteristics,
+    vectorised: Optional[bool] = None,
+) -> Any:
+    """
+    Same as `line_of_sight`, for many segments at once, given as ((x0, y0), (x1, y1)) pairs of cells.
+    With numpy, all the segments are walked together, one step of `line_of_sight` at a time, over the walkability
+    bitmap (see @{Grid:compile_walkable}): the cost in Python is that of the longest segment, not of all of them.
+
+    :param vectorised: whether to walk the segments with numpy. By default, numpy is used when installed.
+    :return: a numpy array of booleans with numpy, a list of booleans otherwise
+    """
+    if vectorised is None:
+        vectorised = numpy is not None
+    for a, b in segments:
+        if not (grid.contains(*a) and grid.contains(*b)):
+            raise IndexError(f"Segment {a} - {b} is out of the grid")
+
+    if not vectorised:
+        nodes = [
+            (
+                grid.get_node_at_index(grid.index(*a)),
+                grid.get_node_at_index(grid.index(*b)),
+            )
+            for a, b in segments
+        ]
+        return [line_of_sight(a, b, grid, agent_characteristics) for a, b in nodes]
+
+    bitmap = numpy.frombuffer(
+        grid.compile_walkable(
+            agent_characteristics.walkable, agent_characteristics.clearance
+        ),
+        dtype=numpy.uint8,
+    )
+    stride = grid.stride
+    ends = numpy.asarray(segments, dtype=numpy.int64).reshape(-1, 4)
+    x0, y0, x1, y1 = ends.T
+    # Segments are walked on their positions within the bitmap: a step along y is a step of `stride`
+    p, end = (y0 + 1) * stride + x0 + 1, (y1 + 1) * stride + x1 + 1
+    dx, dy = numpy.abs(x1 - x0), numpy.abs(y1 - y0)
+    sx, sy = numpy.where(x0 < x1, 1, -1), numpy.where(y0 < y1, stride, -stride)
+    err = dx - dy
+    visible = numpy.ones(len(ends), dtype=bool)
+    indices = numpy.arange(len(ends))
+    walking = numpy.ones(len(ends), dtype=bool)
+    while len(indices):
+        blocked = walking & (bitmap[p] == 0)
+        visible[indices[blocked]] = False
+        walking &= ~blocked & (p != end)
+        count = numpy.count_nonzero(walking)
+        if count < len(indices) // 2:
+            # Most segments are done: stop carrying them along
+            indices, p, end, dx, dy, sx, sy, err = (
+                a[walking] for a in (indices, p, end, dx, dy, sx, sy, err)
+            )
+            walking = numpy.ones(count, dtype=bool)
+        elif not count:
+            break
+
+        e2 = 2 * err
+        step_x = walking & (e2 > -dy)
+        step_y = walking & (e2 < dx)
+        err += dx * step_y - dy * step_x
+        p += sx * step_x + sy * step_y
+    return visible
+
+
 def compute_cost(
-    node: Node, neighbour: Node, grid: Grid, agent_characteristics: AgentCharacteristics
+    node: Node,
+    neighbour: Node,
+    grid: Grid,
+    agent_characteristics: AgentCharacteristics,
+    context: SearchContext,
 ) -> None:
-    parent = node.parent or node
+    i, j = grid.index(node.x, node.y), grid.index(neighbour.x, neighbour.y)
+    g, parents = context.g, context.parent
+    p = parents[i] if parents[i] != -1 else i
+    parent = grid.get_node_at_index(p)
     mp_cost = euclidean(neighbour, parent)
     if line_of_sight(parent, neighbour, grid, agent_characteristics):
-        if parent.g + mp_cost < neighbour.g:
-            neighbour.parent = parent
-            neighbour.g = parent.g + mp_cost
+        if g[p] + mp_cost < g[j]:
+            parents[j] = p
+            g[j] = g[p] + mp_cost
 
     else:
         m_cost = euclidean(neighbour, node)
-        if node.g + m_cost < neighbour.g:
-            neighbour.parent = node
-            neighbour.g = node.g + m_cost
+        if g[i] + m_cost < g[j]:
+            parents[j] = i
+            g[j] = g[i] + m_cost
 
 
 def search(
@@ -62,8 +212,9 @@ def search(
     start_node: Node,
     end_node: Node,
     agent_characteristics: AgentCharacteristics,
-    to_clear: Dict[Node, bool],
+    context: SearchContext,
     heuristic: Optional[Heuristic] = None,
+    openlist: Optional[AnyOpenList] = None,
 ) -> Optional[Node]:
     return astar.search(
         grid,
@@ -71,7 +222,34 @@ def search(
         start_node,
         end_node,
         agent_characteristics,
-        to_clear,
+        context,
+        heuristic,
+        compute_cost,
+        openlist,
+    )
+
+
+def iterate(
+    grid: Grid,
+    options: SearchOptions,
+    start_node: Node,
+    end_node: Node,
+    agent_characteristics: AgentCharacteristics,
+    context: SearchContext,
+    heuristic: Heuristic,
+    openlist: Optional[AnyOpenList] = None,
+) -> SearchSteps:
+    """
+    Same as `search`, one expansion at a time (see `astar.iterate`).
+    """
+    return astar.iterate(
+        grid,
+        options,
+        start_node,
+        end_node,
+        agent_characteristics,
+        context,
         heuristic,
         compute_cost,
+        openlist,
     )
@@ -1,17 +1,39 @@
+from array import array
+from typing import Any, MutableSequence
+
 from mytypes.mytypes import List, Map, Tuple
 from node import Node, NodeMap
 
 
-def array_to_nodes(map: Map) -> Tuple[NodeMap, int, int, int, int]:
+def map_bounds(map: Map) -> Tuple[int, int, int, int]:
     min_x = 0
     min_y = 0
-    max_y = height = len(map)
-    max_x = width = len(map[0])
+    max_y = len(map)
+    max_x = len(map[0])
+    return min_x, max_x, min_y, max_y
+
+
+def array_to_nodes(map: Map) -> Tuple[NodeMap, int, int, int, int]:
+    min_x, max_x, min_y, max_y = map_bounds(map)
+    width, height = max_x - min_x, max_y - min_y
 
     nodes = [[Node(x, y) for x in range(width)] for y in range(height)]
     return nodes, min_x, max_x, min_y, max_y
 
 
+def array_to_buffer(map: Map) -> MutableSequence[Any]:
+    """
+    Flattens a collision map into a single row-major buffer, so that the cell (x, y)
+    lives at index `y * width + x`. Integer maps are stored in a typed `array`, any other
+    map (e.g. one parsed from a string) is kept as a flat list of its values.
+    """
+    values = [value for row in map for value in row]
+    try:
+        return array("l", values)
+    except (TypeError, OverflowError):
+        return values
+
+
 def string_map_to_array(string: str) -> List[List[str]]:
     array_map: List[List[str]] = []
     for line in string.splitlines():
@@ -20,3 +42,23 @@ def string_map_to_array(string: str) -> List[List[str]]:
             array_map.append(list(stripped_line))
 
     return array_map
+
+
+def changed_positions(old: bytes, new: bytearray, chunk_size: int = 4096) -> List[int]:
+    """
+    Returns the positions at which two buffers of the same length differ. Buffers are compared by chunks
+    of `chunk_size` bytes first, so that unchanged chunks cost a single comparison.
+    """
+    changed: List[int] = []
+    if old == new:
+        return changed
+
+    for start in range(0, len(new), chunk_size):
+        end = start + chunk_size
+        if old[start:end] != new[start:end]:
+            changed.extend(
+                start + k
+                for k, (a, b) in enumerate(zip(old[start:end], new[start:end]))
+                if a != b
+            )
+    return changed
@@ -2,27 +2,25 @@
 
 # Asyncio version
 import asyncio as aio
-import threading
 from concurrent.futures.thread import ThreadPoolExecutor
 from functools import partial, wraps
 
 from grid import Grid
 from heuristics import cardinal_intercardinal
+from parallel import ProcessPathfinder
 from pathfinder import Pathfinder
 from profiling.decorators import timewith
+from properties import AgentCharacteristics
 from search import astar
 
 
 def get_path(path_to_do):
     finder = path_to_do[1]
-    agent_size = path_to_do[2]
+    grid = path_to_do[2]
+    agent = path_to_do[3]
     path_to_do = path_to_do[0]
     return finder.get_path(
-        path_to_do[0][0],
-        path_to_do[0][1],
-        path_to_do[1][0],
-        path_to_do[1][1],
-        agent_size,
+        grid, path_to_do[0], path_to_do[1], agent, cardinal_intercardinal
     )
 
 
@@ -58,60 +56,40 @@ def run_async():
         ((0, 0), (8, 8)),
         ((0, 0), (8, 8)),
     ] * 100
-    agent_size = 2
+    agent = AgentCharacteristics(walkable=walkable, clearance=2)
 
     with timewith():
         grid = Grid(map)
-        finder = Pathfinder(astar.search, heuristic=cardinal_intercardinal)
+        finder = Pathfinder(astar.search)
         grid.annotate(walkable)
 
         # Compute all the paths serially
         computed_paths = []
         for start, end in paths:
             computed_paths.append(
-                finder.get_path(start[0], start[1], end[0], end[1], agent_size)
+                finder.get_path(grid, start, end, agent, cardinal_intercardinal)
             )
 
     assert len(computed_paths) == len(paths)
 
     # Multithreaded version. It should take almost the same as the previous one (or more due to overhead of threads)
     # since computing the path is a purely CPU bound operation.
-    # Node: The options IS NOT threadsafe
-    class PathFinderLocal(threading.local):
-        def __init__(self):
-            print("Initializing local")
-            local_grid = Grid(map)
-            local_grid.annotate(walkable)
-            self.finder = Pathfinder(astar.search, heuristic=cardinal_intercardinal)
-
-    local_finder = PathFinderLocal()
-
+    # The search state lives in per-query contexts, so all the threads share the same grid and finder.
     with timewith():
         with ThreadPoolExecutor(max_workers=5) as executor:
-
-            def _(path_to_do):
-                return local_finder.finder.get_path(
-                    path_to_do[0][0],
-                    path_to_do[0][1],
-                    path_to_do[1][0],
-                    path_to_do[1][1],
-                    agent_size,
-                )
-
-            computed_paths = executor.map(_, paths)
+            computed_paths = executor.map(
+                get_path, [(p, finder, grid, agent) for p in paths]
+            )
 
     assert len(list(computed_paths)) == len(paths)
 
-    # Multiprocessing version. This one should actually be more performant
-    # with timewith():
-    #     grid = Grid(map)
-    #     options = Pathfinder(grid, astar.search, walkable, heuristic=cardinal_intercardinal)
-    #     options.annotate_grid()
-    #
-    #     with ProcessPoolExecutor(max_workers=2) as executor:
-    #         computed_paths = executor.map(get_path, [(p, options, agent_size) for p in paths[:2]])
+    # Multiprocessing version. This one should actually be more performant: the workers read the
+    # walkability of the grid from shared memory, so neither the grid nor the lambda walkable is pickled.
+    with timewith():
+        with ProcessPathfinder(astar.search, grid, agent, processes=2) as finder:
+            computed_paths = list(finder.get_paths(paths, cardinal_intercardinal))
 
-    # assert len(list(computed_paths)) == len(paths)
+    assert len(computed_paths) == len(paths)
 
 
 map = [
@@ -146,7 +124,7 @@ paths = [
     ((0, 0), (8, 8)),
 ] * 100
 
-agent_size = 2
+agent = AgentCharacteristics(walkable=walkable, clearance=2)
 
 
 def async_wrap(func):
@@ -163,17 +141,17 @@ def async_wrap(func):
 async def run_async_2():
     with timewith("async"):
         grid = Grid(map)
-        finder = Pathfinder(astar.search, heuristic=cardinal_intercardinal)
+        finder = Pathfinder(astar.search)
         grid.annotate(walkable)
-        get_path_async = async_wrap(finder.get_path)
 
-        # Compute all the paths serially
-        computed_paths = []
+        # The searches take turns on the event loop, by slices of expanded nodes
         tasks = []
         for start, end in paths:
-            tasks.append(get_path_async(start[0], start[1], end[0], end[1], agent_size))
+            tasks.append(
+                finder.get_path_async(grid, start, end, agent, cardinal_intercardinal)
+            )
 
-        await aio.gather(*tasks)
+        computed_paths = await aio.gather(*tasks)
 
     assert len(computed_paths) == len(paths)
 
@@ -0,0 +1,164 @@
+import random
+
+import pytest
+
+from grid import Grid
+from properties import AgentCharacteristics
+from search.thetastar import line_of_sight
+
+MAP = [
+    [0, 0, 0, 2],
+    [0, 2, 0, 0],
+    [0, 0, 0, 0],
+]
+
+
+def test_compiled_walkable_matches_the_walkable_predicate():
+    walkable = lambda v: v != 2
+    grid = Grid(MAP).annotate(walkable)
+
+    for clearance in (None, 1, 2):
+        bitmap = grid.compile_walkable(walkable, clearance)
+        for y in range(-1, grid.height + 1):
+            for x in range(-1, grid.width + 1):
+                expected = grid.contains(x, y) and bool(walkable(MAP[y][x]))
+                if expected and clearance:
+                    expected = grid.get_clearance(x, y, walkable) >= clearance
+                assert bool(bitmap[(y + 1) * grid.stride + x + 1]) == expected
+
+
+def test_compiled_walkable_accepts_plain_values():
+    grid = Grid(MAP)
+
+    assert grid.is_walkable(1, 1, 2)
+    assert not grid.is_walkable(0, 0, 2)
+    assert not grid.is_walkable(1, 1, 2, clearance=1)
+
+
+def test_compiled_walkables_are_cached_until_annotation():
+    walkable = lambda v: v != 2
+    grid = Grid(MAP)
+
+    bitmap = grid.compile_walkable(walkable, 2)
+    assert not any(bitmap)
+    assert grid.compile_walkable(walkable, 2) is bitmap
+
+    grid.annotate(walkable)
+    assert grid.compile_walkable(walkable, 2) is not bitmap
+    assert grid.is_walkable(2, 1, walkable, 2)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_vectorised_clearance_matches_the_reference_one(seed):
+    pytest.importorskip("numpy")
+    rng = random.Random(seed)
+    width, height = rng.randint(1, 40), rng.randint(1, 40)
+    map = [[rng.choice([0, 0, 0, 2]) for _ in range(width)] for _ in range(height)]
+    walkable = lambda v: v != 2
+
+    expected = Grid(map).annotate(walkable, vectorised=False)
+    grid = Grid(map).annotate(walkable, vectorised=True)
+
+    assert grid.clearance[walkable].typecode == "H"
+    assert grid.get_clearance_grid(walkable) == expected.get_clearance_grid(walkable)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_updating_cells_matches_a_full_annotation(seed):
+    rng = random.Random(seed)
+    width, height = rng.randint(2, 30), rng.randint(2, 30)
+    map = [[rng.choice([0, 0, 0, 2]) for _ in range(width)] for _ in range(height)]
+    walkable = lambda v: v != 2
+    grid = Grid([row[:] for row in map]).annotate(walkable)
+    grid.compile_walkable(walkable, 2)
+
+    for _ in range(10):
+        x, y = rng.randrange(width), rng.randrange(height)
+        if rng.random() < 0.5:
+            grid.set_cell(x, y, rng.choice([0, 2]))
+        else:
+            region = [[rng.choice([0, 2]) for _ in range(3)] for _ in range(2)]
+            region = [row[: width - x] for row in region[: height - y]]
+            grid.update_region(x, y, region)
+
+        expected = Grid([row[:] for row in grid.map]).annotate(walkable)
+        assert grid.get_clearance_grid(walkable) == expected.get_clearance_grid(
+            walkable
+        )
+        for clearance in (None, 2):
+            assert grid.compile_walkable(
+                walkable, clearance
+            ) == expected.compile_walkable(walkable, clearance)
+
+
+def test_annotation_reads_the_collision_map_changed_in_place():
+    walkable = 0
+    grid = Grid([[0] * 4 for _ in range(4)])
+    grid.annotate(walkable)
+    assert grid.get_clearance(0, 0, walkable) == 4
+
+    grid.map[1][1] = 1
+    grid.annotate(walkable)
+
+    assert not grid.is_walkable(1, 1, walkable)
+    assert grid.get_clearance(0, 0, walkable) == 1
+    assert grid.get_clearance(2, 2, walkable) == 2
+
+
+def test_updating_a_cell_outside_of_the_grid_fails():
+    grid = Grid([[0, 0], [0, 0]])
+
+    with pytest.raises(IndexError):
+        grid.set_cell(2, 0, 1)
+
+
+def test_bitsets_pack_the_walkability_of_rows_and_columns():
+    grid = Grid(MAP)
+
+    rows, columns = grid.compile_bitsets(0)
+
+    assert len(rows) == grid.height + 2
+    assert len(columns) == grid.width + 2
+    for y in range(grid.height):
+        for x in range(grid.width):
+            walkable = grid.is_walkable(x, y, 0)
+            assert bool(rows[y + 1] >> (x + 1) & 1) == walkable
+            assert bool(columns[x + 1] >> (y + 1) & 1) == walkable
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_batched_line_of_sight_matches_the_scalar_one(seed):
+    pytest.importorskip("numpy")
+    rng = random.Random(seed)
+    width, height = rng.randint(1, 40), rng.randint(1, 40)
+    map = [[rng.choice([0] * 19 + [2]) for _ in range(width)] for _ in range(height)]
+    walkable = lambda v: v != 2
+    grid = Grid(map).annotate(walkable)
+    pairs = [
+        (
+            (rng.randrange(width), rng.randrange(height)),
+            (rng.randrange(width), rng.randrange(height)),
+        )
+        for _ in range(200)
+    ]
+
+    for clearance in (0, 2):
+        agent_characteristics = AgentCharacteristics(walkable, clearance)
+        expected = [
+            line_of_sight(
+                grid.get_node_at(*a), grid.get_node_at(*b), grid, agent_characteristics
+            )
+            for a, b in pairs
+        ]
+        visible = grid.line_of_sight_batch(pairs, agent_characteristics)
+
+        assert visible.dtype == bool
+        assert visible.tolist() == expected
+        assert (
+            grid.line_of_sight_batch(pairs, agent_characteristics, vectorised=False)
+            == expected
+        )
+
+    assert len(grid.line_of_sight_batch([], agent_characteristics)) == 0
+    with pytest.raises(IndexError):
+        grid.line_of_sight_batch([((0, 0), (width, 0))], agent_characteristics)
@@ -1,13 +1,44 @@
+import asyncio
+import io
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 from hamcrest import *
 
 import heuristics
+from context import CLOSED, SearchContext
 from grid import Grid
 from heuristics import cardinal_intercardinal
 from mytypes.mytypes import Map
 from pathfinder import Pathfinder
-from properties import AgentCharacteristics
-from search import astar, jps, thetastar
+from properties import AgentCharacteristics, SearchOptions
+from search import (
+    arastar,
+    astar,
+    bidirectional,
+    blockjps,
+    dijkstra,
+    hpa,
+    jps,
+    jpsplus,
+    lazythetastar,
+    thetastar,
+)
+
+SAMPLE_MAP = [
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0, 1, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 1, 0, 0, 0, 0, 0, 0],
+    [0, 0, 1, 0, 0, 0, 0, 0, 2, 0],
+    [0, 0, 1, 1, 1, 0, 0, 2, 0, 0],
+    [0, 0, 0, 1, 1, 0, 2, 0, 0, 2],
+    [0, 0, 0, 0, 1, 0, 0, 0, 0, 2],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+]
 
 
 @pytest.fixture
@@ -341,3 +372,669 @@ class TestIntegration:
         ]
 
         self._assert_the_resulting_path_nodes_should_be_like(marked_map, path)
+
+    def test_compact_grid_gives_the_same_clearance_and_paths(self):
+        walkable = lambda v: v != 2
+        agent_characteristics = AgentCharacteristics(walkable=walkable, clearance=2)
+
+        for searcher in (astar.search, jps.search, thetastar.search):
+            grid = Grid(SAMPLE_MAP).annotate(walkable)
+            compact_grid = Grid(SAMPLE_MAP, compact=True).annotate(walkable)
+
+            assert compact_grid.nodes is None
+            assert compact_grid.get_clearance_grid(walkable) == grid.get_clearance_grid(
+                walkable
+            )
+
+            expected = Pathfinder(searcher).get_path(
+                grid, (0, 0), (8, 8), agent_characteristics
+            )
+            path = Pathfinder(searcher).get_path(
+                compact_grid, (0, 0), (8, 8), agent_characteristics
+            )
+            assert [n.position for n in path] == [n.position for n in expected]
+
+    def test_compact_grid_materialises_nodes_on_demand(self):
+        grid = Grid(SAMPLE_MAP, compact=True)
+
+        node = grid.get_node_at(3, 4)
+        assert node.position == (3, 4)
+        assert grid.get_node_at(3, 4) == node
+        assert grid.get_node_at(10, 0) is None
+
+    def test_one_grid_serves_concurrent_searches(self):
+        walkable = lambda v: v != 2
+        grid = Grid(SAMPLE_MAP).annotate(walkable)
+        finder = Pathfinder(astar.search)
+        agent_characteristics = AgentCharacteristics(walkable=walkable, clearance=2)
+        queries = [((0, 0), (8, 8)), ((0, 0), (3, 5)), ((1, 0), (1, 8))] * 20
+
+        expected = [
+            finder.get_path(grid, start, end, agent_characteristics).nodes
+            for start, end in queries
+        ]
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            paths = list(
+                executor.map(
+                    lambda query: finder.get_path(
+                        grid, query[0], query[1], agent_characteristics
+                    ),
+                    queries,
+                )
+            )
+
+        assert [path.nodes for path in paths] == expected
+
+    def test_search_context_is_reset_after_a_search(self):
+        context = SearchContext(4)
+        context.visit(2)
+        context.g[2] = 1.5
+        context.parent[2] = 1
+
+        context.reset()
+
+        assert context.touched == []
+        assert context.g[2] == SearchContext(4).g[2]
+        assert context.parent[2] == -1
+        assert context.state[2] == 0
+
+    def test_jps_scans_wide_open_maps_without_recursion(self):
+        width = sys.getrecursionlimit() * 2
+        map = [[0] * width for _ in range(3)]
+        walkable = 0
+
+        grid = Grid(map)
+        finder = Pathfinder(jps.search)
+        agent_characteristics = AgentCharacteristics(walkable=walkable, clearance=0)
+
+        path = finder.get_path(grid, (0, 1), (width - 1, 1), agent_characteristics)
+
+        assert path.nodes == [grid.get_node_at(0, 1), grid.get_node_at(width - 1, 1)]
+
+    def test_jps_plus_finds_the_same_paths_as_jps(self):
+        walkable = lambda v: v != 2
+        grid = Grid(SAMPLE_MAP).annotate(walkable)
+        agent_characteristics = AgentCharacteristics(walkable=walkable, clearance=2)
+
+        for start, end in [((0, 0), (8, 8)), ((0, 0), (3, 5)), ((0, 7), (7, 0))]:
+            expected = Pathfinder(jps.search).get_path(
+                grid, start, end, agent_characteristics, cardinal_intercardinal
+            )
+            path = Pathfinder(jpsplus.search).get_path(
+                grid, start, end, agent_characteristics, cardinal_intercardinal
+            )
+            assert path.nodes == expected.nodes
+
+    def test_jump_tables_are_saved_alongside_the_grid(self):
+        walkable = lambda v: v != 2
+        grid = Grid([row[:] for row in SAMPLE_MAP]).annotate(walkable)
+        agent_characteristics = AgentCharacteristics(walkable=walkable, clearance=2)
+
+        table = jpsplus.preprocess(grid, agent_characteristics)
+        assert jpsplus.preprocess(grid, agent_characteristics) is table
+
+        buffer = io.BytesIO()
+        table.dump(buffer)
+        data = buffer.getvalue()
+        loaded = jpsplus.JumpTable.load(io.BytesIO(data))
+        assert loaded.distances == table.distances
+
+        # A saved table serves a grid with the same map, instead of building one
+        copy = Grid([row[:] for row in SAMPLE_MAP]).annotate(walkable)
+        assert jpsplus.preprocess(copy, agent_characteristics, table=loaded) is loaded
+        assert jpsplus.preprocess(copy, agent_characteristics) is loaded
+        with pytest.raises(ValueError):
+            jpsplus.preprocess(
+                copy, AgentCharacteristics(walkable=walkable, clearance=1), table=loaded
+            )
+        with pytest.raises(ValueError):
+            jpsplus.JumpTable.load(io.BytesIO(data[:-1]))
+        with pytest.raises(ValueError):
+            jpsplus.JumpTable.load(io.BytesIO(data[:10]))
+
+        grid.set_cell(5, 5, 2)
+        assert jpsplus.preprocess(grid, agent_characteristics) is not table
+        with pytest.raises(ValueError):
+            jpsplus.preprocess(grid, agent_characteristics, table=loaded)
+
+    def test_block_jps_finds_the_same_paths_as_jps(self):
+        walkable = lambda v: v != 2
+        grid = Grid(SAMPLE_MAP).annotate(walkable)
+
+        for clearance in (0, 2):
+            agent_characteristics = AgentCharacteristics(walkable, clearance)
+            for start, end in [((0, 0), (8, 8)), ((0, 0), (3, 5)), ((0, 7), (7, 0))]:
+                expected = Pathfinder(jps.search).get_path(
+                    grid, start, end, agent_characteristics
+                )
+                path = Pathfinder(blockjps.search).get_path(
+                    grid, start, end, agent_characteristics
+                )
+                assert path.nodes == expected.nodes
+
+    @pytest.mark.parametrize("allow_diagonal", [True, False])
+    def test_distance_field_matches_the_astar_path_lengths(self, allow_diagonal):
+        walkable = lambda v: v != 2
+        grid = Grid(SAMPLE_MAP)
+        agent_characteristics = AgentCharacteristics(walkable, 0)
+        options = SearchOptions(allow_diagonal=allow_diagonal, tunneling=False)
+        finder = Pathfinder(astar.search, allow_diagonal=allow_diagonal)
+
+        field = dijkstra.distance_field(grid, [(9, 9)], agent_characteristics, options)
+
+        for y in range(grid.height):
+            for x in range(grid.width):
+                if not grid.is_walkable(x, y, walkable):
+                    continue
+                expected = finder.get_path(
+                    grid, (x, y), (9, 9), agent_characteristics, heuristics.euclidean
+                )
+                assert field.distance(x, y) == pytest.approx(expected.length)
+                assert field.path(x, y).length == pytest.approx(expected.length)
+
+    def test_distance_field_leads_to_the_closest_source(self):
+        walkable = lambda v: v != 2
+        grid = Grid(SAMPLE_MAP)
+        agent_characteristics = AgentCharacteristics(walkable, 0)
+        options = SearchOptions(allow_diagonal=False, tunneling=False)
+        sources = [(0, 0), (9, 9)]
+
+        field = dijkstra.distance_field(grid, sources, agent_characteristics, options)
+
+        assert field.distance(1, 2) == 3
+        assert field.direction(0, 0) is None
+        assert field.direction(1, 0) == (-1, 0)
+        assert field.path(7, 9).nodes[-1].position == (9, 9)
+        assert field.distance(8, 5) == 5
+        assert field.path(8, 5).nodes[-1].position == (9, 9)
+
+    def test_flow_field_leads_every_cell_to_the_goal(self):
+        walkable = lambda v: v != 2
+        grid = Grid(SAMPLE_MAP).annotate(walkable)
+        agent_characteristics = AgentCharacteristics(walkable, 1)
+        options = SearchOptions(allow_diagonal=True, tunneling=False)
+
+        field = grid.flow_field((9, 9), agent_characteristics, options)
+
+        for y in range(grid.height):
+            for x in range(grid.width):
+                if not grid.is_walkable(x, y, walkable):
+                    continue
+                position, steps = (x, y), 0
+                while field.next_position(*position):
+                    position = field.next_position(*position)
+                    assert grid.is_walkable(*position, walkable)
+                    steps += 1
+                assert position == (9, 9)
+                assert steps == len(field.path(x, y).nodes) - 1
+
+    def test_flow_field_refresh_follows_the_grid_and_the_goal(self):
+        walkable = lambda v: v != 2
+        grid = Grid([row[:] for row in SAMPLE_MAP]).annotate(walkable)
+        agent_characteristics = AgentCharacteristics(walkable, 1)
+        options = SearchOptions(allow_diagonal=False, tunneling=False)
+        field = grid.flow_field((9, 9), agent_characteristics, options, max_drift=2)
+
+        grid.set_cell(8, 8, 2)
+        grid.set_cell(8, 7, 2)
+        field.refresh()
+        expected = dijkstra.distance_field(
+            grid, [(9, 9)], agent_characteristics, options
+        )
+        assert field.distances == expected.distances
+
+        field.refresh((8, 9))
+        assert field.goal == (8, 9)
+        assert field.drift == 1
+        assert field.next_position(9, 9) == (8, 9)
+        assert field.path(9, 0).nodes[-1].position == (8, 9)
+
+        field.refresh((6, 9))
+        assert field.drift == 0
+        expected = dijkstra.distance_field(
+            grid, [(6, 9)], agent_characteristics, options
+        )
+        assert field.distances == expected.distances
+
+    def test_bidirectional_search_finds_paths_as_short_as_astar(self):
+        walkable = lambda v: v != 2
+        grid = Grid(SAMPLE_MAP).annotate(walkable)
+
+        for clearance in (0, 2):
+            agent_characteristics = AgentCharacteristics(walkable, clearance)
+            for start, end in [((0, 0), (8, 8)), ((0, 0), (3, 5)), ((0, 7), (7, 0))]:
+                expected = Pathfinder(astar.search).get_path(
+                    grid, start, end, agent_characteristics, cardinal_intercardinal
+                )
+                path = Pathfinder(bidirectional.search).get_path(
+                    grid, start, end, agent_characteristics, cardinal_intercardinal
+                )
+                assert path.nodes[0].position == start
+                assert path.nodes[-1].position == end
+                assert path.length == pytest.approx(expected.length)
+
+    def test_bidirectional_search_expands_less_out_of_dead_ends(self):
+        # Both ends lie at the bottom of a dead end facing the other one
+        map = [[0] * 40 for _ in range(40)]
+        for y in range(8, 33):
+            map[y][12] = map[y][28] = 2
+        for x in range(2, 13):
+            map[8][x] = map[32][x] = map[8][x + 26] = map[32][x + 26] = 2
+        grid = Grid(map)
+        agent_characteristics = AgentCharacteristics(lambda v: v != 2, 0)
+        options = SearchOptions(allow_diagonal=False, tunneling=False)
+        start, end = grid.get_node_at(10, 20), grid.get_node_at(30, 20)
+
+        expanded = []
+        for search in (astar.search, bidirectional.search):
+            context = SearchContext(grid.size)
+            node = search(
+                grid,
+                options,
+                start,
+                end,
+                agent_characteristics,
+                context,
+                heuristics.manhattan,
+            )
+            assert node == end
+            contexts = [context, context.backward()]
+            expanded.append(
+                sum(1 for c in contexts for state in c.state if state & CLOSED)
+            )
+
+        assert expanded[1] < 0.7 * expanded[0]
+
+    def test_hierarchical_search_finds_near_optimal_paths(self):
+        # Walls with a few gaps, across several clusters
+        map = [[0] * 48 for _ in range(48)]
+        for x in range(0, 40):
+            map[12][x] = map[30][x + 8] = 2
+        for y in range(13, 30):
+            map[y][24] = 2
+        map[20][24] = 0
+        grid = Grid(map)
+        agent_characteristics = AgentCharacteristics(lambda v: v != 2, 0)
+
+        for start, end in [
+            ((0, 0), (47, 47)),
+            ((3, 40), (30, 2)),
+            ((20, 20), (22, 18)),
+        ]:
+            expected = Pathfinder(astar.search).get_path(
+                grid, start, end, agent_characteristics, cardinal_intercardinal
+            )
+            path = Pathfinder(hpa.search).get_path(
+                grid, start, end, agent_characteristics, cardinal_intercardinal
+            )
+            assert path.nodes[0].position == start
+            assert path.nodes[-1].position == end
+            for node, next_node in zip(path.nodes, path.nodes[1:]):
+                assert max(abs(next_node.x - node.x), abs(next_node.y - node.y)) == 1
+                assert grid.is_walkable(next_node.x, next_node.y, 0)
+            assert expected.length <= path.length <= 1.1 * expected.length
+
+    def test_hierarchical_search_rebuilds_only_changed_clusters(self):
+        map = [[0] * 48 for _ in range(48)]
+        grid = Grid(map)
+        agent_characteristics = AgentCharacteristics(lambda v: v != 2, 0)
+        options = SearchOptions(allow_diagonal=True, tunneling=False)
+        finder = Pathfinder(hpa.search)
+
+        finder.get_path(grid, (0, 0), (47, 47), agent_characteristics)
+        hierarchy = hpa.preprocess(grid, agent_characteristics, options)
+        # Clusters are built on first use
+        assert len(hierarchy.clusters) < 9
+        clusters = {
+            (cx, cy): hierarchy.cluster((cx, cy)) for cx in range(3) for cy in range(3)
+        }
+
+        # Within a cluster, then on the border between two of them
+        grid.set_cell(20, 20, 2)
+        hpa.preprocess(grid, agent_characteristics, options)
+        assert set(clusters) - set(hierarchy.clusters) == {(1, 1)}
+        grid.set_cell(31, 40, 2)
+        hpa.preprocess(grid, agent_characteristics, options)
+        assert set(clusters) - set(hierarchy.clusters) == {(1, 1), (1, 2), (2, 2)}
+        assert hierarchy.clusters[0, 0] is clusters[0, 0]
+
+        for start, end in [((0, 0), (47, 47)), ((20, 19), (20, 21))]:
+            path = finder.get_path(grid, start, end, agent_characteristics)
+            assert path.nodes[-1].position == end
+            assert all(grid.is_walkable(n.x, n.y, 0) for n in path.nodes)
+
+    def test_batched_paths_are_as_short_as_single_ones(self):
+        walkable = lambda v: v != 2
+        grid = Grid(SAMPLE_MAP)
+        agent_characteristics = AgentCharacteristics(walkable, 0)
+        finder = Pathfinder(astar.search)
+        # Requests sharing a goal, requests sharing a start (one of which is unwalkable), and a lone one
+        requests = [((x, 0), (9, 9)) for x in range(6)]
+        requests += [((7, 5), (x, 9)) for x in range(0, 10, 2)]
+        requests += [((0, 9), (9, 0))]
+
+        results = dict(
+            finder.get_paths(
+                grid, requests, agent_characteristics, cardinal_intercardinal
+            )
+        )
+
+        assert sorted(results) == list(range(len(requests)))
+        for i, (start, end) in enumerate(requests):
+            expected = finder.get_path(
+                grid, start, end, agent_characteristics, cardinal_intercardinal
+            )
+            if expected is None:
+                assert results[i] is None
+                continue
+            assert results[i].nodes[0].position == start
+            assert results[i].nodes[-1].position == end
+            assert results[i].length == pytest.approx(expected.length)
+
+    def test_resumable_searches_find_the_paths_of_complete_ones(self):
+        walkable = lambda v: v != 2
+        grid = Grid(SAMPLE_MAP)
+        agent_characteristics = AgentCharacteristics(walkable, 0)
+
+        for searcher in (astar.search, jps.search, thetastar.search):
+            finder = Pathfinder(searcher)
+            expected = finder.get_path(
+                grid, (0, 0), (9, 9), agent_characteristics, cardinal_intercardinal
+            )
+            search = finder.start_search(
+                grid, (0, 0), (9, 9), agent_characteristics, cardinal_intercardinal
+            )
+
+            steps = 0
+            while not search.step(max_expansions=1):
+                steps += 1
+            assert steps > 0
+            assert search.expansions >= steps
+            assert [n.position for n in search.path.nodes] == [
+                n.position for n in expected.nodes
+            ]
+
+    def test_cancelled_searches_release_their_context(self):
+        grid = Grid(SAMPLE_MAP)
+        agent_characteristics = AgentCharacteristics(lambda v: v != 2, 0)
+        finder = Pathfinder(astar.search)
+
+        search = finder.start_search(grid, (0, 0), (9, 9), agent_characteristics)
+        assert not search.step(max_expansions=2)
+        search.cancel()
+
+        assert search.done and search.path is None
+        assert search.step()
+        context = finder.contexts.acquire(grid.size)
+        assert not context.touched
+        with pytest.raises(ValueError):
+            Pathfinder(bidirectional.search).start_search(
+                grid, (0, 0), (9, 9), agent_characteristics
+            )
+
+    def test_async_searches_take_turns_by_priority(self):
+        grid = Grid(SAMPLE_MAP)
+        agent_characteristics = AgentCharacteristics(lambda v: v != 2, 0)
+        finder = Pathfinder(astar.search, slice_expansions=2)
+        expected = finder.get_path(grid, (0, 0), (9, 9), agent_characteristics)
+
+        async def run():
+            finished = []
+
+            async def get_path(name, priority, deadline=None):
+                path = await finder.get_path_async(
+                    grid,
+                    (0, 0),
+                    (9, 9),
+                    agent_characteristics,
+                    priority=priority,
+                    deadline=deadline,
+                )
+                finished.append(name)
+                return path
+
+            loop = asyncio.get_running_loop()
+            results = await asyncio.gather(
+                get_path("low", 1),
+                get_path("high", 0),
+                get_path("late", 0, loop.time()),
+                return_exceptions=True,
+            )
+            return finished, results
+
+        finished, (low, high, late) = asyncio.run(run())
+
+        assert finished == ["high", "low"]
+        assert isinstance(late, asyncio.TimeoutError)
+        assert low.length == high.length == expected.length
+
+    def test_limited_searches_return_the_closest_partial_path(self):
+        grid = Grid(SAMPLE_MAP)
+        agent_characteristics = AgentCharacteristics(lambda v: v != 2, 0)
+        complete = Pathfinder(astar.search).get_path(
+            grid, (0, 0), (9, 9), agent_characteristics, cardinal_intercardinal
+        )
+
+        for searcher in (astar.search, jps.search):
+            finder = Pathfinder(searcher, max_expansions=3)
+            assert (
+                finder.get_path(
+                    grid, (0, 0), (9, 9), agent_characteristics, cardinal_intercardinal
+                )
+                is None
+            )
+
+            finder = Pathfinder(searcher, max_expansions=3, partial_paths=True)
+            partial = finder.get_path(
+                grid, (0, 0), (9, 9), agent_characteristics, cardinal_intercardinal
+            )
+            assert partial.nodes[0].position == (0, 0)
+            assert partial.nodes[-1].position != (9, 9)
+            assert cardinal_intercardinal(
+                partial.nodes[-1], grid.get_node_at(9, 9)
+            ) < cardinal_intercardinal(grid.get_node_at(0, 0), grid.get_node_at(9, 9))
+
+        finder = Pathfinder(astar.search, max_cost=complete.length - 1)
+        assert (
+            finder.get_path(
+                grid, (0, 0), (9, 9), agent_characteristics, cardinal_intercardinal
+            )
+            is None
+        )
+        finder = Pathfinder(astar.search, max_cost=complete.length, max_time=60)
+        assert finder.get_path(
+            grid, (0, 0), (9, 9), agent_characteristics, cardinal_intercardinal
+        ).length == pytest.approx(complete.length)
+
+    def test_anytime_search_improves_its_path_down_to_the_shortest(self):
+        rng = random.Random(5)
+        map = [[int(rng.random() < 0.3) for _ in range(60)] for _ in range(60)]
+        map[0][0] = map[59][59] = 0
+        grid = Grid(map)
+        agent_characteristics = AgentCharacteristics(0, 0)
+        shortest = Pathfinder(astar.search).get_path(
+            grid, (0, 0), (59, 59), agent_characteristics, cardinal_intercardinal
+        )
+
+        search = Pathfinder(arastar.search).start_anytime_search(
+            grid,
+            (0, 0),
+            (59, 59),
+            agent_characteristics,
+            cardinal_intercardinal,
+            weight=3,
+            weight_step=0.25,
+        )
+        lengths = []
+        while not search.improve():
+            lengths.append(search.path.length)
+            assert search.path.length <= search.bound * shortest.length + 1e-9
+        assert search.bound == 1
+        assert search.path.length == pytest.approx(shortest.length)
+        assert lengths == sorted(lengths, reverse=True)
+
+        path = Pathfinder(arastar.search).get_path(
+            grid, (0, 0), (59, 59), agent_characteristics, cardinal_intercardinal
+        )
+        assert path.length == pytest.approx(shortest.length)
+
+    def test_incremental_planner_repairs_its_plan_when_cells_change(self):
+        rng = random.Random(3)
+        map = [[int(rng.random() < 0.15) for _ in range(40)] for _ in range(40)]
+        map[0][0] = map[39][39] = 0
+        grid = Grid(map)
+        agent_characteristics = AgentCharacteristics(0, 0)
+        finder = Pathfinder(astar.search)
+        planner = finder.incremental_planner(
+            grid, (0, 0), (39, 39), agent_characteristics, cardinal_intercardinal
+        )
+
+        path = planner.get_path()
+        expected = finder.get_path(
+            grid, (0, 0), (39, 39), agent_characteristics, cardinal_intercardinal
+        )
+        assert path.length == pytest.approx(expected.length)
+        initial = planner.expansions
+
+        for _ in range(10):
+            grid.set_cell(*path.nodes[len(path.nodes) // 2].position, 1)
+            position = path.nodes[1].position
+            expansions = planner.expansions
+            path = planner.get_path(position)
+            expected = finder.get_path(
+                grid, position, (39, 39), agent_characteristics, cardinal_intercardinal
+            )
+            assert path.nodes[0].position == position
+            assert path.nodes[-1].position == (39, 39)
+            assert path.length == pytest.approx(expected.length)
+            assert planner.expansions - expansions < initial
+
+    def test_incremental_planner_follows_many_edits(self):
+        rng = random.Random(1)
+        map = [[int(rng.random() < 0.25) for _ in range(30)] for _ in range(30)]
+        grid = Grid(map)
+        agent_characteristics = AgentCharacteristics(0, 0)
+        finder = Pathfinder(astar.search)
+        planner = finder.incremental_planner(
+            grid, (0, 0), (29, 29), agent_characteristics, cardinal_intercardinal
+        )
+
+        position = (0, 0)
+        for _ in range(100):
+            for _ in range(3):
+                x, y = rng.randrange(30), rng.randrange(30)
+                if (x, y) != (29, 29):
+                    grid.set_cell(x, y, 1 - map[y][x])
+            path = planner.get_path(position)
+            expected = finder.get_path(
+                grid, position, (29, 29), agent_characteristics, cardinal_intercardinal
+            )
+            if expected is None:
+                assert path is None
+                continue
+            assert path.nodes[0].position == position
+            assert path.length == pytest.approx(expected.length)
+            if len(path.nodes) > 1:
+                position = path.nodes[1].position
+
+    def test_incremental_planner_cuts_corners_like_astar_with_a_clearance(self):
+        map = [[0] * 10 for _ in range(5)]
+        for x, y in [(2, 1), (2, 2), (7, 3), (0, 4), (5, 4), (6, 4), (9, 4)]:
+            map[y][x] = 1
+        grid = Grid(map).annotate(0)
+        agent_characteristics = AgentCharacteristics(0, 2)
+        finder = Pathfinder(astar.search)
+        path = finder.incremental_planner(
+            grid, (4, 4), (4, 0), agent_characteristics, heuristics.euclidean
+        ).get_path()
+        expected = finder.get_path(
+            grid, (4, 4), (4, 0), agent_characteristics, heuristics.euclidean
+        )
+        assert path.length == pytest.approx(expected.length)
+
+        rng = random.Random(8)
+        map = [[int(rng.random() < 0.05) for _ in range(20)] for _ in range(20)]
+        for x, y in [(0, 0), (1, 0), (0, 1), (1, 1)]:
+            map[y][x] = map[19 - y][19 - x] = 0
+        grid = Grid(map).annotate(0)
+        planner = finder.incremental_planner(
+            grid, (0, 0), (18, 18), agent_characteristics, cardinal_intercardinal
+        )
+        position = (0, 0)
+        for _ in range(40):
+            for _ in range(2):
+                x, y = rng.randrange(20), rng.randrange(20)
+                grid.set_cell(x, y, 1 - grid.map[y][x])
+            path = planner.get_path(position)
+            expected = finder.get_path(
+                grid, position, (18, 18), agent_characteristics, cardinal_intercardinal
+            )
+            if expected is None:
+                assert path is None
+                continue
+            assert path.length == pytest.approx(expected.length)
+            if len(path.nodes) > 1:
+                position = path.nodes[1].position
+
+    def test_lazy_theta_star_finds_any_angle_paths_like_theta_star(self):
+        rng = random.Random(2)
+        map = [[int(rng.random() < 0.1) for _ in range(40)] for _ in range(40)]
+        map[0][0] = map[39][39] = map[0][39] = 0
+        grid = Grid(map)
+        agent_characteristics = AgentCharacteristics(0, 0)
+        theta = Pathfinder(thetastar.search)
+        lazy = Pathfinder(lazythetastar.search, sight_cache_size=1000)
+
+        for end in [(39, 39), (0, 39)]:
+            expected = theta.get_path(
+                grid, (0, 0), end, agent_characteristics, heuristics.euclidean
+            )
+            path = lazy.get_path(
+                grid, (0, 0), end, agent_characteristics, heuristics.euclidean
+            )
+            assert path.nodes[-1].position == end
+            assert path.length == pytest.approx(expected.length, rel=0.02)
+            for node, following in zip(path.nodes, path.nodes[1:]):
+                assert thetastar.line_of_sight(
+                    node, following, grid, agent_characteristics
+                )
+
+        cache = grid.sight_lines[(0, None)]
+        assert 0 < len(cache) <= 1000
+        grid.set_cell(39, 0, 1)
+        assert not cache.line_of_sight(
+            grid.index(0, 0), grid.index(39, 0), grid, agent_characteristics
+        )
+        assert len(cache) == 1
+
+    def test_smoothed_paths_are_shorter_and_keep_in_sight(self):
+        rng = random.Random(4)
+        map = [[int(rng.random() < 0.1) for _ in range(50)] for _ in range(50)]
+        map[0][0] = map[49][49] = 0
+        grid = Grid(map)
+        agent_characteristics = AgentCharacteristics(0, 0)
+        theta = Pathfinder(thetastar.search).get_path(
+            grid, (0, 0), (49, 49), agent_characteristics, heuristics.euclidean
+        )
+
+        for finder in (
+            Pathfinder(astar.search, allow_diagonal=False),
+            Pathfinder(astar.search),
+            Pathfinder(jps.search),
+        ):
+            path = finder.get_path(
+                grid, (0, 0), (49, 49), agent_characteristics, heuristics.euclidean
+            )
+            nodes, length = path.nodes[:], path.length
+            path.smooth(grid, agent_characteristics)
+
+            assert path.nodes[0] is nodes[0] and path.nodes[-1] is nodes[-1]
+            assert all(node in nodes for node in path.nodes)
+            assert len(path.nodes) < len(nodes)
+            assert path.length <= length
+            assert path.length < theta.length * 1.1
+            for node, following in zip(path.nodes, path.nodes[1:]):
+                assert thetastar.line_of_sight(
+                    node, following, grid, agent_characteristics
+                )
@@ -0,0 +1,79 @@
+import random
+
+from heuristics import euclidean, manhattan
+from openlist import BucketOpenList, OpenList, create_open_list
+from properties import SearchOptions
+
+
+def test_cells_are_popped_by_f_then_h():
+    openlist = OpenList()
+    openlist.push(0, 5, 1)
+    openlist.push(1, 4, 3)
+    openlist.push(2, 4, 2)
+    openlist.push(3, 6, 0)
+
+    assert [openlist.pop() for _ in range(len(openlist))] == [2, 1, 0, 3]
+
+
+def test_pushing_an_open_cell_updates_its_priority():
+    openlist = OpenList()
+    openlist.push(0, 5, 0)
+    openlist.push(1, 6, 0)
+    openlist.push(1, 4, 0)
+    openlist.push(0, 7, 0)
+    openlist.remove(1)
+    openlist.push(2, 6, 0)
+
+    assert len(openlist) == 2
+    assert 1 not in openlist
+    assert openlist.peek() == (6, 0, 2)
+    assert [openlist.pop() for _ in range(len(openlist))] == [2, 0]
+
+
+def test_heap_stays_bounded_on_many_updates():
+    rng = random.Random(0)
+    openlist = OpenList()
+    f = {cell: 1000.0 for cell in range(100)}
+    for cell in f:
+        openlist.push(cell, f[cell], 0)
+
+    for _ in range(10000):
+        cell = rng.randrange(100)
+        f[cell] -= rng.random()
+        openlist.push(cell, f[cell], 0)
+        assert len(openlist.heap) <= 2 * len(openlist) + 16
+
+    assert [openlist.pop() for _ in range(len(openlist))] == sorted(f, key=f.get)
+
+
+def test_bucket_open_list_pops_by_f():
+    openlist = BucketOpenList()
+    openlist.push(0, 5, 1)
+    openlist.push(1, 3, 3)
+    openlist.push(2, 7, 0)
+    openlist.push(2, 4, 0)
+    openlist.push(3, 6, 0)
+    openlist.remove(3)
+
+    assert len(openlist) == 3
+    assert openlist.peek() == (3, 3, 1)
+    assert [openlist.pop() for _ in range(len(openlist))] == [1, 2, 0]
+
+
+def test_bucket_open_list_falls_back_on_fractional_priorities():
+    openlist = BucketOpenList()
+    openlist.push(0, 5, 0)
+    openlist.push(1, 3, 0)
+    openlist.push(2, 4.5, 0)
+
+    assert isinstance(openlist.fallback, OpenList)
+    assert [openlist.pop() for _ in range(len(openlist))] == [1, 2, 0]
+
+
+def test_bucket_open_list_is_used_for_integer_costs():
+    straight = SearchOptions(allow_diagonal=False, tunneling=False)
+    diagonal = SearchOptions(allow_diagonal=True, tunneling=False)
+
+    assert isinstance(create_open_list(straight, manhattan), BucketOpenList)
+    assert isinstance(create_open_list(straight, euclidean), OpenList)
+    assert isinstance(create_open_list(diagonal, manhattan), OpenList)
@@ -0,0 +1,47 @@
+from grid import Grid
+from heuristics import cardinal_intercardinal
+from parallel import ProcessPathfinder
+from pathfinder import Pathfinder
+from properties import AgentCharacteristics
+from search import astar
+
+MAP = [
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0, 1, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 1, 0, 0, 0, 0, 0, 0],
+    [0, 0, 1, 0, 0, 0, 0, 0, 2, 0],
+    [0, 0, 1, 1, 1, 0, 0, 2, 0, 0],
+    [0, 0, 0, 1, 1, 0, 2, 0, 0, 2],
+    [0, 0, 0, 0, 1, 0, 0, 0, 0, 2],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+]
+
+
+def test_workers_find_the_paths_of_a_pathfinder():
+    walkable = lambda v: v != 2
+    grid = Grid(MAP).annotate(walkable)
+    requests = [((0, 0), (8, 8)), ((0, 0), (3, 5)), ((1, 0), (1, 8)), ((9, 9), (9, 6))]
+    requests *= 5
+
+    for clearance in (0, 2):
+        agent_characteristics = AgentCharacteristics(walkable, clearance)
+        with ProcessPathfinder(
+            astar.search, grid, agent_characteristics, processes=2
+        ) as finder:
+            results = dict(
+                finder.get_paths(requests, cardinal_intercardinal, chunk_size=3)
+            )
+
+        assert sorted(results) == list(range(len(requests)))
+        for i, (start, end) in enumerate(requests):
+            expected = Pathfinder(astar.search).get_path(
+                grid, start, end, agent_characteristics, cardinal_intercardinal
+            )
+            if expected is None:
+                assert results[i] is None
+            else:
+                assert results[i].tolist() == [
+                    c for node in expected.nodes for c in (node.x, node.y)
+                ]
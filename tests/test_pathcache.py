@@ -0,0 +1,70 @@
+import pytest
+
+from grid import Grid
+from pathfinder import Pathfinder
+from properties import AgentCharacteristics
+from search import astar
+
+WALKABLE = AgentCharacteristics(lambda v: v != 2, 0)
+
+
+def make_grid():
+    # A wall across the map, with a door at its top
+    map = [[0] * 30 for _ in range(30)]
+    for y in range(1, 30):
+        map[y][15] = 2
+    return Grid(map)
+
+
+def test_queries_asked_again_are_served_from_the_cache():
+    grid = make_grid()
+    finder = Pathfinder(astar.search, cache_size=8)
+
+    path = finder.get_path(grid, (0, 20), (29, 20), WALKABLE)
+    path.nodes.reverse()
+    cached = finder.get_path(grid, (0, 20), (29, 20), WALKABLE)
+
+    assert len(finder.cache) == 1
+    assert cached.nodes[0].position == (0, 20)
+    assert cached.nodes == path.nodes[::-1]
+
+
+def test_least_recently_used_paths_are_evicted():
+    grid = make_grid()
+    finder = Pathfinder(astar.search, cache_size=2)
+
+    finder.get_path(grid, (0, 0), (1, 0), WALKABLE)
+    finder.get_path(grid, (0, 0), (2, 0), WALKABLE)
+    finder.get_path(grid, (0, 0), (1, 0), WALKABLE)
+    finder.get_path(grid, (0, 0), (3, 0), WALKABLE)
+
+    assert len(finder.cache) == 2
+    assert [key[2] for key in finder.cache._entries] == [(1, 0), (3, 0)]
+
+
+def test_paths_are_kept_when_the_grid_changes_away_from_them():
+    grid = make_grid()
+    finder = Pathfinder(astar.search, cache_size=8, cache_nodes=1000)
+    long_path = finder.get_path(grid, (0, 20), (29, 20), WALKABLE)
+    short_path = finder.get_path(grid, (0, 20), (5, 25), WALKABLE)
+
+    # Far from the short path, but opens a shortcut for the long one
+    grid.set_cell(15, 20, 0)
+    assert finder.get_path(grid, (0, 20), (5, 25), WALKABLE).length == short_path.length
+    assert finder.get_path(grid, (0, 20), (29, 20), WALKABLE).length < long_path.length
+    assert finder.cache.nodes == sum(
+        len(entry.path.nodes) for entry in finder.cache._entries.values()
+    )
+
+    # Blocks the short path
+    grid.update_region(1, 24, [[2] * 8])
+    assert finder.get_path(grid, (0, 20), (5, 25), WALKABLE).length > short_path.length
+
+
+def test_queries_out_of_the_grid_are_not_cached():
+    grid = make_grid()
+    finder = Pathfinder(astar.search, cache_size=8)
+
+    with pytest.raises(IndexError):
+        finder.get_path(grid, (0, 0), (30, 0), WALKABLE)
+    assert len(finder.cache) == 0
@@ -1,4 +1,6 @@
-from utils import array_to_nodes, string_map_to_array
+from array import array
+
+from utils import array_to_buffer, array_to_nodes, string_map_to_array
 
 
 def test_convert_a_string_map_into_a_map_array():
@@ -31,3 +33,17 @@ def test_convert_an_array_list_into_array_of_nodes():
     assert max_x == 5
     assert min_y == 0
     assert max_y == 4
+
+
+def test_flatten_a_map_into_a_row_major_buffer():
+    map = [
+        [0, 1, 0],
+        [2, 0, 0],
+    ]
+
+    buffer = array_to_buffer(map)
+    assert isinstance(buffer, array)
+    assert list(buffer) == [0, 1, 0, 2, 0, 0]
+
+    buffer = array_to_buffer([["0", "1"], ["1", "0"]])
+    assert buffer == ["0", "1", "1", "0"]